@@ -6,16 +6,30 @@ Sora 自动化管理系统 - 后端服务
 FastAPI + MySQL
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Header
+from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import uvicorn
 from datetime import datetime
+import hashlib
 import json
+import os
+import shutil
+import tempfile
+import time
+import asyncio
+import threading
+import httpx
 
 from database import Database
 from window_manager import WindowManager
+from event_bus import TaskEventBus, format_sse
+from progress_buffer import SORA_PROGRESS_FIELDS
+from async_db import BlockingExecutor, AsyncDatabase
+from jobs import JobRegistry
+from task_import import detect_import_format, import_task_file
 import config
 
 app = FastAPI(title="Sora 自动化管理系统")
@@ -87,6 +101,65 @@ print("✅ 使用 MySQL 数据库")
 
 window_manager = WindowManager(db)
 
+# 任务事件总线：任务状态 / 进度写库后推送给 SSE 订阅者
+event_bus = TaskEventBus()
+db.add_task_listener(event_bus.publish)
+
+# 后台作业（大文件导入等）
+jobs = JobRegistry()
+
+# 阻塞调用（pymysql、ixBrowser 客户端）专用的有界线程池，接口处理函数在其中执行，不阻塞事件循环
+db_executor = BlockingExecutor(config.ASYNC_DB_MAX_WORKERS)
+adb = AsyncDatabase(db, db_executor)
+offload = db_executor.offload
+
+# 对外 HTTP 请求（图片代理）使用的异步客户端，首次使用时创建
+http_client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=10,
+            follow_redirects=True,
+            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+        )
+    return http_client
+
+def notify_task_change(task_id: int, **info):
+    """插件回调直接写库更新任务后调用：唤醒等待该任务的自动化线程，并推送任务状态事件"""
+    window_manager.notify_task_change(task_id, **info)
+    event_bus.publish('status', task_id, **info)
+
+def bind_task_by_prompt(sora_task_id: str, prompt: str, statuses: List[str], status: str) -> Optional[int]:
+    """
+    插件上报了尚未绑定的 Sora 任务：按提示词匹配本地任务并绑定
+    
+    精确匹配（提示词哈希索引）优先，其次取模糊匹配（三元组索引）相似度最高的任务
+    
+    Args:
+        statuses: 可匹配的任务状态（按优先级排列）
+        status: 绑定后的任务状态
+    
+    Returns:
+        绑定的任务ID；没有匹配的任务时返回 None
+    """
+    task = db.match_unbound_task(prompt, statuses, config.PROMPT_MATCH_MIN_SCORE)
+    if task is None:
+        print(f"  ⚠️ 未找到匹配的任务")
+        return None
+    task_id = task['id']
+    if task['score'] >= 1.0:
+        print(f"  ✅ 精确匹配成功！任务ID: {task_id}")
+    else:
+        print(f"  ✅ 模糊匹配成功！任务ID: {task_id}，相似度: {task['score']}")
+        print(f"     任务提示词: {task['prompt'][:50]}...")
+        print(f"     Sora提示词: {prompt[:50]}...")
+    if not db.bind_sora_task(task_id, sora_task_id, status):
+        print(f"  ⚠️ 任务 {task_id} 已被其他回调绑定")
+        return None
+    return task_id
+
 # ==================== 数据模型 ====================
 
 class AccountImport(BaseModel):
@@ -117,7 +190,8 @@ class ConfigUpdate(BaseModel):
 # ==================== 账号管理 ====================
 
 @app.post("/api/accounts/import")
-async def import_accounts(accounts: List[AccountImport]):
+@offload
+def import_accounts(accounts: List[AccountImport]):
     """批量导入账号"""
     try:
         result = db.import_accounts(accounts)
@@ -126,7 +200,8 @@ async def import_accounts(accounts: List[AccountImport]):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/accounts")
-async def get_accounts():
+@offload
+def get_accounts():
     """获取所有账号"""
     try:
         accounts = db.get_all_accounts()
@@ -135,7 +210,8 @@ async def get_accounts():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/accounts/{account_id}")
-async def delete_account(account_id: int):
+@offload
+def delete_account(account_id: int):
     """删除账号"""
     try:
         db.delete_account(account_id)
@@ -145,85 +221,180 @@ async def delete_account(account_id: int):
 
 # ==================== 任务管理 ====================
 
+def import_summary(total: int, result: dict, elapsed: float) -> dict:
+    """导入任务的结果统计：数量、耗时和吞吐量"""
+    return {
+        "total": total,
+        "created": result['created'],
+        "skipped": result['skipped'],
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "tasks_per_second": round(total / elapsed, 1) if elapsed > 0 else None
+    }
+
 @app.post("/api/tasks/import")
-async def import_tasks(tasks: List[TaskImport]):
+@offload
+def import_tasks(tasks: List[TaskImport]):
     """批量导入任务"""
     try:
+        start = time.perf_counter()
         result = db.import_tasks(tasks)
-        return {"success": True, "message": f"成功导入 {result} 个任务"}
+        if result['created']:
+            window_manager.notify_tasks_available()
+        return {
+            "success": True,
+            "message": f"成功导入 {result['created']} 个任务",
+            "data": import_summary(len(tasks), result, time.perf_counter() - start)
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def save_upload_to_temp(upload_file, suffix: str = '') -> str:
+    """把上传文件分块复制到临时文件（请求结束后上传文件会被关闭，后台导入需要自己的副本）"""
+    upload_file.seek(0)
+    with tempfile.NamedTemporaryFile(prefix='task_import_', suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(upload_file, tmp, 1024 * 1024)
+        return tmp.name
+
+def run_task_import_job(job, path: str, fmt: str) -> dict:
+    """执行任务文件导入：每批提交后更新作业进度，并唤醒任务分派器处理已导入的任务"""
+    def on_progress(stats):
+        jobs.update(job, **stats)
+        if stats['created']:
+            window_manager.notify_tasks_available()
+    
+    try:
+        summary = import_task_file(path, fmt, db.import_tasks, config.TASK_IMPORT_CHUNK_SIZE, on_progress)
+    finally:
+        os.remove(path)
+    
+    print(f"✅ 文件导入完成: 创建 {summary['created']} 个任务, 跳过 {summary['skipped']} 个重复任务, "
+          f"无效 {summary['invalid']} 个，耗时 {summary['elapsed_ms']} ms，{summary['tasks_per_second']} 个/秒")
+    return summary
+
 @app.post("/api/tasks/import/file")
-async def import_tasks_from_file(file: UploadFile = File(...)):
-    """从文件导入任务"""
+async def import_tasks_from_file(file: UploadFile = File(...), background: bool = False):
+    """
+    从文件导入任务（流式解析，每解析一批就写入数据库并提交）
+    
+    支持的格式（按扩展名判断，默认 JSON）:
+    - .json: {"tasks": [...]} 或顶层数组
+    - .jsonl / .ndjson: 每行一个任务
+    - .csv: 表头包含 prompt，可选 image / account_id / profile_id / model
+    
+    background=true 时立即返回作业ID，通过 GET /api/jobs/{job_id} 查询导入进度
+    """
+    fmt = detect_import_format(file.filename) or 'json'
     try:
-        # 读取文件内容
-        content = await file.read()
-        
-        # 解析 JSON
-        try:
-            data = json.loads(content.decode('utf-8'))
-        except json.JSONDecodeError as e:
-            print(f"JSON 解析错误: {e}")
-            raise HTTPException(status_code=400, detail="无效的 JSON 格式")
-        
-        # 验证数据结构
-        if 'tasks' not in data:
-            print(f"JSON 数据缺少 'tasks' 字段: {data.keys()}")
-            raise HTTPException(status_code=400, detail="JSON 文件必须包含 'tasks' 字段")
-        
-        tasks_data = data['tasks']
-        if not isinstance(tasks_data, list):
-            print(f"'tasks' 不是数组: {type(tasks_data)}")
-            raise HTTPException(status_code=400, detail="'tasks' 必须是数组")
-        
-        # 转换为 TaskImport 对象
-        tasks = []
-        for i, task_data in enumerate(tasks_data):
-            try:
-                task = TaskImport(
-                    account_id=task_data.get('account_id'),
-                    profile_id=task_data.get('profile_id'),
-                    prompt=task_data['prompt'],
-                    image=task_data.get('image')
-                )
-                tasks.append(task)
-            except KeyError as e:
-                print(f"任务 {i} 缺少必需字段: {e}, 数据: {task_data}")
-                raise HTTPException(status_code=400, detail=f"任务 {i} 缺少必需字段: {e}")
-            except Exception as e:
-                print(f"任务 {i} 解析错误: {e}, 数据: {task_data}")
-                raise HTTPException(status_code=400, detail=f"任务 {i} 解析错误: {e}")
-        
-        # 导入任务
-        print(f"准备导入 {len(tasks)} 个任务")
-        result = db.import_tasks(tasks)
-        print(f"成功导入 {result} 个任务")
-        return {"success": True, "message": f"成功从文件导入 {result} 个任务"}
-        
-    except HTTPException:
-        raise
+        path = await db_executor.run(save_upload_to_temp, file.file, os.path.splitext(file.filename or '')[1])
+    except Exception as e:
+        print(f"保存上传文件失败: {type(e).__name__}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    job = jobs.create('task_import', filename=file.filename, format=fmt)
+    print(f"准备从文件导入任务: {file.filename}（{fmt}），作业ID: {job.id}")
+    
+    if background:
+        jobs.run_in_background(job, run_task_import_job, job, path, fmt)
+        return {"success": True, "message": "任务文件正在后台导入", "job_id": job.id, "data": jobs.get(job.id)}
+    
+    jobs.start(job)
+    try:
+        summary = await db_executor.run(run_task_import_job, job, path, fmt)
+        jobs.finish(job, summary)
+    except ValueError as e:
+        # 文件格式错误：之前的批次已经提交，提示已导入的数量
+        jobs.fail(job, str(e))
+        created = jobs.get(job.id)['progress'].get('created', 0)
+        print(f"任务文件格式错误: {e}（已导入 {created} 个任务）")
+        raise HTTPException(status_code=400, detail=f"{e}（已导入 {created} 个任务）")
     except Exception as e:
+        jobs.fail(job, str(e))
         print(f"导入任务文件时发生错误: {type(e).__name__}: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    
+    message = f"成功从文件导入 {summary['created']} 个任务"
+    if summary['invalid']:
+        message += f"，{summary['invalid']} 个任务格式错误已跳过"
+    return {"success": True, "message": message, "job_id": job.id, "data": summary}
 
 @app.get("/api/tasks")
-async def get_tasks(account_id: Optional[int] = None):
-    """获取任务列表"""
+@offload
+def get_tasks(account_id: Optional[int] = None,
+              limit: Optional[int] = None,
+              cursor: Optional[int] = None,
+              status: Optional[str] = None,
+              created_from: Optional[str] = None,
+              created_to: Optional[str] = None,
+              fields: str = "full"):
+    """
+    获取任务列表
+    
+    不带分页参数时返回全部任务（兼容旧版前端）；带任一分页/筛选参数时按 id 倒序分页返回。
+    
+    参数:
+    - account_id: 账号ID
+    - limit: 每页条数（默认 50，最大 TASK_PAGE_MAX_LIMIT）
+    - cursor: 上一页返回的 next_cursor
+    - status: 状态筛选，多个状态用逗号分隔，如 pending,running
+    - created_from / created_to: 创建时间范围，如 2026-01-01 或 2026-01-01T08:00:00（止时间不含）
+    - fields: full（全部字段）/ summary（不含大文本字段）
+    """
     try:
-        if account_id:
-            tasks = db.get_tasks_by_account(account_id)
-        else:
-            tasks = db.get_all_tasks()
-        return {"success": True, "data": tasks}
+        paginated = any(value is not None for value in (limit, cursor, status, created_from, created_to)) \
+            or fields != "full"
+        
+        if not paginated:
+            if account_id:
+                tasks = db.get_tasks_by_account(account_id)
+            else:
+                tasks = db.get_all_tasks()
+            return {"success": True, "data": tasks}
+        
+        if fields not in ("full", "summary"):
+            raise HTTPException(status_code=400, detail="fields 只能是 full 或 summary")
+        
+        limit = limit or 50
+        if limit < 1 or limit > config.TASK_PAGE_MAX_LIMIT:
+            raise HTTPException(status_code=400, detail=f"limit 必须在 1~{config.TASK_PAGE_MAX_LIMIT} 之间")
+        
+        for name, value in (("created_from", created_from), ("created_to", created_to)):
+            if value:
+                try:
+                    datetime.fromisoformat(value)
+                except ValueError:
+                    raise HTTPException(status_code=400, detail=f"{name} 时间格式无效: {value}")
+        
+        statuses = [s.strip() for s in status.split(",") if s.strip()] if status else None
+        
+        page = db.get_tasks_page(
+            limit,
+            cursor=cursor,
+            statuses=statuses,
+            account_id=account_id,
+            created_from=created_from,
+            created_to=created_to,
+            summary=(fields == "summary")
+        )
+        counts = db.count_tasks(statuses, account_id, created_from, created_to)
+        
+        return {
+            "success": True,
+            "data": page['tasks'],
+            "next_cursor": page['next_cursor'],
+            "has_more": page['next_cursor'] is not None,
+            "total": counts['total'],
+            "status_counts": counts['status_counts']
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/tasks/{task_id}")
-async def get_task(task_id: int):
+@offload
+def get_task(task_id: int):
     """获取单个任务详情"""
     try:
         task = db.get_task_by_id(task_id)
@@ -234,7 +405,8 @@ async def get_task(task_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/tasks/{task_id}/execute")
-async def execute_task(task_id: int, background_tasks: BackgroundTasks):
+@offload
+def execute_task(task_id: int, background_tasks: BackgroundTasks):
     """执行单个任务"""
     try:
         background_tasks.add_task(window_manager.execute_task, task_id)
@@ -243,16 +415,20 @@ async def execute_task(task_id: int, background_tasks: BackgroundTasks):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/tasks/{task_id}")
-async def delete_task(task_id: int):
+@offload
+def delete_task(task_id: int):
     """删除任务"""
     try:
         db.delete_task(task_id)
+        # 正在执行的任务停止操作浏览器，执行线程退出后释放窗口
+        window_manager.cancel_task(task_id, '任务已删除')
         return {"success": True, "message": "任务已删除"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/tasks/{task_id}/retry")
-async def retry_task(task_id: int):
+@offload
+def retry_task(task_id: int):
     """重试失败的任务"""
     try:
         # 获取任务信息
@@ -277,6 +453,10 @@ async def retry_task(task_id: int):
         conn.commit()
         conn.close()
         
+        # 任务仍在执行时停止本次执行
+        window_manager.cancel_task(task_id, '任务已重试')
+        window_manager.notify_tasks_available()
+        
         return {"success": True, "message": "任务已重置为待处理状态"}
     except HTTPException:
         raise
@@ -284,7 +464,8 @@ async def retry_task(task_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/tasks/{task_id}/terminate")
-async def terminate_task(task_id: int):
+@offload
+def terminate_task(task_id: int):
     """终止进行中的任务"""
     try:
         # 获取任务信息
@@ -312,35 +493,44 @@ async def terminate_task(task_id: int):
         conn.commit()
         conn.close()
         
-        # 如果任务有关联的窗口，将窗口标记为空闲
-        if task.get('profile_id'):
+        # 停止正在执行的自动化：执行线程在下一个检查点（最多一个轮询间隔）退出后才释放窗口，
+        # 避免窗口在浏览器仍被上一个任务操作时又被分派新任务
+        cancel_state = window_manager.cancel_task(task_id, '手动终止')
+        if cancel_state is None and task.get('profile_id'):
+            # 任务不在本进程中执行（如执行线程已退出），直接释放窗口
             profile_id = task['profile_id']
-            with window_manager.lock:
-                if profile_id in window_manager.window_status:
-                    window_manager.window_status[profile_id] = {
-                        'status': 'idle',
-                        'current_task_id': None
-                    }
+            window_manager.mark_window_idle(profile_id, task_id)
             print(f"任务 {task_id} 已被手动终止，窗口 {profile_id} 已释放")
         
-        return {"success": True, "message": "任务已终止并退回到待处理队列"}
+        window_manager.notify_tasks_available()
+        
+        message = "任务已终止并退回到待处理队列"
+        if cancel_state == 'running':
+            message += "，执行线程退出后释放窗口"
+        return {"success": True, "message": message}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/tasks/batch-delete")
-async def batch_delete_tasks(task_ids: List[int]):
+@offload
+def batch_delete_tasks(task_ids: List[int]):
     """批量删除任务"""
     try:
         for task_id in task_ids:
             db.delete_task(task_id)
-        return {"success": True, "message": f"已删除 {len(task_ids)} 个任务"}
+        cancelled = window_manager.cancel_tasks(task_ids, '任务已删除')
+        message = f"已删除 {len(task_ids)} 个任务"
+        if cancelled:
+            message += f"，停止了 {cancelled} 个正在执行的任务"
+        return {"success": True, "message": message}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/tasks/batch-retry")
-async def batch_retry_tasks(task_ids: List[int]):
+@offload
+def batch_retry_tasks(task_ids: List[int]):
     """批量重试失败的任务"""
     try:
         for task_id in task_ids:
@@ -359,12 +549,21 @@ async def batch_retry_tasks(task_ids: List[int]):
             conn.commit()
             conn.close()
         
-        return {"success": True, "message": f"已重试 {len(task_ids)} 个任务"}
+        # 仍在执行的任务停止本次执行
+        cancelled = window_manager.cancel_tasks(task_ids, '任务已重试')
+        if task_ids:
+            window_manager.notify_tasks_available()
+        
+        message = f"已重试 {len(task_ids)} 个任务"
+        if cancelled:
+            message += f"，停止了 {cancelled} 个正在执行的任务"
+        return {"success": True, "message": message}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/tasks/{task_id}/publish")
-async def publish_task_video(task_id: int):
+@offload
+def publish_task_video(task_id: int):
     """
     发布任务的视频到 Sora
     
@@ -421,7 +620,8 @@ async def publish_task_video(task_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/tasks/batch-publish")
-async def batch_publish_tasks(task_ids: List[int]):
+@offload
+def batch_publish_tasks(task_ids: List[int]):
     """批量发布任务的视频"""
     try:
         results = []
@@ -467,7 +667,8 @@ async def batch_publish_tasks(task_ids: List[int]):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/tasks/publish-callback")
-async def publish_callback(data: dict):
+@offload
+def publish_callback(data: dict):
     """
     发布成功后的回调
     更新任务的发布信息
@@ -531,7 +732,8 @@ async def publish_callback(data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/v1/tasks/match-by-prompt")
-async def match_task_by_prompt(data: dict):
+@offload
+def match_task_by_prompt(data: dict):
     """
     根据提示词匹配任务并更新视频URL
     
@@ -543,7 +745,9 @@ async def match_task_by_prompt(data: dict):
     {
         "success": true/false,
         "message": "匹配结果说明",
-        "task_id": 任务ID（如果匹配成功）
+        "task_id": 任务ID（如果匹配成功）,
+        "match_type": "exact" / "fuzzy" / "exact_pending",
+        "score": 提示词相似度（0~1，精确匹配为 1）
     }
     """
     try:
@@ -566,120 +770,78 @@ async def match_task_by_prompt(data: dict):
         print(f"  提示词: {prompt[:100]}{'...' if len(prompt) > 100 else ''}")
         print(f"  视频URL: {video_url}")
         
-        # 查询所有运行中的任务（最有可能匹配）
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # 先查询运行中的任务
-        cursor.execute("""
-            SELECT id, prompt, status, start_time
-            FROM tasks
-            WHERE status = 'running'
-            ORDER BY start_time DESC
-        """)
-        
-        running_tasks = cursor.fetchall()
-        print(f"  找到 {len(running_tasks)} 个运行中的任务")
-        
-        # 精确匹配
-        for task in running_tasks:
-            task_id = task['id']
-            task_prompt = task['prompt']
-            status = task['status']
-            start_time = task['start_time']
-            if task_prompt and task_prompt.strip() == prompt:
-                print(f"  ✅ 精确匹配成功！任务ID: {task_id}")
-                
-                # 更新任务状态为成功，并保存视频URL
-                db.update_task_status(
-                    task_id,
-                    'success',
-                    end_time=datetime.now().isoformat(),
-                    video_url=video_url
-                )
-                
-                conn.close()
-                
-                return {
-                    "success": True,
-                    "message": f"任务匹配成功（精确匹配）",
-                    "task_id": task_id,
-                    "match_type": "exact"
-                }
-        
-        # 如果没有精确匹配，尝试模糊匹配（提示词包含关系）
-        for task in running_tasks:
-            task_id = task['id']
-            task_prompt = task['prompt']
-            status = task['status']
-            start_time = task['start_time']
-            if task_prompt:
-                # 检查是否有包含关系（忽略大小写和首尾空格）
-                task_prompt_clean = task_prompt.strip().lower()
-                prompt_clean = prompt.strip().lower()
-                
-                if task_prompt_clean in prompt_clean or prompt_clean in task_prompt_clean:
-                    print(f"  ✅ 模糊匹配成功！任务ID: {task_id}")
-                    print(f"     任务提示词: {task_prompt[:50]}...")
-                    print(f"     视频提示词: {prompt[:50]}...")
-                    
-                    # 更新任务状态
-                    db.update_task_status(
-                        task_id,
-                        'success',
-                        end_time=datetime.now().isoformat(),
-                        video_url=video_url
-                    )
-                    
-                    conn.close()
-                    
-                    return {
-                        "success": True,
-                        "message": f"任务匹配成功（模糊匹配）",
-                        "task_id": task_id,
-                        "match_type": "fuzzy"
-                    }
-        
-        # 如果运行中的任务都不匹配，查询最近的待处理任务
-        cursor.execute("""
-            SELECT id, prompt, status, created_at
-            FROM tasks
-            WHERE status = 'pending'
-            ORDER BY created_at DESC
-            LIMIT 10
-        """)
-        
-        pending_tasks = cursor.fetchall()
-        print(f"  运行中任务未匹配，检查最近 {len(pending_tasks)} 个待处理任务")
+        # 1. 运行中任务精确匹配（规范化提示词哈希，走数据库索引）
+        matched = db.find_tasks_by_prompt(prompt, ['running'], order_by='start_time DESC')
+        if matched:
+            task_id = matched[0]['id']
+            print(f"  ✅ 精确匹配成功！任务ID: {task_id}")
+            
+            # 更新任务状态为成功，并保存视频URL
+            db.update_task_status(
+                task_id,
+                'success',
+                end_time=datetime.now().isoformat(),
+                video_url=video_url
+            )
+            window_manager.notify_task_change(task_id, status='success', video_url=video_url)
+            
+            return {
+                "success": True,
+                "message": f"任务匹配成功（精确匹配）",
+                "task_id": task_id,
+                "match_type": "exact",
+                "score": 1.0
+            }
         
-        # 精确匹配待处理任务
-        for task in pending_tasks:
+        # 2. 运行中任务模糊匹配（三元组索引，取相似度最高的任务）
+        similar = db.search_similar_prompts(prompt, ['running'], min_score=config.PROMPT_MATCH_MIN_SCORE)
+        if similar:
+            task = similar[0]
             task_id = task['id']
-            task_prompt = task['prompt']
-            status = task['status']
-            created_at = task['created_at']
-            if task_prompt and task_prompt.strip() == prompt:
-                print(f"  ✅ 在待处理任务中找到精确匹配！任务ID: {task_id}")
-                
-                # 更新任务状态
-                db.update_task_status(
-                    task_id,
-                    'success',
-                    start_time=datetime.now().isoformat(),
-                    end_time=datetime.now().isoformat(),
-                    video_url=video_url
-                )
-                
-                conn.close()
-                
-                return {
-                    "success": True,
-                    "message": f"任务匹配成功（待处理任务精确匹配）",
-                    "task_id": task_id,
-                    "match_type": "exact_pending"
-                }
+            print(f"  ✅ 模糊匹配成功！任务ID: {task_id}，相似度: {task['score']}")
+            print(f"     任务提示词: {task['prompt'][:50]}...")
+            print(f"     视频提示词: {prompt[:50]}...")
+            
+            # 更新任务状态
+            db.update_task_status(
+                task_id,
+                'success',
+                end_time=datetime.now().isoformat(),
+                video_url=video_url
+            )
+            window_manager.notify_task_change(task_id, status='success', video_url=video_url)
+            
+            return {
+                "success": True,
+                "message": f"任务匹配成功（模糊匹配）",
+                "task_id": task_id,
+                "match_type": "fuzzy",
+                "score": task['score']
+            }
         
-        conn.close()
+        # 3. 运行中的任务都不匹配，精确匹配最近的待处理任务
+        matched = db.find_tasks_by_prompt(prompt, ['pending'], order_by='created_at DESC')
+        if matched:
+            task_id = matched[0]['id']
+            print(f"  ✅ 在待处理任务中找到精确匹配！任务ID: {task_id}")
+            
+            # 更新任务状态
+            db.update_task_status(
+                task_id,
+                'success',
+                start_time=datetime.now().isoformat(),
+                end_time=datetime.now().isoformat(),
+                video_url=video_url
+            )
+            window_manager.notify_task_change(task_id, status='success', video_url=video_url)
+            
+            return {
+                "success": True,
+                "message": f"任务匹配成功（待处理任务精确匹配）",
+                "task_id": task_id,
+                "match_type": "exact_pending",
+                "score": 1.0
+            }
         
         print(f"  ⚠️ 未找到匹配的任务")
         return {
@@ -693,85 +855,243 @@ async def match_task_by_prompt(data: dict):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+# ==================== 任务事件推送（SSE） ====================
+
+def _task_snapshot_event(task: dict) -> dict:
+    """订阅单个任务时先推送一次当前状态，避免错过订阅之前的变化"""
+    return {
+        'type': 'snapshot',
+        'task_id': task['id'],
+        'timestamp': datetime.now().isoformat(),
+        'status': task.get('status'),
+        'progress': task.get('progress'),
+        'message': task.get('progress_message'),
+        'video_url': task.get('video_url'),
+        'error_message': task.get('error_message')
+    }
+
+async def _task_event_stream(request: Request, task_id: Optional[int] = None, snapshot: Optional[dict] = None):
+    """SSE 事件流：推送任务事件，空闲时每 15 秒发送一次心跳"""
+    subscription = event_bus.subscribe(task_id)
+    try:
+        yield "retry: 3000\n\n"
+        if snapshot:
+            yield format_sse(snapshot)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=15)
+                yield format_sse(event)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": heartbeat\n\n"
+    finally:
+        event_bus.unsubscribe(subscription)
+
+def _sse_response(generator) -> StreamingResponse:
+    return StreamingResponse(
+        generator,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/events/tasks")
+async def stream_task_events(request: Request, task_id: Optional[int] = None):
+    """
+    订阅任务事件（SSE）
+    
+    不带 task_id 时推送所有任务的事件；事件类型:
+    - created: 任务创建
+    - status: 任务状态变化（含 video_url / error_message）
+    - progress: 任务进度变化（progress / message）
+    - deleted: 任务删除
+    - snapshot: 订阅单个任务时的当前状态
+    """
+    snapshot = None
+    if task_id is not None:
+        task = await adb.get_task_by_id(task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="任务不存在")
+        snapshot = _task_snapshot_event(task)
+    return _sse_response(_task_event_stream(request, task_id, snapshot))
+
+@app.get("/api/events/tasks/{task_id}")
+async def stream_single_task_events(request: Request, task_id: int):
+    """订阅单个任务的事件（SSE）"""
+    return await stream_task_events(request, task_id)
+
+@app.get("/api/events/stats")
+async def get_event_stats():
+    """获取事件推送统计（订阅数、已发布事件数、丢弃事件数）"""
+    return {"success": True, "data": event_bus.get_stats()}
+
+# ==================== 后台作业 ====================
+
+@app.get("/api/jobs")
+async def list_jobs(type: Optional[str] = None):
+    """列出后台作业（按创建时间倒序）"""
+    return {"success": True, "data": jobs.list(type)}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询后台作业的状态、进度和结果"""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="作业不存在")
+    return {"success": True, "data": job}
+
+async def _job_event_stream(request: Request, job_id: str, interval: float = 0.5):
+    """SSE 事件流：作业状态或进度变化时推送作业快照，作业结束后关闭连接"""
+    yield "retry: 3000\n\n"
+    last = None
+    idle = 0.0
+    while True:
+        job = jobs.get(job_id)
+        if job is None:
+            break
+        if job != last:
+            yield format_sse(dict(job, event='job'))
+            last = job
+            idle = 0.0
+            if job['status'] in ('success', 'failed'):
+                break
+        elif idle >= 15:
+            if await request.is_disconnected():
+                break
+            yield ": heartbeat\n\n"
+            idle = 0.0
+        await asyncio.sleep(interval)
+        idle += interval
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(request: Request, job_id: str):
+    """订阅后台作业的进度（SSE），可代替轮询 GET /api/jobs/{job_id}"""
+    if not jobs.get(job_id):
+        raise HTTPException(status_code=404, detail="作业不存在")
+    return _sse_response(_job_event_stream(request, job_id))
+
 # ==================== 窗口管理 ====================
 
+def run_open_windows_job(job, profile_ids: List[int]) -> dict:
+    """并行打开窗口：每个窗口进入新阶段或完成时更新作业进度"""
+    lock = threading.Lock()
+    windows = {profile_id: {'stage': 'pending'} for profile_id in profile_ids}
+    summary = {'total': len(windows), 'done': 0, 'success': 0, 'already_open': 0, 'warning': 0, 'error': 0}
+    jobs.update(job, windows=dict(windows), **summary)
+    
+    def on_progress(profile_id, stage, result):
+        with lock:
+            entry = {'stage': stage}
+            if result:
+                entry.update(status=result['status'], message=result['message'])
+                summary['done'] += 1
+                summary[result['status']] = summary.get(result['status'], 0) + 1
+            windows[profile_id] = entry
+            jobs.update(job, windows=dict(windows), **summary)
+    
+    results = window_manager.open_windows(profile_ids, on_progress=on_progress)
+    print(f"✅ 批量打开窗口完成: 成功 {summary['success']} 个, 已打开 {summary['already_open']} 个, "
+          f"需手动登录 {summary['warning']} 个, 失败 {summary['error']} 个")
+    return {'summary': summary, 'results': results}
+
 @app.post("/api/windows/control")
-async def control_windows(control: WindowControl, background_tasks: BackgroundTasks):
-    """批量控制窗口"""
+@offload
+def control_windows(control: WindowControl):
+    """
+    批量控制窗口
+    
+    open: 在后台并行打开窗口，立即返回作业ID，
+          通过 GET /api/jobs/{job_id} 或 GET /api/jobs/{job_id}/events 查看每个窗口的进度
+    close: 在后台并行关闭窗口，立即返回作业ID，作业结果中包含需要强制关闭的窗口
+    """
     try:
         if control.action == "open":
-            result = window_manager.open_windows(control.profile_ids)
-            return {"success": True, "data": result}
+            profile_ids = list(dict.fromkeys(control.profile_ids))
+            job = jobs.create('open_windows', profile_ids=profile_ids)
+            jobs.run_in_background(job, run_open_windows_job, job, profile_ids)
+            return {
+                "success": True,
+                "message": f"正在打开 {len(profile_ids)} 个窗口...",
+                "job_id": job.id,
+                "data": jobs.get(job.id)
+            }
         elif control.action == "close":
-            # 关闭操作改为后台任务，立即返回响应
-            background_tasks.add_task(window_manager.close_windows, control.profile_ids)
-            return {"success": True, "message": f"正在关闭 {len(control.profile_ids)} 个窗口..."}
+            # 关闭操作在后台并行执行，立即返回作业ID，作业结果中包含需要强制关闭的窗口
+            profile_ids = list(dict.fromkeys(control.profile_ids))
+            job = jobs.create('close_windows', profile_ids=profile_ids)
+            jobs.run_in_background(job, window_manager.close_windows, profile_ids)
+            return {
+                "success": True,
+                "message": f"正在关闭 {len(profile_ids)} 个窗口...",
+                "job_id": job.id
+            }
         else:
             raise HTTPException(status_code=400, detail="无效的操作")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/windows/status")
-async def get_windows_status():
-    """获取所有窗口状态"""
+@offload
+def get_windows_status(if_none_match: Optional[str] = Header(None)):
+    """
+    获取所有窗口状态
+    
+    窗口列表和账号来自窗口状态登记表（后台刷新），待处理任务数量和配额来自短时间缓存；
+    响应带 ETag，请求头 If-None-Match 与当前内容一致时返回 304
+    """
     try:
         status = window_manager.get_all_windows_status()
         
-        # 为每个窗口添加待处理任务数量和配额信息
-        pending_tasks = db.get_pending_tasks()
+        # 为每个窗口添加待处理任务数量和配额信息（按窗口分组计数，短时间缓存）
+        pending_counts = db.count_pending_tasks_by_profile()
         
-        conn = db.get_connection()
-        cursor = conn.cursor()
+        # 所有账号的最新配额（一次查询，短时间缓存）
+        latest_quotas = db.get_latest_quotas()
         
         for window in status:
             # 统计分配给该窗口的待处理任务
-            window_pending = sum(1 for t in pending_tasks if t.get('profile_id') == window['profile_id'])
-            window['pending_tasks'] = window_pending
+            window['pending_tasks'] = pending_counts.get(window['profile_id'], 0)
             
             # 🆕 获取该窗口关联账号的配额信息
             window['quota_remaining'] = None
             window_name = window.get('name', '')
             
-            # 尝试从窗口名称中提取邮箱（窗口名称通常就是邮箱）
-            try:
-                # 方法1: 窗口名称直接匹配邮箱
-                if '@' in window_name:
-                    cursor.execute("""
-                        SELECT sq.estimated_num_videos_remaining
-                        FROM sora_quota sq
-                        WHERE sq.account_email = %s
-                        ORDER BY sq.created_at DESC
-                        LIMIT 1
-                    """, (window_name,))
-                    result = cursor.fetchone()
-                    
-                    if result and result['estimated_num_videos_remaining'] is not None:
-                        window['quota_remaining'] = result['estimated_num_videos_remaining']
-                        window['account_email'] = window_name
-                        
-            except Exception as e:
-                print(f"  ⚠️ 获取窗口 {window['profile_id']} 配额失败: {e}")
-        
-        conn.close()
+            # 窗口名称通常就是账号邮箱
+            quota = latest_quotas.get(window_name) if '@' in window_name else None
+            if quota and quota['estimated_num_videos_remaining'] is not None:
+                window['quota_remaining'] = quota['estimated_num_videos_remaining']
+                window['account_email'] = window_name
         
         # 添加未分配窗口的任务数量
-        unassigned_tasks = sum(1 for t in pending_tasks if not t.get('profile_id'))
+        unassigned_tasks = pending_counts.get(None, 0) + pending_counts.get(0, 0)
         
         # 🆕 按配额剩余次数降序排序（次数多的在前面，None 值放最后）
         status.sort(key=lambda x: (x['quota_remaining'] is None, -(x['quota_remaining'] or 0)))
         
-        return {
+        payload = {
             "success": True, 
             "data": status,
-            "unassigned_tasks": unassigned_tasks
+            "unassigned_tasks": unassigned_tasks,
+            "reattach": window_manager.get_reattach_progress(),
+            "registry": window_manager.window_registry.get_stats()
         }
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    
+    # 刷新时间等每次都会变化的字段不参与 ETag 计算
+    etag_source = dict(payload, registry={k: v for k, v in payload['registry'].items()
+                                          if k not in ('refresh_count', 'refreshed_at')})
+    body = json.dumps(payload, ensure_ascii=False, default=str)
+    etag = '"' + hashlib.sha1(json.dumps(etag_source, sort_keys=True, default=str).encode('utf-8')).hexdigest() + '"'
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
 
 @app.get("/api/windows/{profile_id}/status")
-async def get_window_status(profile_id: int):
+@offload
+def get_window_status(profile_id: int):
     """获取单个窗口状态"""
     try:
         status = window_manager.get_window_status(profile_id)
@@ -782,7 +1102,8 @@ async def get_window_status(profile_id: int):
 # ==================== 统计信息 ====================
 
 @app.get("/api/stats")
-async def get_stats():
+@offload
+def get_stats():
     """获取统计信息"""
     try:
         stats = db.get_statistics()
@@ -790,6 +1111,58 @@ async def get_stats():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/stats/db-pool")
+async def get_db_pool_stats():
+    """获取数据库连接池统计信息（连接数、等待次数、等待耗时等）"""
+    try:
+        return {"success": True, "data": db.get_pool_stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/stats/db-executor")
+async def get_db_executor_stats():
+    """获取阻塞调用线程池统计信息（执行中、排队中、已完成数量）"""
+    return {"success": True, "data": db_executor.get_stats()}
+
+@app.get("/api/stats/pipeline")
+async def get_pipeline_stats():
+    """获取任务流水线统计信息（每个窗口正在生成的任务数、完成 / 失败 / 超时次数等）"""
+    return {"success": True, "data": window_manager.get_pipeline_stats()}
+
+@app.get("/api/stats/watchdog")
+@offload
+def get_watchdog_stats(limit: int = 50):
+    """获取任务看门狗状态（各阶段截止时间、正在跟踪的任务）和最近的介入记录"""
+    try:
+        stats = window_manager.get_watchdog_stats()
+        stats['interventions'] = db.get_task_interventions(min(max(limit, 1), 500))
+        return {"success": True, "data": stats}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/stats/cooldown")
+async def get_cooldown_stats():
+    """获取每个窗口的自适应冷却状态（当前冷却时间、学到的每小时提交速率、最近的限流信号等）"""
+    return {"success": True, "data": window_manager.get_cooldown_stats()}
+
+@app.get("/api/stats/quota")
+async def get_quota_stats():
+    """获取账号配额模型（估计剩余视频数、是否等待重置、等待重置的窗口等）"""
+    return {"success": True, "data": window_manager.get_quota_stats()}
+
+@app.get("/api/stats/image-cache")
+async def get_image_cache_stats():
+    """获取参考图缓存统计信息（命中、未命中、淘汰次数、缓存大小等）"""
+    return {"success": True, "data": window_manager.image_cache.get_stats()}
+
+@app.get("/api/stats/progress-buffer")
+async def get_progress_buffer_stats():
+    """获取进度写缓冲统计信息（合并次数、批量写入次数、待写入数量等）"""
+    try:
+        return {"success": True, "data": db.get_progress_buffer_stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ==================== 账号视频统计 ====================
 
 class VideoStatsData(BaseModel):
@@ -802,7 +1175,8 @@ class VideoStatsData(BaseModel):
     lastUpdate: str
 
 @app.post("/v1/videos/stats")
-async def update_video_stats(stats: VideoStatsData):
+@offload
+def update_video_stats(stats: VideoStatsData):
     """
     接收插件发送的视频统计数据
     
@@ -844,7 +1218,7 @@ async def update_video_stats(stats: VideoStatsData):
             
             # 保存视频数据
             save_stats = db.save_sora_videos(account_email, stats.videos)
-            print(f"  ✅ 视频数据已保存: 新增 {save_stats['new']}, 更新 {save_stats['updated']}, 状态变化 {save_stats['status_changed']}")
+            print(f"  ✅ 视频数据已保存: 新增 {save_stats['new']}, 更新 {save_stats['updated']}, 状态变化 {save_stats['status_changed']}, 未变化 {save_stats['unchanged']}")
         
         # 同时保存到内存（用于快速访问）
         if not hasattr(app.state, 'video_stats'):
@@ -872,11 +1246,16 @@ async def update_video_stats(stats: VideoStatsData):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/v1/videos/stats")
-async def get_video_stats():
-    """获取视频统计数据（从数据库读取所有账号）"""
+@offload
+def get_video_stats(include_videos: bool = True):
+    """
+    获取视频统计数据（从数据库读取所有账号）
+    
+    include_videos=false 时只返回每个账号的数量和配额，不返回视频列表
+    """
     try:
-        # 获取所有账号
-        accounts = db.get_all_sora_accounts()
+        # 每个账号的视频数量和最新配额（一次集合查询，短时间缓存）
+        accounts = db.get_sora_account_stats()
         
         if not accounts:
             return {
@@ -886,52 +1265,30 @@ async def get_video_stats():
                 }
             }
         
-        # 获取每个账号的视频数据
+        # 视频列表一次查询全部账号，按账号分组
+        videos_by_account = db.get_sora_videos_grouped() if include_videos else {}
+        
         accounts_data = []
         for account in accounts:
-            account_email = account['email']
-            user_id = account['user_id']
-            
-            # 从数据库获取该账号的所有视频
-            videos = db.get_sora_videos_by_account(account_email)
-            
-            # 🆕 获取该账号的最新配额信息（按账号查询）
-            quota_remaining = None
-            try:
-                conn = db.get_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT estimated_num_videos_remaining, credit_remaining
-                    FROM sora_quota
-                    WHERE account_email = %s
-                    ORDER BY created_at DESC
-                    LIMIT 1
-                """, (account_email,))
-                quota_row = cursor.fetchone()
-                if quota_row:
-                    quota_remaining = quota_row['estimated_num_videos_remaining']
-                conn.close()
-            except Exception as e:
-                print(f"  ⚠️ 获取账号 {account_email} 配额失败: {e}")
-            
-            # 计算统计数据
-            total_videos = len(videos['published']) + len(videos['generating']) + len(videos['unpublished'])
-            
-            accounts_data.append({
+            account_data = {
                 "account": {
                     "email": account['email'],
                     "name": account['name'],
                     "id": account['user_id'],
                     "image": account['image']
                 },
-                "totalVideos": total_videos,
-                "publishedVideos": len(videos['published']),
-                "generatingVideos": len(videos['generating']),
-                "unpublishedVideos": len(videos['unpublished']),
-                "quotaRemaining": quota_remaining,  # 🆕 剩余次数
-                "videos": videos,
+                "totalVideos": account['published'] + account['generating'] + account['unpublished'],
+                "publishedVideos": account['published'],
+                "generatingVideos": account['generating'],
+                "unpublishedVideos": account['unpublished'],
+                "quotaRemaining": account['quota_remaining'],  # 🆕 剩余次数
                 "lastUpdate": account['updated_at']
-            })
+            }
+            if include_videos:
+                account_data["videos"] = videos_by_account.get(
+                    account['email'], {'published': [], 'generating': [], 'unpublished': []}
+                )
+            accounts_data.append(account_data)
         
         # 🆕 按剩余次数降序排序（次数多的在前面，None 值放最后）
         accounts_data.sort(key=lambda x: (x['quotaRemaining'] is None, -(x['quotaRemaining'] or 0)))
@@ -949,7 +1306,8 @@ async def get_video_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/v1/account/stats")
-async def update_account_stats(stats: dict):
+@offload
+def update_account_stats(stats: dict):
     """
     更新账号视频统计数据（来自插件）
     
@@ -992,7 +1350,8 @@ async def update_account_stats(stats: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/v1/account/stats")
-async def get_account_stats():
+@offload
+def get_account_stats():
     """获取账号视频统计数据"""
     try:
         # 这里可以从数据库读取
@@ -1012,7 +1371,8 @@ async def get_account_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/v1/videos/{video_id}/delete")
-async def delete_video(video_id: str):
+@offload
+def delete_video(video_id: str):
     """删除指定的视频"""
     try:
         video_info = db.delete_sora_video(video_id)
@@ -1039,7 +1399,8 @@ async def delete_video(video_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/v1/videos/batch-delete")
-async def batch_delete_videos(video_ids: List[str]):
+@offload
+def batch_delete_videos(video_ids: List[str]):
     """批量删除视频"""
     try:
         count = db.batch_delete_sora_videos(video_ids)
@@ -1085,7 +1446,8 @@ async def debug_test(data: dict):
 # ==================== 多类型数据接收接口 ====================
 
 @app.post("/api/data/capture")
-async def capture_data(data: dict):
+@offload
+def capture_data(data: dict):
     """
     接收插件捕获的各种类型数据
     
@@ -1104,19 +1466,19 @@ async def capture_data(data: dict):
         print(f"\n[数据捕获] 收到 {data_type} 类型数据")
         
         if data_type == 'USER_INFO':
-            return await handle_user_info(data_content)
+            return handle_user_info(data_content)
         elif data_type == 'QUOTA':
-            return await handle_quota(data_content)
+            return handle_quota(data_content)
         elif data_type == 'CREATE_VIDEO':
-            return await handle_create_video(data_content)
+            return handle_create_video(data_content)
         elif data_type == 'VIDEO_PROGRESS':
-            return await handle_video_progress(data_content)
+            return handle_video_progress(data_content)
         elif data_type == 'VIDEO_DETAIL':
-            return await capture_video(data_content)
+            return capture_video.__wrapped__(data_content)
         elif data_type == 'DRAFT':
-            return await handle_draft(data_content)
+            return handle_draft(data_content)
         elif data_type == 'PUBLISHED_VIDEO':
-            return await handle_published_video(data_content)
+            return handle_published_video(data_content)
         else:
             return {"success": False, "message": f"未知的数据类型: {data_type}"}
             
@@ -1127,7 +1489,7 @@ async def capture_data(data: dict):
         return {"success": False, "error": str(e)}
 
 # 处理用户信息
-async def handle_user_info(data: dict):
+def handle_user_info(data: dict):
     try:
         print(f"  用户ID: {data.get('user_id')}")
         print(f"  邮箱: {data.get('email')}")
@@ -1244,7 +1606,7 @@ async def handle_user_info(data: dict):
         raise
 
 # 处理配额信息
-async def handle_quota(data: dict):
+def handle_quota(data: dict):
     try:
         account_email = data.get('account_email')
         user_id = data.get('user_id')
@@ -1265,40 +1627,10 @@ async def handle_quota(data: dict):
             })
             print(f"  ✅ 账号信息已保存")
         
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # 🆕 保存配额信息（包含账号信息）
-        cursor.execute("""
-            INSERT INTO sora_quota (
-                account_email, user_id,
-                remaining, total, used, reset_at,
-                estimated_num_videos_remaining,
-                estimated_num_purchased_videos_remaining,
-                credit_remaining,
-                rate_limit_reached,
-                access_resets_in_seconds,
-                type_status,
-                captured_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            account_email,
-            user_id,
-            data.get('remaining'),
-            data.get('total'),
-            data.get('used'),
-            data.get('reset_at'),
-            data.get('estimated_num_videos_remaining'),
-            data.get('estimated_num_purchased_videos_remaining'),
-            data.get('credit_remaining'),
-            1 if data.get('rate_limit_reached') else 0,
-            data.get('access_resets_in_seconds'),
-            data.get('type_status'),
-            data.get('captured_at')
-        ))
-        
-        conn.commit()
-        conn.close()
+        # 🆕 保存配额信息（写入配额历史，并更新该账号的最新配额）
+        db.save_sora_quota(data)
+        # 更新分派用的配额模型（额度恢复的账号立即重新参与分派）
+        window_manager.update_quota(data)
         
         print(f"  ✅ 配额信息已保存\n")
         return {"success": True, "message": "配额信息已保存"}
@@ -1309,7 +1641,7 @@ async def handle_quota(data: dict):
 
 
 # 处理创建视频
-async def handle_create_video(data: dict):
+def handle_create_video(data: dict):
     try:
         sora_task_id = data.get('task_id')
         prompt = data.get('prompt')
@@ -1350,76 +1682,7 @@ async def handle_create_video(data: dict):
         matched_task_id = None
         if sora_task_id and prompt:
             print(f"  🔍 尝试匹配任务...")
-            
-            # 查询所有运行中或待处理的任务
-            cursor.execute("""
-                SELECT id, prompt, status, sora_task_id
-                FROM tasks
-                WHERE status IN ('running', 'pending')
-                AND sora_task_id IS NULL
-                ORDER BY 
-                    CASE WHEN status = 'running' THEN 0 ELSE 1 END,
-                    id DESC
-            """)
-            
-            tasks = cursor.fetchall()
-            print(f"  找到 {len(tasks)} 个待匹配的任务")
-            
-            # 精确匹配
-            for task in tasks:
-                task_id = task['id']
-                task_prompt = task['prompt']
-                task_status = task['status']
-                existing_sora_id = task['sora_task_id']
-                if task_prompt and task_prompt.strip() == prompt.strip():
-                    print(f"  ✅ 精确匹配成功！任务ID: {task_id}")
-                    
-                    # 更新任务的 sora_task_id
-                    cursor.execute("""
-                        UPDATE tasks 
-                        SET sora_task_id = %s,
-                            status = 'running',
-                            start_time = CASE WHEN start_time IS NULL THEN %s ELSE start_time END
-                        WHERE id = %s
-                    """, (sora_task_id, datetime.now().isoformat(), task_id))
-                    
-                    conn.commit()
-                    matched_task_id = task_id
-                    print(f"  ✅ 任务 {task_id} 已绑定 Sora 任务ID: {sora_task_id}")
-                    break
-            
-            # 如果没有精确匹配，尝试模糊匹配
-            if not matched_task_id:
-                for task in tasks:
-                    task_id = task['id']
-                    task_prompt = task['prompt']
-                    task_status = task['status']
-                    existing_sora_id = task['sora_task_id']
-                    if task_prompt:
-                        task_prompt_clean = task_prompt.strip().lower()
-                        prompt_clean = prompt.strip().lower()
-                        
-                        if task_prompt_clean in prompt_clean or prompt_clean in task_prompt_clean:
-                            print(f"  ✅ 模糊匹配成功！任务ID: {task_id}")
-                            print(f"     任务提示词: {task_prompt[:50]}...")
-                            print(f"     Sora提示词: {prompt[:50]}...")
-                            
-                            # 更新任务的 sora_task_id
-                            cursor.execute("""
-                                UPDATE tasks 
-                                SET sora_task_id = %s,
-                                    status = 'running',
-                                    start_time = CASE WHEN start_time IS NULL THEN %s ELSE start_time END
-                                WHERE id = %s
-                            """, (sora_task_id, datetime.now().isoformat(), task_id))
-                            
-                            conn.commit()
-                            matched_task_id = task_id
-                            print(f"  ✅ 任务 {task_id} 已绑定 Sora 任务ID: {sora_task_id}")
-                            break
-            
-            if not matched_task_id:
-                print(f"  ⚠️ 未找到匹配的任务")
+            matched_task_id = bind_task_by_prompt(sora_task_id, prompt, ['running', 'pending'], 'running')
         
         conn.close()
         
@@ -1436,7 +1699,7 @@ async def handle_create_video(data: dict):
         raise
 
 # 处理视频进度
-async def handle_video_progress(data: dict):
+def handle_video_progress(data: dict):
     try:
         sora_task_id = data.get('task_id')
         status = data.get('status')
@@ -1458,30 +1721,40 @@ async def handle_video_progress(data: dict):
         
         conn = db.get_connection()
         cursor = conn.cursor()
+        task_signal = None  # (任务ID, 任务最新数据)，提交后通知等待中的自动化线程
+        progress_event = None  # (任务ID, 进度, 进度说明)，提交后推送进度事件
+        
+        # Sora 任务是否已进入终态：终态直接写库，中间进度写入进度缓冲合并后批量写库
+        is_terminal = status in ('completed', 'failed')
+        progress_row = {
+            'task_id': sora_task_id,
+            'status': status,
+            'progress_pct': progress_pct,
+            'prompt': prompt,
+            'title': data.get('title'),
+            'thumbnail_url': data.get('thumbnail_url'),
+            'failure_reason': data.get('failure_reason'),
+            'captured_at': data.get('captured_at')
+        }
         
         # 更新或插入进度记录到 sora_task_progress 表
-        cursor.execute("""
-            INSERT INTO sora_task_progress (
-                task_id, status, progress_pct, prompt,
-                title, thumbnail_url, failure_reason, captured_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-                status = VALUES(status),
-                progress_pct = VALUES(progress_pct),
-                prompt = VALUES(prompt),
-                title = VALUES(title),
-                thumbnail_url = VALUES(thumbnail_url),
-                failure_reason = VALUES(failure_reason)
-        """, (
-            sora_task_id,
-            status,
-            progress_pct,
-            prompt,
-            data.get('title'),
-            data.get('thumbnail_url'),
-            data.get('failure_reason'),
-            data.get('captured_at')
-        ))
+        if not is_terminal:
+            db.progress_buffer.put_sora_progress(progress_row)
+        else:
+            db.progress_buffer.discard_sora(sora_task_id)
+            cursor.execute("""
+                INSERT INTO sora_task_progress (
+                    task_id, status, progress_pct, prompt,
+                    title, thumbnail_url, failure_reason, captured_at
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    status = VALUES(status),
+                    progress_pct = VALUES(progress_pct),
+                    prompt = VALUES(prompt),
+                    title = VALUES(title),
+                    thumbnail_url = VALUES(thumbnail_url),
+                    failure_reason = VALUES(failure_reason)
+                """, tuple(progress_row[field] for field in SORA_PROGRESS_FIELDS))
         
         # 查找绑定了这个 sora_task_id 的任务
         cursor.execute("""
@@ -1499,15 +1772,20 @@ async def handle_video_progress(data: dict):
             task_video_url = task['video_url']
             print(f"  📌 找到绑定的任务: ID={task_id}")
             
-            # 更新任务进度
+            # 更新任务进度（中间进度写入缓冲，终态在下面直接写库）
             if progress_pct is not None:
                 progress_int = int(progress_pct * 100)
-                cursor.execute("""
-                    UPDATE tasks
-                    SET progress = %s,
-                        progress_message = %s
-                    WHERE id = %s
-                """, (progress_int, status, task_id))
+                if is_terminal:
+                    db.progress_buffer.discard_task(task_id)
+                    cursor.execute("""
+                        UPDATE tasks
+                        SET progress = %s,
+                            progress_message = %s
+                        WHERE id = %s
+                    """, (progress_int, status, task_id))
+                else:
+                    db.progress_buffer.put_task_progress(task_id, progress_int, status)
+                progress_event = (task_id, progress_int, status)
                 print(f"  ✅ 任务进度已更新: {progress_int}%")
             
             # 如果状态是 completed 且有 generations，说明视频生成完成
@@ -1539,6 +1817,7 @@ async def handle_video_progress(data: dict):
                             progress_message = 'completed'
                         WHERE id = %s
                     """, (video_url, datetime.now().isoformat(), task_id))
+                    task_signal = (task_id, {'status': 'success', 'video_url': video_url, 'generation_id': generation_id})
                     
                     print(f"  ✅ 任务 {task_id} 已标记为成功")
                 else:
@@ -1556,6 +1835,7 @@ async def handle_video_progress(data: dict):
                         end_time = %s
                     WHERE id = %s
                 """, (failure_reason, datetime.now().isoformat(), task_id))
+                task_signal = (task_id, {'status': 'failed', 'error_message': failure_reason})
                 
                 print(f"  ✅ 任务 {task_id} 已标记为失败")
         else:
@@ -1563,108 +1843,34 @@ async def handle_video_progress(data: dict):
             print(f"  ⚠️ 未找到绑定的任务，尝试通过提示词匹配...")
             
             if prompt:
-                # 查询所有运行中、待处理或已成功但未绑定的任务
-                cursor.execute("""
-                    SELECT id, prompt, status
-                    FROM tasks
-                    WHERE status IN ('running', 'pending', 'success')
-                    AND sora_task_id IS NULL
-                    ORDER BY 
-                        CASE 
-                            WHEN status = 'running' THEN 0 
-                            WHEN status = 'pending' THEN 1
-                            WHEN status = 'success' THEN 2
-                            ELSE 3
-                        END,
-                        id DESC
-                """)
-                
-                tasks = cursor.fetchall()
-                print(f"  找到 {len(tasks)} 个待匹配的任务")
-                
-                matched_task_id = None
-                
-                # 精确匹配
-                for task_row in tasks:
-                    task_id = task_row['id']
-                    task_prompt = task_row['prompt']
-                    task_status = task_row['status']
-                    if task_prompt and task_prompt.strip() == prompt.strip():
-                        print(f"  ✅ 精确匹配成功！任务ID: {task_id}")
-                        
-                        # 更新任务的 sora_task_id
+                matched_task_id = bind_task_by_prompt(sora_task_id, prompt, ['running', 'pending', 'success'],
+                                                      'running')
+                if matched_task_id and progress_pct is not None:
+                    # 与已绑定任务相同：终态直接写库，中间进度写入缓冲
+                    progress_int = int(progress_pct * 100)
+                    if is_terminal:
+                        db.progress_buffer.discard_task(matched_task_id)
                         cursor.execute("""
-                            UPDATE tasks 
-                            SET sora_task_id = %s,
-                                status = 'running',
-                                start_time = CASE WHEN start_time IS NULL THEN %s ELSE start_time END
+                            UPDATE tasks
+                            SET progress = %s,
+                                progress_message = %s
                             WHERE id = %s
-                        """, (sora_task_id, datetime.now().isoformat(), task_id))
-                        
-                        matched_task_id = task_id
-                        print(f"  ✅ 任务 {task_id} 已绑定 Sora 任务ID: {sora_task_id}")
-                        
-                        # 更新进度
-                        if progress_pct is not None:
-                            progress_int = int(progress_pct * 100)
-                            cursor.execute("""
-                                UPDATE tasks
-                                SET progress = %s,
-                                    progress_message = %s
-                                WHERE id = %s
-                            """, (progress_int, status, task_id))
-                            print(f"  ✅ 任务进度已更新: {progress_int}%")
-                        
-                        break
-                
-                # 如果没有精确匹配，尝试模糊匹配
-                if not matched_task_id:
-                    for task_row in tasks:
-                        task_id = task_row['id']
-                        task_prompt = task_row['prompt']
-                        task_status = task_row['status']
-                        if task_prompt:
-                            task_prompt_clean = task_prompt.strip().lower()
-                            prompt_clean = prompt.strip().lower()
-                            
-                            if task_prompt_clean in prompt_clean or prompt_clean in task_prompt_clean:
-                                print(f"  ✅ 模糊匹配成功！任务ID: {task_id}")
-                                print(f"     任务提示词: {task_prompt[:50]}...")
-                                print(f"     Sora提示词: {prompt[:50]}...")
-                                
-                                # 更新任务的 sora_task_id
-                                cursor.execute("""
-                                    UPDATE tasks 
-                                    SET sora_task_id = %s,
-                                        status = 'running',
-                                        start_time = CASE WHEN start_time IS NULL THEN %s ELSE start_time END
-                                    WHERE id = %s
-                                """, (sora_task_id, datetime.now().isoformat(), task_id))
-                                
-                                matched_task_id = task_id
-                                print(f"  ✅ 任务 {task_id} 已绑定 Sora 任务ID: {sora_task_id}")
-                                
-                                # 更新进度
-                                if progress_pct is not None:
-                                    progress_int = int(progress_pct * 100)
-                                    cursor.execute("""
-                                        UPDATE tasks
-                                        SET progress = %s,
-                                            progress_message = %s
-                                        WHERE id = %s
-                                    """, (progress_int, status, task_id))
-                                    print(f"  ✅ 任务进度已更新: {progress_int}%")
-                                
-                                break
-                
-                if not matched_task_id:
-                    print(f"  ⚠️ 未找到匹配的任务")
+                        """, (progress_int, status, matched_task_id))
+                    else:
+                        db.progress_buffer.put_task_progress(matched_task_id, progress_int, status)
+                    progress_event = (matched_task_id, progress_int, status)
+                    print(f"  ✅ 任务进度已更新: {progress_int}%")
             else:
                 print(f"  ⚠️ 没有提示词，无法匹配任务")
         
         conn.commit()
         conn.close()
         
+        if progress_event:
+            event_bus.publish('progress', progress_event[0], progress=progress_event[1], message=progress_event[2])
+        if task_signal:
+            notify_task_change(task_signal[0], **task_signal[1])
+        
         print(f"  ✅ 进度已更新\n")
         return {"success": True, "message": "进度已更新"}
         
@@ -1673,7 +1879,7 @@ async def handle_video_progress(data: dict):
         raise
 
 # 处理草稿信息
-async def handle_draft(data: dict):
+def handle_draft(data: dict):
     """
     处理草稿信息，用于绑定任务ID和更新视频URL
     
@@ -1712,12 +1918,14 @@ async def handle_draft(data: dict):
                 cursor = conn.cursor()
                 
                 cursor.execute("""
-                    SELECT id FROM tasks WHERE sora_task_id = %s
+                    SELECT id, profile_id FROM tasks WHERE sora_task_id = %s
                 """, (sora_task_id,))
                 
                 task = cursor.fetchone()
                 if task:
                     task_id = task['id']
+                    # 内容违规也作为限流信号，适度加大该窗口的冷却时间
+                    window_manager.report_content_violation(task['profile_id'])
                     cursor.execute("""
                         UPDATE tasks
                         SET status = 'failed',
@@ -1727,6 +1935,7 @@ async def handle_draft(data: dict):
                     """, (f"内容违规: {reason}", datetime.now().isoformat(), task_id))
                     
                     conn.commit()
+                    notify_task_change(task_id, status='failed', error_message=f"内容违规: {reason}")
                     print(f"  ✅ 任务 {task_id} 已标记为失败（内容违规）")
                 
                 conn.close()
@@ -1740,6 +1949,7 @@ async def handle_draft(data: dict):
         
         conn = db.get_connection()
         cursor = conn.cursor()
+        signal_task_id = None  # 状态更新为 success 的任务，提交后通知等待中的自动化线程
         
         # 查找绑定了这个 sora_task_id 的任务
         cursor.execute("""
@@ -1771,6 +1981,7 @@ async def handle_draft(data: dict):
                         progress_message = 'completed'
                     WHERE id = %s
                 """, (datetime.now().isoformat(), task_id))
+                signal_task_id = task_id
                 
                 print(f"  ✅ 任务 {task_id} 状态已更新为 success")
                 print(f"  ℹ️ 草稿URL不保存到video_url，等待发布后获取permalink")
@@ -1781,116 +1992,22 @@ async def handle_draft(data: dict):
             print(f"  ⚠️ 未找到绑定的任务，尝试通过提示词匹配...")
             
             if prompt:
-                # 构造草稿页面 URL
-                draft_url = f"https://sora.chatgpt.com/d/{draft_id}"
-                
-                # 先尝试精确匹配（只取第一个匹配的任务，实现去重）
-                cursor.execute("""
-                    SELECT id, prompt, status
-                    FROM tasks
-                    WHERE status IN ('running', 'pending', 'success')
-                    AND sora_task_id IS NULL
-                    AND TRIM(prompt) = %s
-                    ORDER BY 
-                        CASE 
-                            WHEN status = 'running' THEN 0 
-                            WHEN status = 'pending' THEN 1
-                            WHEN status = 'success' THEN 2
-                            ELSE 3
-                        END,
-                        id DESC
-                    LIMIT 1
-                """, (prompt.strip(),))
-                
-                exact_match = cursor.fetchone()
-                matched_task_id = None
-                
-                if exact_match:
-                    task_id = exact_match['id']
-                    task_prompt = exact_match['prompt']
-                    task_status = exact_match['status']
-                    print(f"  ✅ 精确匹配成功！任务ID: {task_id}")
-                    print(f"     提示词: {task_prompt[:50]}...")
-                    
-                    # 更新任务的 sora_task_id，但不保存草稿URL到video_url
-                    update_sql = """
-                        UPDATE tasks 
-                        SET sora_task_id = %s,
-                            status = 'success',
-                            end_time = %s,
-                            progress = 100,
-                            progress_message = 'completed'
-                        WHERE id = %s
-                    """
-                    
-                    cursor.execute(update_sql, (sora_task_id, datetime.now().isoformat(), task_id))
-                    matched_task_id = task_id
-                    
-                    print(f"  ✅ 任务 {task_id} 已绑定 Sora 任务ID: {sora_task_id}")
+                # 草稿URL不保存到video_url，等待发布后获取permalink
+                matched_task_id = bind_task_by_prompt(sora_task_id, prompt, ['running', 'pending', 'success'],
+                                                      'success')
+                if matched_task_id:
+                    # 绑定时已推送状态事件，这里只唤醒等待该任务的自动化线程
+                    window_manager.notify_task_change(matched_task_id, status='success', generation_id=draft_id)
                     print(f"  ℹ️ 草稿URL不保存，等待发布后获取permalink")
-                else:
-                    # 如果没有精确匹配，尝试模糊匹配（也只取第一个）
-                    print(f"  ⚠️ 未找到精确匹配，尝试模糊匹配...")
-                    
-                    cursor.execute("""
-                        SELECT id, prompt, status
-                        FROM tasks
-                        WHERE status IN ('running', 'pending', 'success')
-                        AND sora_task_id IS NULL
-                        AND prompt IS NOT NULL
-                        ORDER BY 
-                            CASE 
-                                WHEN status = 'running' THEN 0 
-                                WHEN status = 'pending' THEN 1
-                                WHEN status = 'success' THEN 2
-                                ELSE 3
-                            END,
-                            id DESC
-                    """)
-                    
-                    tasks = cursor.fetchall()
-                    prompt_clean = prompt.strip().lower()
-                    
-                    # 遍历查找模糊匹配（只匹配第一个）
-                    for task_row in tasks:
-                        task_id = task_row['id']
-                        task_prompt = task_row['prompt']
-                        task_status = task_row['status']
-                        if task_prompt:
-                            task_prompt_clean = task_prompt.strip().lower()
-                            
-                            if task_prompt_clean in prompt_clean or prompt_clean in task_prompt_clean:
-                                print(f"  ✅ 模糊匹配成功！任务ID: {task_id}")
-                                print(f"     任务提示词: {task_prompt[:50]}...")
-                                print(f"     草稿提示词: {prompt[:50]}...")
-                                
-                                # 更新任务的 sora_task_id，但不保存草稿URL到video_url
-                                update_sql = """
-                                    UPDATE tasks 
-                                    SET sora_task_id = %s,
-                                        status = 'success',
-                                        end_time = %s,
-                                        progress = 100,
-                                        progress_message = 'completed'
-                                    WHERE id = %s
-                                """
-                                
-                                cursor.execute(update_sql, (sora_task_id, datetime.now().isoformat(), task_id))
-                                matched_task_id = task_id
-                                
-                                print(f"  ✅ 任务 {task_id} 已绑定 Sora 任务ID: {sora_task_id}")
-                                print(f"  ℹ️ 草稿URL不保存，等待发布后获取permalink")
-                                
-                                break
-                    
-                    if not matched_task_id:
-                        print(f"  ⚠️ 未找到匹配的任务")
             else:
                 print(f"  ⚠️ 没有提示词，无法匹配任务")
         
         conn.commit()
         conn.close()
         
+        if signal_task_id:
+            notify_task_change(signal_task_id, status='success', generation_id=draft_id)
+        
         print(f"  ✅ 草稿处理完成\n")
         return {"success": True, "message": "草稿已处理"}
         
@@ -1901,7 +2018,7 @@ async def handle_draft(data: dict):
         raise
 
 # 处理已发布视频
-async def handle_published_video(data: dict):
+def handle_published_video(data: dict):
     """
     处理已发布视频信息
     
@@ -1952,7 +2069,7 @@ async def handle_published_video(data: dict):
         # 方法 1: 通过 sora_task_id 查找任务
         if sora_task_id:
             cursor.execute("""
-                SELECT id, prompt, status, video_url
+                SELECT id, prompt, status, video_url, profile_id
                 FROM tasks
                 WHERE sora_task_id = %s
             """, (sora_task_id,))
@@ -1978,18 +2095,14 @@ async def handle_published_video(data: dict):
                 """, (post_id, permalink, data.get('posted_at'), task_id))
                 
                 conn.commit()
+                notify_task_change(task_id, status='published')
                 print(f"  ✅ 任务 {task_id} 已更新为已发布状态")
                 print(f"  ✅ Permalink: {permalink}")
                 
                 # 🆕 释放窗口：任务真正完成了
                 if task['profile_id']:
                     profile_id = task['profile_id']
-                    with window_manager.lock:
-                        if profile_id in window_manager.window_status:
-                            window_manager.window_status[profile_id] = {
-                                'status': 'idle',
-                                'current_task_id': None
-                            }
+                    window_manager.mark_window_idle(profile_id, task_id)
                     print(f"  ✅ 窗口 {profile_id} 已释放（任务已发布）")
             else:
                 print(f"  ⚠️ 未找到绑定的任务 (sora_task_id={sora_task_id})")
@@ -2083,7 +2196,8 @@ class VideoCaptureData(BaseModel):
     captured_at: Optional[str] = None
 
 @app.post("/api/videos/capture")
-async def capture_video(data: VideoCaptureData):
+@offload
+def capture_video(data: VideoCaptureData):
     """
     接收插件抓包的视频数据
     
@@ -2245,6 +2359,7 @@ async def capture_video(data: VideoCaptureData):
             
             conn.commit()
             conn.close()
+            db.sora_stats_cache.invalidate()
         except Exception as e:
             print(f"     ⚠️ 同步到 sora_videos 失败: {e}")
             import traceback
@@ -2305,6 +2420,8 @@ async def capture_video(data: VideoCaptureData):
                           data.posted_at, task_id))
                     
                     conn.commit()
+                    notify_task_change(task_id, status='published',
+                                       video_url=data.downloadable_url or data.video_url)
                     print(f"  ✅ 任务 {task_id} 已更新: running → published")
                     print(f"  ✅ Permalink: {data.permalink}")
                     
@@ -2319,16 +2436,11 @@ async def capture_video(data: VideoCaptureData):
                     
                     # 释放窗口
                     if profile_id:
-                        with window_manager.lock:
-                            if profile_id in window_manager.window_status:
-                                old_status = window_manager.window_status[profile_id]['status']
-                                window_manager.window_status[profile_id] = {
-                                    'status': 'idle',
-                                    'current_task_id': None
-                                }
-                                print(f"  ✅ 窗口 {profile_id} 已释放: {old_status} → idle")
-                            else:
-                                print(f"  ⚠️ 窗口 {profile_id} 不在管理器中")
+                        old_status = window_manager.mark_window_idle(profile_id, task_id)
+                        if old_status:
+                            print(f"  ✅ 窗口 {profile_id} 已释放: {old_status} → idle")
+                        else:
+                            print(f"  ⚠️ 窗口 {profile_id} 不在管理器中")
                     else:
                         print(f"  ⚠️ 任务 {task_id} 没有关联窗口")
                 else:
@@ -2364,7 +2476,7 @@ async def capture_video(data: VideoCaptureData):
         if not data.task_id and not data.generation_id and (data.prompt or data.text):
             prompt_to_match = data.prompt or data.text
             try:
-                match_result = await match_task_by_prompt({
+                match_result = match_task_by_prompt.__wrapped__({
                     'prompt': prompt_to_match,
                     'video_url': data.downloadable_url or data.video_url
                 })
@@ -2388,7 +2500,8 @@ async def capture_video(data: VideoCaptureData):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/videos/captured")
-async def get_captured_videos(
+@offload
+def get_captured_videos(
     limit: int = 50,
     offset: int = 0,
     username: Optional[str] = None
@@ -2438,7 +2551,8 @@ async def get_captured_videos(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/videos/captured/{video_id}")
-async def get_captured_video(video_id: int):
+@offload
+def get_captured_video(video_id: int):
     """获取单个抓包视频详情"""
     try:
         conn = db.get_connection()
@@ -2464,7 +2578,8 @@ async def get_captured_video(video_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/videos/captured/{video_id}")
-async def delete_captured_video(video_id: int):
+@offload
+def delete_captured_video(video_id: int):
     """删除抓包的视频"""
     try:
         conn = db.get_connection()
@@ -2490,7 +2605,8 @@ async def delete_captured_video(video_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/videos/captured/stats")
-async def get_captured_videos_stats():
+@offload
+def get_captured_videos_stats():
     """获取抓包视频统计信息"""
     try:
         conn = db.get_connection()
@@ -2533,7 +2649,8 @@ async def get_captured_videos_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/v1/videos/{video_id}/prompt")
-async def update_video_prompt(video_id: str, data: dict):
+@offload
+def update_video_prompt(video_id: str, data: dict):
     """更新视频的提示词"""
     try:
         prompt = data.get('prompt')
@@ -2611,7 +2728,8 @@ async def update_config(config_update: ConfigUpdate):
 # ==================== 对外API - 视频任务管理 ====================
 
 @app.post("/v1/videos")
-async def create_video_task(request: VideoCreateRequest, authorization: str = Header(None)):
+@offload
+def create_video_task(request: VideoCreateRequest, authorization: str = Header(None)):
     """
     创建视频生成任务（对外API）
     
@@ -2642,6 +2760,8 @@ async def create_video_task(request: VideoCreateRequest, authorization: str = He
             task_id=request.id
         )
         
+        window_manager.notify_tasks_available()
+        
         return {
             "id": task_id,
             "status": "pending",
@@ -2660,8 +2780,37 @@ async def create_video_task(request: VideoCreateRequest, authorization: str = He
             detail=str(e)
         )
 
+@app.get("/v1/videos/{video_id}/events")
+async def stream_video_events(request: Request, video_id: str, authorization: str = Header(None)):
+    """
+    订阅视频生成进度（对外API，SSE）
+    
+    需要 Authorization 头: Bearer <API密钥>
+    
+    连接后先推送一次当前状态（snapshot），之后推送 status / progress 事件，
+    可代替轮询 GET /v1/videos/{video_id}
+    """
+    verify_api_key(authorization)
+    
+    raw_id = video_id
+    for prefix in ('video_', 'task_'):
+        if raw_id.startswith(prefix):
+            raw_id = raw_id[len(prefix):]
+            break
+    try:
+        task_id = int(raw_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid video_id format")
+    
+    task = await adb.get_task_by_id(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    return _sse_response(_task_event_stream(request, task_id, _task_snapshot_event(task)))
+
 @app.get("/v1/videos/{video_id}")
-async def get_video_progress(video_id: str, authorization: str = Header(None)):
+@offload
+def get_video_progress(video_id: str, authorization: str = Header(None)):
     """
     查询视频生成进度（对外API）
     
@@ -2782,7 +2931,8 @@ draft_queue = []
 draft_queue_lock = None
 
 @app.post("/api/drafts/queue")
-async def add_to_draft_queue(data: dict):
+@offload
+def add_to_draft_queue(data: dict):
     """
     接收 plug-renwu 发送的未发布草稿队列
     
@@ -2841,7 +2991,8 @@ async def add_to_draft_queue(data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/drafts/queue")
-async def get_draft_queue():
+@offload
+def get_draft_queue():
     """
     获取当前的草稿队列
     plug-in 通过此接口获取待发布的草稿
@@ -2861,7 +3012,8 @@ async def get_draft_queue():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/drafts/queue/{draft_id}")
-async def remove_from_draft_queue(draft_id: str):
+@offload
+def remove_from_draft_queue(draft_id: str):
     """
     从队列中移除已处理的草稿
     """
@@ -2891,7 +3043,8 @@ async def remove_from_draft_queue(draft_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/drafts/queue/clear")
-async def clear_draft_queue():
+@offload
+def clear_draft_queue():
     """
     清空草稿队列
     """
@@ -2921,13 +3074,10 @@ async def image_proxy(url: str):
     图片代理接口，解决跨域问题
     """
     try:
-        import requests
         from fastapi.responses import Response
         
-        # 下载图片
-        response = requests.get(url, timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        # 下载图片（异步客户端，不阻塞事件循环）
+        response = await get_http_client().get(url)
         
         if response.status_code == 200:
             # 返回图片内容
@@ -2943,7 +3093,7 @@ async def image_proxy(url: str):
         else:
             raise HTTPException(status_code=response.status_code, detail="图片加载失败")
             
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"图片加载失败: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2965,13 +3115,13 @@ if __name__ == "__main__":
 # ==================== 自动发布相关接口 ====================
 
 @app.get("/api/drafts/unpublished")
-async def get_unpublished_drafts():
+@offload
+def get_unpublished_drafts():
     """
     获取未发布的草稿列表（用于 plug-in 自动发布）
     返回包含 task_id 和 draft_url 的草稿列表
     """
     try:
-        db = Database()
         conn = db.get_connection()
         cursor = conn.cursor()
         
@@ -3029,7 +3179,8 @@ async def get_unpublished_drafts():
 
 
 @app.post("/api/drafts/publish-result")
-async def receive_publish_result(data: dict):
+@offload
+def receive_publish_result(data: dict):
     """
     接收 plug-in 发布结果的回调
     更新任务的发布状态和 URL
@@ -3042,6 +3193,11 @@ async def receive_publish_result(data: dict):
         
         if not task_id:
             raise HTTPException(status_code=400, detail="缺少 task_id")
+        try:
+            # 事件订阅按整数任务ID匹配
+            task_id = int(task_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="task_id 无效")
         
         print(f"\n[发布结果回调] 任务 {task_id}")
         print(f"  成功: {success}")
@@ -3049,7 +3205,6 @@ async def receive_publish_result(data: dict):
         if error:
             print(f"  错误: {error}")
         
-        db = Database()
         conn = db.get_connection()
         cursor = conn.cursor()
         
@@ -3079,6 +3234,11 @@ async def receive_publish_result(data: dict):
         conn.commit()
         conn.close()
         
+        if success and published_url:
+            notify_task_change(task_id, status='published', permalink=published_url)
+        else:
+            notify_task_change(task_id, status='publish_failed', error_message=error)
+        
         return {
             "success": True,
             "message": "发布结果已记录"
@@ -3093,7 +3253,8 @@ async def receive_publish_result(data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/publish/result")
-async def receive_plugin_publish_result(data: dict):
+@offload
+def receive_plugin_publish_result(data: dict):
     """
     接收 plug-in 插件的发布结果
     建立 draft_id 和 post_id 的绑定关系
@@ -3224,19 +3385,16 @@ async def receive_plugin_publish_result(data: dict):
                 
                 conn.commit()
                 conn.close()
+                db.sora_stats_cache.invalidate()
                 
+                notify_task_change(local_task_id, status='published', generation_id=generation_id)
                 print(f"  ✅ 任务 {local_task_id} 已更新")
                 print(f"  ✅ 绑定关系: draft_id={draft_id} → post_id={post_id}")
                 
                 # 🆕 释放窗口：任务真正完成了
                 if profile_row and profile_row.get('profile_id'):
                     profile_id = profile_row['profile_id']
-                    with window_manager.lock:
-                        if profile_id in window_manager.window_status:
-                            window_manager.window_status[profile_id] = {
-                                'status': 'idle',
-                                'current_task_id': None
-                            }
+                    window_manager.mark_window_idle(profile_id, local_task_id)
                     print(f"  ✅ 窗口 {profile_id} 已释放（任务已发布）")
                 
                 print(f"{'='*80}\n")
@@ -3286,6 +3444,7 @@ async def receive_plugin_publish_result(data: dict):
         
         conn.commit()
         conn.close()
+        db.sora_stats_cache.invalidate()
         
         print(f"  ✅ 绑定关系已保存到 draft_post_binding 表")
         print(f"  ✅ 绑定: draft_id={draft_id} → post_id={post_id}")
@@ -3317,7 +3476,8 @@ draft_queue = []
 draft_queue_lock = None
 
 @app.post("/api/drafts/queue")
-async def add_to_draft_queue(data: dict):
+@offload
+def add_to_draft_queue(data: dict):
     """
     接收 plug-renwu 发送的未发布草稿队列
     
@@ -3376,7 +3536,8 @@ async def add_to_draft_queue(data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/drafts/queue")
-async def get_draft_queue():
+@offload
+def get_draft_queue():
     """
     获取当前的草稿队列
     plug-in 通过此接口获取待发布的草稿
@@ -3396,7 +3557,8 @@ async def get_draft_queue():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/drafts/queue/{draft_id}")
-async def remove_from_draft_queue(draft_id: str):
+@offload
+def remove_from_draft_queue(draft_id: str):
     """
     从队列中移除已处理的草稿
     """
@@ -3426,7 +3588,8 @@ async def remove_from_draft_queue(draft_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/drafts/queue/clear")
-async def clear_draft_queue():
+@offload
+def clear_draft_queue():
     """
     清空草稿队列
     """
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+异步数据访问层
+
+pymysql、ixBrowser 客户端等都是阻塞调用，直接在 async 接口中调用会卡住事件循环，
+一个慢查询就会拖慢所有请求（包括插件的捕获回调）。
+
+- BlockingExecutor: 专用的有界线程池，阻塞调用在其中执行，并发数不超过连接池大小
+- offload: 把同步的接口处理函数包装成 async 函数，函数体在线程池中执行
+- AsyncDatabase: Database 的异步代理，await adb.get_task_by_id(...) 等价于在线程池中调用 db.get_task_by_id(...)
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+
+class BlockingExecutor:
+    def __init__(self, max_workers: int, name: str = 'db-io'):
+        """
+        Args:
+            max_workers: 最多同时执行的阻塞调用数量，超过的调用排队等待
+            name: 线程名前缀
+        """
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._completed = 0
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """在线程池中执行阻塞调用并等待结果"""
+        with self._lock:
+            self._queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._call, func, args, kwargs))
+
+    def _call(self, func, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+
+    def offload(self, func: Callable) -> Callable:
+        """
+        装饰器：把同步函数包装成在线程池中执行的 async 函数
+
+        保留原函数签名，可以直接用作 FastAPI 接口处理函数；
+        其他同步代码需要直接调用时使用 func.__wrapped__
+        """
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await self.run(func, *args, **kwargs)
+        return wrapper
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'active': self._active,
+                'queued': self._queued,
+                'completed': self._completed
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+class AsyncDatabase:
+    """Database 的异步代理：方法调用在 BlockingExecutor 中执行"""
+
+    def __init__(self, db, executor: BlockingExecutor):
+        self._db = db
+        self._executor = executor
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await self._executor.run(attr, *args, **kwargs)
+        call.__name__ = name
+        return call
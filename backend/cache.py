@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+简单的进程内 TTL 缓存
+
+用于缓存统计、计数等聚合查询结果：写操作后主动失效，
+插件回调等绕过 Database 方法直接写库的情况由过期时间兜底。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    def __init__(self, ttl: float, max_size: int = 256):
+        """
+        Args:
+            ttl: 缓存有效期（秒）
+            max_size: 最多缓存的键数量，超过后淘汰最久未使用的键
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._hits = 0
+        self._misses = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """命中且未过期时返回缓存值，否则调用 loader 加载并缓存"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                self._data.move_to_end(key)
+                self._hits += 1
+                return item[1]
+            self._misses += 1
+
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable = None):
+        """使指定键失效；不传键时清空全部缓存"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {'size': len(self._data), 'hits': self._hits, 'misses': self._misses, 'ttl': self.ttl}
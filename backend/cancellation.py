@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务取消令牌
+
+终止任务以前只把数据库中的任务改回待处理并把窗口标记为空闲，执行任务的线程仍在操作浏览器，
+分派器可能把这个"空闲"窗口再分给另一个任务。现在每次执行任务都带一个 CancelToken：
+终止 / 批量操作 / 看门狗取消任务时设置令牌，自动化在每个步骤之间和等待生成的每次轮询中检查，
+线程真正退出后才释放窗口。
+"""
+
+import threading
+from typing import Optional
+
+
+class TaskCancelled(Exception):
+    """任务已被取消（由自动化在检查点抛出）"""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason: str) -> bool:
+        """
+        取消任务（重复取消时保留第一次的原因）
+
+        Returns:
+            是否是第一次取消
+        """
+        if self._event.is_set():
+            return False
+        self.reason = reason
+        self._event.set()
+        return True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelled(self.reason)
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        """等待 timeout 秒（代替 time.sleep），任务被取消时立即返回 True"""
+        return self._event.wait(timeout)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务完成信号登记表
+
+自动化线程执行任务时登记任务ID并阻塞等待；插件回调（进度、草稿、提示词匹配、发布）
+更新任务状态后在同一进程内发出信号，等待的线程立即被唤醒，
+不再需要每隔几秒通过 HTTP 请求自己的后端查询任务状态。
+"""
+
+import threading
+from typing import Callable, Dict, Optional
+
+
+class _Completion:
+    def __init__(self, callback=None):
+        self.event = threading.Event()
+        self.info = {}
+        self.callback = callback
+
+
+class CompletionRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # task_id -> _Completion
+
+    def register(self, task_id: int, callback: Callable[[Dict], None] = None):
+        """
+        登记等待的任务（重复登记会清除之前的信号）
+
+        Args:
+            callback: 收到信号时在发出信号的线程中回调 callback(任务最新数据)，
+                      用于没有线程阻塞等待的任务（流水线模式）；回调负责在任务结束后 discard
+        """
+        with self._lock:
+            self._entries[task_id] = _Completion(callback)
+
+    def discard(self, task_id: int):
+        """任务执行结束，移除登记"""
+        with self._lock:
+            self._entries.pop(task_id, None)
+
+    def is_registered(self, task_id: int) -> bool:
+        with self._lock:
+            return task_id in self._entries
+
+    def signal(self, task_id: int, **info) -> bool:
+        """
+        发出任务状态变化信号
+
+        Args:
+            task_id: 本地任务ID
+            info: 任务最新数据（status / video_url / generation_id / error_message 等）
+
+        Returns:
+            是否有线程在等待该任务（未登记的任务直接忽略）
+        """
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is None:
+                return False
+            entry.info.update({k: v for k, v in info.items() if v is not None})
+            info_snapshot = dict(entry.info)
+        entry.event.set()
+        if entry.callback is not None:
+            try:
+                entry.callback(info_snapshot)
+            except Exception as e:
+                print(f"任务 {task_id} 完成回调出错: {e}")
+        return True
+
+    def wait(self, task_id: int, timeout: float) -> Optional[Dict]:
+        """
+        等待任务状态变化信号
+
+        Returns:
+            收到信号时返回任务最新数据（并清除信号，以便继续等待下一次变化）；超时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(task_id)
+        if entry is None:
+            return None
+        if not entry.event.wait(timeout):
+            return None
+        with self._lock:
+            entry.event.clear()
+            return dict(entry.info)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._entries)
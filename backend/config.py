@@ -5,6 +5,8 @@
 配置文件
 """
 
+import os
+
 # ==================== 数据库配置 ====================
 # 使用 MySQL 数据库
 DATABASE_TYPE = "mysql"
@@ -19,6 +21,18 @@ MYSQL_CONFIG = {
     "charset": "utf8mb4"
 }
 
+# MySQL 连接池配置
+MYSQL_POOL_CONFIG = {
+    "max_size": 20,                # 最大连接数（含已借出的连接）
+    "max_lifetime": 1800,          # 连接最长存活时间（秒），超过后关闭重建
+    "health_check_interval": 30,   # 空闲超过该时间的连接在借出前先 ping 检查（秒）
+    "wait_timeout": 10             # 连接池耗尽时最长等待时间（秒）
+}
+
+# 接口中阻塞调用（数据库、ixBrowser 客户端）专用线程池的大小
+# 需小于连接池最大连接数，为执行任务的自动化线程保留连接
+ASYNC_DB_MAX_WORKERS = 16
+
 # ==================== 窗口管理配置 ====================
 # 后端关闭时是否自动关闭所有窗口
 # True: 关闭后端时自动关闭所有通过系统打开的窗口
@@ -29,3 +43,131 @@ AUTO_CLOSE_WINDOWS_ON_SHUTDOWN = True
 # True: 启动时自动检测并连接到已打开的窗口
 # False: 启动时不检测已打开的窗口
 AUTO_DETECT_OPEN_WINDOWS_ON_STARTUP = True
+
+# 批量打开窗口时同时启动的窗口数量
+# 每个窗口的启动、登录检测、导航都要等待浏览器，并行执行可大幅缩短批量打开的耗时
+WINDOW_OPEN_CONCURRENCY = 5
+
+# 启动时同时重新连接的已打开窗口数量（只连接 ixBrowser 报告为已打开的窗口）
+WINDOW_REATTACH_CONCURRENCY = 10
+
+# 窗口状态登记表刷新 ixBrowser 窗口列表的间隔（秒）
+# 窗口状态接口直接读取内存中的窗口列表；账号变更后会立即重新加载账号索引
+WINDOW_LIST_REFRESH_INTERVAL = 30
+
+# 批量关闭窗口时同时关闭的窗口数量
+WINDOW_CLOSE_CONCURRENCY = 10
+
+# 批量关闭窗口的整体截止时间（秒），到时仍未关闭的窗口通过 API 强制关闭（含后端退出时的自动关闭）
+WINDOW_CLOSE_TIMEOUT = 60
+
+# 单个窗口清理浏览器的最长等待时间（秒），超时后通过 API 强制关闭
+WINDOW_CLEANUP_TIMEOUT = 10
+
+# ==================== 任务调度配置 ====================
+# 任务分派器兜底检查间隔（秒）
+# 分派器在任务创建/导入、窗口空闲、窗口打开时立即唤醒；
+# 该间隔只用于发现绕过后端直接写入数据库的任务
+TASK_DISPATCH_FALLBACK_INTERVAL = 60
+
+# 任务租约时长（秒）
+# 多个后端进程共享同一个 MySQL 时，领取任务会写入租约；
+# 进程退出后租约不再续期，过期的任务会被其他进程自动回收重新执行
+TASK_LEASE_SECONDS = 300
+
+# 任务租约续期间隔（秒），必须明显小于 TASK_LEASE_SECONDS
+TASK_LEASE_RENEW_INTERVAL = 60
+
+# 任务执行线程池大小（同时执行的任务数上限）
+# 超过该数量的空闲窗口会等待有任务执行完后再分派
+TASK_EXECUTOR_MAX_WORKERS = 32
+
+# 后端关闭时等待正在执行的任务结束的最长时间（秒）
+TASK_EXECUTOR_DRAIN_TIMEOUT = 30
+
+# 每个窗口最多同时生成的视频数量（流水线模式）
+# 1: 提交提示词后阻塞等待视频生成完成，再领取下一个任务
+# 大于 1: 窗口提交提示词后立即领取下一个任务，生成结果由插件回调推送，收到结果后释放名额
+TASK_PIPELINE_DEPTH = 1
+
+# 流水线模式下等待生成结果的最长时间（秒），超时后任务标记为失败并释放名额
+TASK_PIPELINE_TIMEOUT = 1800
+
+# 等待生成结果时，多久没有收到完成信号就到数据库查一次任务状态（秒）
+# 多进程 / 多主机部署时插件回调可能落在其他进程，本进程收不到信号
+TASK_COMPLETION_DB_CHECK_INTERVAL = 30
+
+# 账号额度用完或触发速率限制、但插件没有报告重置时间时，多久之后再给该账号的窗口分派任务（秒）
+# 分派任务时跳过额度用完的账号，到预计重置时间再放回就绪队列；收到新的配额捕获时立即重新判断
+QUOTA_RECHECK_INTERVAL = 600
+
+# 窗口自适应冷却（任务成功后等待多久再提交下一个视频，按窗口分别调整）
+# 成功且没有限流信号时冷却时间减少 COOLDOWN_DECREASE_STEP 秒；
+# 配额捕获报告速率限制、生成失败像是限流时乘以 COOLDOWN_BACKOFF_FACTOR，内容违规时乘以 COOLDOWN_VIOLATION_FACTOR
+COOLDOWN_INITIAL_DELAY = 90
+COOLDOWN_MIN_DELAY = 15
+COOLDOWN_MAX_DELAY = 900
+COOLDOWN_DECREASE_STEP = 5
+COOLDOWN_BACKOFF_FACTOR = 2.0
+COOLDOWN_VIOLATION_FACTOR = 1.25
+# 实际等待时间的随机抖动比例，避免所有窗口同时提交
+COOLDOWN_JITTER = 0.2
+
+# ==================== 任务看门狗配置 ====================
+# 每个执行阶段（open 打开窗口 / navigate 导航 / input 输入 / submit 提交 / wait 等待生成）的截止时间（秒）
+# 样本不足时使用 WATCHDOG_PHASE_DEADLINES；之后使用最近成功耗时的 P95 × WATCHDOG_DEADLINE_MARGIN，
+# 不低于 WATCHDOG_MIN_DEADLINE，不超过 WATCHDOG_PHASE_CEILINGS
+WATCHDOG_PHASE_DEADLINES = {'open': 120, 'navigate': 120, 'input': 180, 'submit': 120, 'wait': 900}
+WATCHDOG_PHASE_CEILINGS = {'open': 300, 'navigate': 300, 'input': 600, 'submit': 300, 'wait': 1800}
+WATCHDOG_MIN_DEADLINE = 30
+WATCHDOG_DEADLINE_MARGIN = 2.0
+# 开始使用学习到的截止时间所需的样本数
+WATCHDOG_MIN_SAMPLES = 5
+
+# 超过截止时间时先请求自动化线程取消，线程在该时间内（秒）仍未退出则回收窗口（关闭后重新打开）
+# 提交之前的阶段超时，任务退回待处理队列；提交 / 等待生成阶段超时，任务标记为失败（避免重复生成）
+# 介入记录写入 task_interventions 表
+WATCHDOG_CANCEL_GRACE = 60
+
+# 看门狗检查间隔（秒）
+WATCHDOG_CHECK_INTERVAL = 5
+
+# ==================== 提示词匹配配置 ====================
+# 模糊匹配的最低相似度（0~1，三元组 Dice 系数）
+# 插件回传的提示词与任务提示词相似度低于该值时不认为是同一个任务
+PROMPT_MATCH_MIN_SCORE = 0.5
+
+# ==================== 任务列表配置 ====================
+# 任务列表分页的最大每页条数
+TASK_PAGE_MAX_LIMIT = 500
+
+# 任务计数缓存有效期（秒）
+TASK_COUNT_CACHE_TTL = 5
+
+# ==================== 进度写缓冲配置 ====================
+# 进度批量写库间隔（秒）
+# 任务进度和插件上报的 Sora 进度先在内存中合并（每个任务只保留最新一次），按该间隔批量写入；
+# 成功 / 失败等终态不经过缓冲，立即写库
+PROGRESS_FLUSH_INTERVAL = 1.0
+
+# ==================== 视频统计配置 ====================
+# Sora 账号统计（视频数量、最新配额）缓存有效期（秒）
+# 保存视频 / 配额后立即失效，插件回调直接写库的情况由过期时间兜底
+SORA_STATS_CACHE_TTL = 10
+
+# ==================== 任务导入配置 ====================
+# 文件导入时每批写入数据库的任务数量（每批单独提交）
+TASK_IMPORT_CHUNK_SIZE = 500
+
+# ==================== 参考图缓存配置 ====================
+# 参考图缓存目录（按内容哈希保存预处理后的图片）
+IMAGE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_cache')
+
+# 缓存总大小上限（MB），超过后淘汰最久未使用的图片
+IMAGE_CACHE_MAX_MB = 512
+
+# 图片 URL 到缓存图片的映射有效期（秒），过期后重新下载（同一 URL 的图片可能被更换）
+IMAGE_CACHE_URL_TTL = 24 * 3600
+
+# 参考图长边上限（像素），超过时缩小并重新编码（需要安装 Pillow，未安装时使用原图）
+IMAGE_MAX_DIMENSION = 2048
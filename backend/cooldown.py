@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+窗口自适应冷却
+
+以前每个任务成功后固定随机等待 60~120 秒再领取下一个任务，离速率限制很远的账号也一样等待。
+CooldownController 为每个窗口维护一个冷却时间（AIMD）：
+- 任务成功且没有限流信号：冷却时间减少一个固定步长（加性增加提交速率）
+- 出现限流信号（配额捕获报告速率限制、生成失败的错误文字像是限流、内容违规草稿）：
+  冷却时间乘以一个系数（乘性降低提交速率）
+冷却时间在 [min_delay, max_delay] 之间，实际等待时加入少量随机抖动，避免所有窗口同时提交。
+"""
+
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+# 生成失败的错误文字中出现这些关键词时视为触发了速率限制
+RATE_LIMIT_KEYWORDS = (
+    'rate limit', 'too many', 'limit reached', 'try again later', 'slow down', '429',
+    '频繁', '限流', '上限', '稍后再试'
+)
+
+
+def is_rate_limit_error(error_message: Optional[str]) -> bool:
+    """错误文字是否像是触发了速率限制"""
+    if not error_message:
+        return False
+    text = error_message.lower()
+    return any(keyword in text for keyword in RATE_LIMIT_KEYWORDS)
+
+
+class _WindowCooldown:
+    __slots__ = ('delay', 'successes', 'penalties', 'last_signal', 'last_signal_at', 'last_penalty')
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.successes = 0
+        self.penalties = 0
+        self.last_signal = None  # 最近一次限流信号的来源
+        self.last_signal_at = None
+        self.last_penalty = 0  # 最近一次加大冷却时间的 time.monotonic()
+
+
+class CooldownController:
+    def __init__(self, initial_delay: float = 90, min_delay: float = 15, max_delay: float = 900,
+                 decrease_step: float = 5, backoff_factor: float = 2.0, jitter: float = 0.2):
+        """
+        Args:
+            initial_delay: 窗口的初始冷却时间（秒）
+            min_delay / max_delay: 冷却时间的下限 / 上限（秒）
+            decrease_step: 每次成功后减少的冷却时间（秒）
+            backoff_factor: 出现限流信号时冷却时间乘以的系数
+            jitter: 实际等待时间的随机抖动比例
+        """
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.decrease_step = decrease_step
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._windows = {}  # profile_id -> _WindowCooldown
+
+    def _get(self, profile_id: int) -> _WindowCooldown:
+        state = self._windows.get(profile_id)
+        if state is None:
+            state = self._windows[profile_id] = _WindowCooldown(self.initial_delay)
+        return state
+
+    def next_delay(self, profile_id: int) -> float:
+        """本次应等待的冷却时间（当前冷却时间加随机抖动）"""
+        with self._lock:
+            delay = self._get(profile_id).delay
+        return max(0.0, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def record_success(self, profile_id: int):
+        """任务成功：冷却时间减少一个步长"""
+        with self._lock:
+            state = self._get(profile_id)
+            state.successes += 1
+            state.delay = max(self.min_delay, state.delay - self.decrease_step)
+
+    def penalize(self, profile_id: int, reason: str, factor: float = None) -> bool:
+        """
+        收到限流信号：冷却时间乘以 factor（默认 backoff_factor）
+
+        同一个窗口在一个冷却周期内只加大一次（同一次限流常常产生多个信号，如多次配额捕获）
+
+        Returns:
+            是否加大了冷却时间
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._get(profile_id)
+            state.last_signal = reason
+            state.last_signal_at = datetime.now().isoformat()
+            if state.penalties and now - state.last_penalty < state.delay:
+                return False
+            state.penalties += 1
+            state.last_penalty = now
+            state.delay = min(self.max_delay, state.delay * (factor or self.backoff_factor))
+            return True
+
+    def current_delay(self, profile_id: int) -> float:
+        with self._lock:
+            state = self._windows.get(profile_id)
+            return state.delay if state else self.initial_delay
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            windows = {
+                profile_id: {
+                    'delay_seconds': round(state.delay, 1),
+                    'rate_per_hour': round(3600 / state.delay, 1),
+                    'successes': state.successes,
+                    'penalties': state.penalties,
+                    'last_signal': state.last_signal,
+                    'last_signal_at': state.last_signal_at
+                }
+                for profile_id, state in self._windows.items()
+            }
+        return {
+            'initial_delay': self.initial_delay,
+            'min_delay': self.min_delay,
+            'max_delay': self.max_delay,
+            'decrease_step': self.decrease_step,
+            'backoff_factor': self.backoff_factor,
+            'windows': windows
+        }
@@ -9,15 +9,106 @@ import pymysql
 from datetime import datetime
 from typing import List, Dict, Optional
 import json
+import atexit
 import config
+from db_pool import ConnectionPool
+from prompt_index import PromptIndex, prompt_hash, image_hash
+from cache import TTLCache
+from progress_buffer import ProgressBuffer
+
+# 进入提示词模糊匹配索引的任务状态
+PROMPT_INDEX_STATUSES = ('pending', 'running')
+
+# 任务列表摘要模式返回的字段（不含大文本字段，提示词和错误信息截断，base64 图片不返回）
+TASK_SUMMARY_COLUMNS = """
+    t.id, t.account_id, t.profile_id, t.model, t.status, t.progress, t.progress_message,
+    t.sora_task_id, t.post_id, t.permalink, t.is_published, t.posted_at,
+    t.start_time, t.end_time, t.video_url, t.created_at,
+    LEFT(t.prompt, 200) AS prompt,
+    CASE WHEN t.image LIKE 'data:%%' THEN NULL ELSE t.image END AS image,
+    (t.image IS NOT NULL AND t.image != '') AS has_image,
+    LEFT(t.error_message, 200) AS error_message,
+    a.username
+"""
+
+# sora_quota / sora_quota_latest 共有的配额字段
+SORA_QUOTA_COLUMNS = """
+    account_email, user_id, remaining, total, used, reset_at,
+    estimated_num_videos_remaining, estimated_num_purchased_videos_remaining,
+    credit_remaining, rate_limit_reached, access_resets_in_seconds, type_status, captured_at
+"""
+
+# 批量导入任务时单条 INSERT 语句的大致上限（字节），需小于 MySQL max_allowed_packet
+IMPORT_MAX_STATEMENT_BYTES = 8 * 1024 * 1024
+
+
+def _video_progress(value) -> Optional[int]:
+    """插件上报的视频进度（可能是小数或字符串）转换为 sora_videos.progress 实际保存的整数"""
+    if value is None or value == '':
+        return None
+    try:
+        # MySQL 写入 INT 列时四舍五入（不是截断）
+        return int(float(value) + 0.5)
+    except (TypeError, ValueError):
+        return None
+
 
 class Database:
     def __init__(self):
         self.config = config.MYSQL_CONFIG
         self.init_database()
+        self.pool = ConnectionPool(self._create_connection, **config.MYSQL_POOL_CONFIG)
+        self.prompt_index = PromptIndex()
+        self.rebuild_prompt_index()
+        # 任务计数缓存（写任务后失效，插件回调直接写库的情况由过期时间兜底）
+        self.task_count_cache = TTLCache(ttl=config.TASK_COUNT_CACHE_TTL)
+        # Sora 账号统计缓存（视频数 / 最新配额汇总，保存视频和配额后失效）
+        self.sora_stats_cache = TTLCache(ttl=config.SORA_STATS_CACHE_TTL, max_size=4)
+        # 任务变更监听器（事件推送等），回调签名 callback(event_type, task_id, **data)
+        self._task_listeners = []
+        # 账号变更监听器（窗口状态登记表的账号索引等），回调无参数
+        self._account_listeners = []
+        # 进度写缓冲（进度更新合并后批量写库，进程退出前写入剩余数据）
+        self.progress_buffer = ProgressBuffer(self.get_connection, flush_interval=config.PROGRESS_FLUSH_INTERVAL)
+        self.progress_buffer.start()
+        atexit.register(self.progress_buffer.stop)
     
     def get_connection(self):
-        """获取数据库连接"""
+        """从连接池获取数据库连接（conn.close() 会把连接归还到连接池）"""
+        return self.pool.get_connection()
+    
+    def add_task_listener(self, callback):
+        """注册任务变更监听器（任务创建、状态和进度写入数据库后回调）"""
+        self._task_listeners.append(callback)
+    
+    def _emit_task_event(self, event_type: str, task_id: int, **data):
+        for callback in self._task_listeners:
+            try:
+                callback(event_type, task_id, **data)
+            except Exception as e:
+                print(f"任务事件回调出错: {e}")
+    
+    def add_account_listener(self, callback):
+        """注册账号变更监听器（导入、删除账号和修改账号状态后回调）"""
+        self._account_listeners.append(callback)
+    
+    def _emit_account_change(self):
+        for callback in self._account_listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"账号变更回调出错: {e}")
+    
+    def get_pool_stats(self) -> Dict:
+        """获取连接池统计信息"""
+        return self.pool.get_stats()
+    
+    def get_progress_buffer_stats(self) -> Dict:
+        """获取进度写缓冲统计信息"""
+        return self.progress_buffer.get_stats()
+    
+    def _create_connection(self):
+        """创建新的数据库连接"""
         conn = pymysql.connect(
             host=self.config['host'],
             port=self.config['port'],
@@ -241,6 +332,26 @@ class Database:
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         """)
         
+        # Sora 最新配额表（每个账号一行，保存配额时同步更新，统计接口不再扫描配额历史）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sora_quota_latest (
+                account_email VARCHAR(255) NOT NULL PRIMARY KEY,
+                user_id VARCHAR(255),
+                remaining INT,
+                total INT,
+                used INT,
+                reset_at VARCHAR(255),
+                estimated_num_videos_remaining INT,
+                estimated_num_purchased_videos_remaining INT,
+                credit_remaining INT,
+                rate_limit_reached TINYINT DEFAULT 0,
+                access_resets_in_seconds INT,
+                type_status VARCHAR(100),
+                captured_at VARCHAR(255),
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        
         # Sora 任务表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS sora_tasks (
@@ -305,9 +416,121 @@ class Database:
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         """)
         
+        # 看门狗介入记录（任务某个阶段超过截止时间时的取消 / 回收窗口）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_interventions (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                task_id INT NOT NULL,
+                profile_id INT,
+                phase VARCHAR(20),
+                action VARCHAR(20),
+                phase_elapsed DOUBLE,
+                deadline DOUBLE,
+                learned TINYINT DEFAULT 0,
+                worker_id VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_task_id (task_id),
+                INDEX idx_created_at (created_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        
+        # ==================== 表结构升级 ====================
+        # 已有数据库不会重新执行 CREATE TABLE，新增字段在这里补齐
+        
+        # 任务租约：多个后端进程共享同一个 MySQL 时，用于原子领取任务
+        self._ensure_column(cursor, 'tasks', 'lease_owner', 'VARCHAR(255) NULL')
+        self._ensure_column(cursor, 'tasks', 'lease_expires_at', 'DATETIME NULL')
+        self._ensure_index(cursor, 'tasks', 'idx_lease_owner', '(lease_owner)')
+        
+        # 规范化提示词哈希：提示词精确匹配走索引，不再逐行比较
+        self._ensure_column(cursor, 'tasks', 'prompt_hash', 'CHAR(64) NULL')
+        self._ensure_index(cursor, 'tasks', 'idx_prompt_hash', '(prompt_hash, status)')
+        self._backfill_prompt_hashes(cursor)
+        
+        # 参考图哈希：导入任务时按 (prompt_hash, image_hash) 批量去重
+        self._ensure_column(cursor, 'tasks', 'image_hash', 'CHAR(64) NULL')
+        self._ensure_index(cursor, 'tasks', 'idx_prompt_image_hash', '(prompt_hash, image_hash)')
+        self._backfill_image_hashes(cursor)
+        
+        # 任务列表按创建时间筛选
+        self._ensure_index(cursor, 'tasks', 'idx_created_at', '(created_at)')
+        
+        # 最新配额表为空时从配额历史中补齐
+        self._backfill_latest_quota(cursor)
+        
         conn.commit()
         conn.close()
         print("✅ MySQL 数据库初始化完成")
+    
+    def _ensure_column(self, cursor, table: str, column: str, definition: str):
+        """字段不存在时添加字段"""
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """, (self.config['database'], table, column))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            print(f"  ✓ 已为 {table} 表添加字段 {column}")
+    
+    def _backfill_prompt_hashes(self, cursor, batch_size: int = 1000):
+        """为旧任务补齐 prompt_hash"""
+        total = 0
+        while True:
+            cursor.execute("SELECT id, prompt FROM tasks WHERE prompt_hash IS NULL LIMIT %s", (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                "UPDATE tasks SET prompt_hash = %s WHERE id = %s",
+                [(prompt_hash(prompt), task_id) for task_id, prompt in rows]
+            )
+            total += len(rows)
+        if total > 0:
+            print(f"  ✓ 已为 {total} 个任务补齐 prompt_hash")
+    
+    def _backfill_image_hashes(self, cursor, batch_size: int = 200):
+        """为旧任务补齐 image_hash（base64 图片较大，每批少取一些）"""
+        total = 0
+        while True:
+            cursor.execute("SELECT id, image FROM tasks WHERE image_hash IS NULL LIMIT %s", (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                "UPDATE tasks SET image_hash = %s WHERE id = %s",
+                [(image_hash(image), task_id) for task_id, image in rows]
+            )
+            total += len(rows)
+        if total > 0:
+            print(f"  ✓ 已为 {total} 个任务补齐 image_hash")
+    
+    def _backfill_latest_quota(self, cursor):
+        """用 sora_quota 中每个账号最新的一条记录填充 sora_quota_latest"""
+        cursor.execute("SELECT 1 FROM sora_quota_latest LIMIT 1")
+        if cursor.fetchone():
+            return
+        cursor.execute(f"""
+            INSERT INTO sora_quota_latest ({SORA_QUOTA_COLUMNS})
+            SELECT {SORA_QUOTA_COLUMNS}
+            FROM (
+                SELECT q.*, ROW_NUMBER() OVER (PARTITION BY account_email ORDER BY created_at DESC, id DESC) AS rn
+                FROM sora_quota q
+                WHERE account_email IS NOT NULL
+            ) ranked
+            WHERE rn = 1
+        """)
+        if cursor.rowcount:
+            print(f"  ✓ 已从配额历史补齐 {cursor.rowcount} 个账号的最新配额")
+    
+    def _ensure_index(self, cursor, table: str, index_name: str, columns: str):
+        """索引不存在时创建索引"""
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """, (self.config['database'], table, index_name))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"ALTER TABLE {table} ADD INDEX {index_name} {columns}")
+            print(f"  ✓ 已为 {table} 表添加索引 {index_name}")
 
     
     # ==================== 账号管理 ====================
@@ -336,21 +559,33 @@ class Database:
         
         conn.commit()
         conn.close()
+        self._emit_account_change()
         return count
     
-    def update_task_progress(self, task_id: int, progress: int, message: str = None):
-        """更新任务进度"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def update_task_progress(self, task_id: int, progress: int, message: str = None, immediate: bool = False):
+        """
+        更新任务进度
         
-        cursor.execute("""
-            UPDATE tasks 
-            SET progress = %s, progress_message = %s
-            WHERE id = %s
-        """, (progress, message, task_id))
+        默认写入进度缓冲，由后台线程合并后批量写库（事件仍立即推送）；
+        immediate=True 时直接写库（任务进入终态后的进度说明）
+        """
+        if immediate:
+            self.progress_buffer.discard_task(task_id)
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE tasks 
+                SET progress = %s, progress_message = %s
+                WHERE id = %s
+            """, (progress, message, task_id))
+            
+            conn.commit()
+            conn.close()
+        else:
+            self.progress_buffer.put_task_progress(task_id, progress, message)
         
-        conn.commit()
-        conn.close()
+        self._emit_task_event('progress', task_id, progress=progress, message=message)
     
     def get_all_accounts(self) -> List[Dict]:
         """获取所有账号"""
@@ -392,6 +627,7 @@ class Database:
         
         conn.commit()
         conn.close()
+        self._emit_account_change()
     
     def update_account_status(self, account_id: int, status: str):
         """更新账号状态"""
@@ -406,64 +642,108 @@ class Database:
         
         conn.commit()
         conn.close()
+        self._emit_account_change()
 
     
     # ==================== 任务管理 ====================
     
-    def import_tasks(self, tasks: List) -> int:
+    def import_tasks(self, tasks: List, batch_size: int = 500) -> Dict:
         """
         批量导入任务（带去重）
         
         去重规则：
         - 如果提示词和图片都相同，则跳过（不创建重复任务）
         - 如果提示词相同但图片不同，则创建新任务
-        """
-        conn = self.get_connection()
-        cursor = conn.cursor()
         
-        count = 0
-        skipped = 0
+        提示词按规范化后的 prompt_hash 比较，图片按 image_hash 比较；
+        每批任务用一条查询去重（走 (prompt_hash, image_hash) 索引），用一条多行 INSERT 写入
         
+        Returns:
+            {'created': 创建数量, 'skipped': 跳过的重复任务数量}
+        """
+        # 计算哈希，同一批中重复的任务只保留第一个
+        pending = {}
+        skipped = 0
         for task in tasks:
-            prompt = task.prompt
-            image = task.image
-            
-            # 检查是否存在相同提示词和图片的任务
-            if image:
-                # 有图片：检查提示词和图片都相同的任务
-                cursor.execute("""
-                    SELECT id FROM tasks 
-                    WHERE TRIM(prompt) = %s AND image = %s
-                    LIMIT 1
-                """, (prompt.strip() if prompt else '', image))
-            else:
-                # 无图片：检查提示词相同且也无图片的任务
-                cursor.execute("""
-                    SELECT id FROM tasks 
-                    WHERE TRIM(prompt) = %s AND (image IS NULL OR image = '')
-                    LIMIT 1
-                """, (prompt.strip() if prompt else '',))
-            
-            existing_task = cursor.fetchone()
-            
-            if existing_task:
-                # 任务已存在，跳过
+            key = (prompt_hash(task.prompt), image_hash(task.image))
+            if key in pending:
                 skipped += 1
-                print(f"  ⏭️  跳过重复任务: {prompt[:50]}... (图片: {'有' if image else '无'})")
             else:
-                # 任务不存在，创建新任务
-                cursor.execute("""
-                    INSERT INTO tasks (account_id, profile_id, prompt, image, model)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (task.account_id, task.profile_id, task.prompt, task.image, getattr(task, 'model', None)))
-                count += 1
-                print(f"  ✅ 创建任务: {prompt[:50]}... (图片: {'有' if image else '无'})")
+                pending[key] = task
         
-        conn.commit()
-        conn.close()
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        print(f"\n📊 导入结果: 创建 {count} 个任务, 跳过 {skipped} 个重复任务")
-        return count
+        created = []  # [(task_id, prompt)]
+        try:
+            keys = list(pending)
+            for start in range(0, len(keys), batch_size):
+                batch_keys = keys[start:start + batch_size]
+                
+                # 检查是否存在相同提示词和图片的任务
+                cursor.execute(f"""
+                    SELECT DISTINCT prompt_hash, image_hash FROM tasks
+                    WHERE (prompt_hash, image_hash) IN ({','.join(['(%s, %s)'] * len(batch_keys))})
+                """, [value for key in batch_keys for value in key])
+                existing = {(row['prompt_hash'], row['image_hash']) for row in cursor.fetchall()}
+                
+                new_keys = [key for key in batch_keys if key not in existing]
+                skipped += len(batch_keys) - len(new_keys)
+                if not new_keys:
+                    continue
+                
+                # 多行 INSERT（base64 图片较大时按语句大小再拆分）
+                chunk, chunk_bytes = [], 0
+                for key in new_keys:
+                    task = pending[key]
+                    task_bytes = len(task.prompt or '') + len(task.image or '')
+                    if chunk and chunk_bytes + task_bytes > IMPORT_MAX_STATEMENT_BYTES:
+                        created.extend(self._insert_task_rows(cursor, chunk, pending))
+                        chunk, chunk_bytes = [], 0
+                    chunk.append(key)
+                    chunk_bytes += task_bytes
+                created.extend(self._insert_task_rows(cursor, chunk, pending))
+            
+            conn.commit()
+        finally:
+            conn.close()
+        
+        for task_id, prompt in created:
+            self.prompt_index.add(task_id, prompt, 'pending')
+        if created:
+            self.task_count_cache.invalidate()
+        for task_id, _ in created:
+            self._emit_task_event('created', task_id, status='pending')
+        
+        print(f"\n📊 导入结果: 创建 {len(created)} 个任务, 跳过 {skipped} 个重复任务")
+        return {'created': len(created), 'skipped': skipped}
+    
+    def _insert_task_rows(self, cursor, keys: List, tasks_by_key: Dict) -> List:
+        """
+        用一条多行 INSERT 写入任务，返回 [(task_id, prompt)]
+        
+        新任务的 ID 在同一事务中按 (prompt_hash, image_hash) 查回：auto_increment_increment > 1
+        或 innodb_autoinc_lock_mode = 2 时，多行 INSERT 分配的 ID 不一定是 lastrowid 起的连续值
+        """
+        rows = []
+        for key in keys:
+            task = tasks_by_key[key]
+            rows.extend((task.account_id, task.profile_id, task.prompt, task.image,
+                         getattr(task, 'model', None), key[0], key[1]))
+        cursor.execute(f"""
+            INSERT INTO tasks (account_id, profile_id, prompt, image, model, prompt_hash, image_hash)
+            VALUES {','.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(keys))}
+        """, rows)
+        first_id = cursor.lastrowid
+        cursor.execute(f"""
+            SELECT id, prompt_hash, image_hash FROM tasks
+            WHERE id >= %s AND (prompt_hash, image_hash) IN ({', '.join(['(%s, %s)'] * len(keys))})
+            ORDER BY id
+        """, [first_id] + [value for key in keys for value in key])
+        ids = {}
+        for row in cursor.fetchall():
+            ids.setdefault((row['prompt_hash'], row['image_hash']), row['id'])
+        return [(ids[key], tasks_by_key[key].prompt) for key in keys]
     
     def create_task(self, prompt: str, image: str = None, model: str = None, task_id: Optional[int] = None) -> int:
         """创建单个任务（对外API使用）"""
@@ -479,20 +759,24 @@ class Database:
             
             # 插入指定ID的任务
             cursor.execute("""
-                INSERT INTO tasks (id, prompt, image, model, status, progress)
-                VALUES (%s, %s, %s, %s, 'pending', 0)
-            """, (task_id, prompt, image, model))
+                INSERT INTO tasks (id, prompt, image, model, status, progress, prompt_hash, image_hash)
+                VALUES (%s, %s, %s, %s, 'pending', 0, %s, %s)
+            """, (task_id, prompt, image, model, prompt_hash(prompt), image_hash(image)))
             result_id = task_id
         else:
             # 自动生成ID
             cursor.execute("""
-                INSERT INTO tasks (prompt, image, model, status, progress)
-                VALUES (%s, %s, %s, 'pending', 0)
-            """, (prompt, image, model))
+                INSERT INTO tasks (prompt, image, model, status, progress, prompt_hash, image_hash)
+                VALUES (%s, %s, %s, 'pending', 0, %s, %s)
+            """, (prompt, image, model, prompt_hash(prompt), image_hash(image)))
             result_id = cursor.lastrowid
         
         conn.commit()
         conn.close()
+        
+        self.prompt_index.add(result_id, prompt, 'pending')
+        self.task_count_cache.invalidate()
+        self._emit_task_event('created', result_id, status='pending')
         return result_id
     
     def get_all_tasks(self) -> List[Dict]:
@@ -511,6 +795,129 @@ class Database:
         conn.close()
         return tasks
     
+    def _build_task_filters(self, statuses: Optional[List[str]] = None, account_id: Optional[int] = None,
+                            created_from: Optional[str] = None, created_to: Optional[str] = None):
+        """构造任务列表筛选条件，返回 (条件列表, 参数列表)"""
+        conditions = []
+        params = []
+        if statuses:
+            conditions.append(f"t.status IN ({', '.join(['%s'] * len(statuses))})")
+            params.extend(statuses)
+        if account_id:
+            conditions.append("t.account_id = %s")
+            params.append(account_id)
+        if created_from:
+            conditions.append("t.created_at >= %s")
+            params.append(created_from)
+        if created_to:
+            conditions.append("t.created_at < %s")
+            params.append(created_to)
+        return conditions, params
+    
+    def get_tasks_page(self, limit: int, cursor: Optional[int] = None,
+                       statuses: Optional[List[str]] = None, account_id: Optional[int] = None,
+                       created_from: Optional[str] = None, created_to: Optional[str] = None,
+                       summary: bool = False) -> Dict:
+        """
+        按 id 倒序分页获取任务（keyset 分页）
+        
+        Args:
+            limit: 每页条数
+            cursor: 上一页返回的 next_cursor（只返回 id 小于该值的任务）
+            statuses: 状态筛选
+            account_id: 账号筛选
+            created_from: 创建时间起（含）
+            created_to: 创建时间止（不含）
+            summary: 摘要模式，不返回大文本字段
+        
+        Returns:
+            {'tasks': [...], 'next_cursor': 下一页游标（没有更多时为 None）}
+        """
+        conditions, params = self._build_task_filters(statuses, account_id, created_from, created_to)
+        if cursor:
+            conditions.append("t.id < %s")
+            params.append(cursor)
+        
+        columns = TASK_SUMMARY_COLUMNS if summary else "t.*, a.username"
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        conn = self.get_connection()
+        db_cursor = conn.cursor()
+        
+        # 多取一条用于判断是否还有下一页
+        db_cursor.execute(f"""
+            SELECT {columns}
+            FROM tasks t
+            LEFT JOIN accounts a ON t.account_id = a.id
+            {where}
+            ORDER BY t.id DESC
+            LIMIT %s
+        """, params + [limit + 1])
+        
+        tasks = db_cursor.fetchall()
+        conn.close()
+        
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = tasks[-1]['id']
+        return {'tasks': tasks, 'next_cursor': next_cursor}
+    
+    def count_tasks(self, statuses: Optional[List[str]] = None, account_id: Optional[int] = None,
+                    created_from: Optional[str] = None, created_to: Optional[str] = None) -> Dict:
+        """
+        统计任务数量（按状态分组的聚合结果会缓存 TASK_COUNT_CACHE_TTL 秒）
+        
+        Returns:
+            {'total': 符合筛选条件的任务数, 'status_counts': {状态: 数量}}
+        """
+        key = (account_id, created_from, created_to)
+        
+        def load():
+            conditions, params = self._build_task_filters(None, account_id, created_from, created_to)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT t.status, COUNT(*) AS count
+                FROM tasks t
+                {where}
+                GROUP BY t.status
+            """, params)
+            rows = cursor.fetchall()
+            conn.close()
+            return {row['status']: row['count'] for row in rows}
+        
+        status_counts = self.task_count_cache.get_or_load(key, load)
+        if statuses:
+            total = sum(status_counts.get(status, 0) for status in statuses)
+        else:
+            total = sum(status_counts.values())
+        return {'total': total, 'status_counts': dict(status_counts)}
+    
+    def count_pending_tasks_by_profile(self) -> Dict:
+        """
+        按窗口统计待处理任务数量（缓存 TASK_COUNT_CACHE_TTL 秒，写任务后失效）
+        
+        Returns:
+            {profile_id: 数量}，未指定窗口的任务计入键 None
+        """
+        def load():
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT profile_id, COUNT(*) AS count
+                FROM tasks
+                WHERE status = 'pending'
+                GROUP BY profile_id
+            """)
+            rows = cursor.fetchall()
+            conn.close()
+            return {row['profile_id']: row['count'] for row in rows}
+        
+        return dict(self.task_count_cache.get_or_load('pending_by_profile', load))
+    
     def get_pending_tasks(self, limit: int = None) -> List[Dict]:
         """获取待处理的任务"""
         conn = self.get_connection()
@@ -533,6 +940,286 @@ class Database:
         conn.close()
         return tasks
     
+    def claim_tasks(self, profile_ids: List[int], owner: str, lease_seconds: int) -> List[Dict]:
+        """
+        为空闲窗口原子领取待处理任务（一个事务内完成）
+        
+        使用 SELECT ... FOR UPDATE SKIP LOCKED 锁定任务行，多个后端进程同时领取时
+        不会拿到同一个任务；领取后写入窗口ID和租约，租约过期前其他进程不会再领取。
+        
+        Args:
+            profile_ids: 空闲窗口ID列表，每个窗口最多领取一个任务
+            owner: 租约持有者（后端进程标识）
+            lease_seconds: 租约时长（秒）
+        
+        Returns:
+            领取到的任务列表（按 profile_ids 顺序分配，profile_id 已写入）
+        """
+        if not profile_ids:
+            return []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # 租约时间统一使用数据库时间，避免多台机器时钟不一致
+            cursor.execute("""
+                SELECT id FROM tasks
+                WHERE status = 'pending'
+                  AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+                ORDER BY id ASC
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (len(profile_ids),))
+            task_ids = [row['id'] for row in cursor.fetchall()]
+            
+            if not task_ids:
+                conn.commit()
+                return []
+            
+            assignments = list(zip(task_ids, profile_ids))
+            case_sql = ' '.join(['WHEN %s THEN %s'] * len(assignments))
+            in_sql = ', '.join(['%s'] * len(assignments))
+            params = [value for pair in assignments for value in pair]
+            params += [owner, lease_seconds]
+            params += [task_id for task_id, _ in assignments]
+            
+            cursor.execute(f"""
+                UPDATE tasks
+                SET profile_id = CASE id {case_sql} END,
+                    lease_owner = %s,
+                    lease_expires_at = NOW() + INTERVAL %s SECOND
+                WHERE id IN ({in_sql})
+            """, params)
+            
+            cursor.execute(f"""
+                SELECT t.*, a.username, a.password
+                FROM tasks t
+                LEFT JOIN accounts a ON t.account_id = a.id
+                WHERE t.id IN ({in_sql})
+                ORDER BY t.id ASC
+            """, [task_id for task_id, _ in assignments])
+            tasks = cursor.fetchall()
+            
+            conn.commit()
+            return tasks
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def renew_task_leases(self, owner: str, lease_seconds: int) -> int:
+        """续期指定进程持有的未完成任务的租约，返回续期的任务数"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE tasks
+            SET lease_expires_at = NOW() + INTERVAL %s SECOND
+            WHERE lease_owner = %s AND status IN ('pending', 'running')
+        """, (lease_seconds, owner))
+        renewed = cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        return renewed
+    
+    def reclaim_expired_leases(self) -> int:
+        """回收租约已过期的任务（持有者进程已退出），重置为待处理，返回回收的任务数"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE tasks
+            SET status = 'pending', profile_id = NULL, start_time = NULL,
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE status IN ('pending', 'running')
+              AND lease_expires_at IS NOT NULL
+              AND lease_expires_at < NOW()
+        """)
+        reclaimed = cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        return reclaimed
+    
+    def record_task_intervention(self, task_id: int, profile_id: int, phase: str, action: str,
+                                 phase_elapsed: float, deadline: float, learned: bool, worker_id: str):
+        """记录一次看门狗介入（action: cancel / reclaim）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT INTO task_interventions
+                (task_id, profile_id, phase, action, phase_elapsed, deadline, learned, worker_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (task_id, profile_id, phase, action, phase_elapsed, deadline, 1 if learned else 0, worker_id))
+        
+        conn.commit()
+        conn.close()
+    
+    def get_task_interventions(self, limit: int = 100) -> List[Dict]:
+        """获取最近的看门狗介入记录"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, task_id, profile_id, phase, action, phase_elapsed, deadline, learned, worker_id, created_at
+            FROM task_interventions
+            ORDER BY id DESC
+            LIMIT %s
+        """, (limit,))
+        interventions = cursor.fetchall()
+        
+        conn.close()
+        return interventions
+    
+    def get_recent_task_durations(self, limit: int = 100) -> List[float]:
+        """最近成功任务从开始执行到结束的耗时（秒），用于启动时初始化看门狗的截止时间"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT TIMESTAMPDIFF(SECOND, start_time, end_time) AS duration
+            FROM tasks
+            WHERE status IN ('success', 'published') AND start_time IS NOT NULL AND end_time > start_time
+            ORDER BY end_time DESC
+            LIMIT %s
+        """, (limit,))
+        durations = [float(row['duration']) for row in cursor.fetchall()]
+        
+        conn.close()
+        return durations
+    
+    # ==================== 提示词匹配 ====================
+    
+    def rebuild_prompt_index(self):
+        """从数据库重建提示词模糊匹配索引"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ', '.join(['%s'] * len(PROMPT_INDEX_STATUSES))
+        cursor.execute(f"""
+            SELECT id, prompt, status FROM tasks
+            WHERE status IN ({placeholders})
+        """, PROMPT_INDEX_STATUSES)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        self.prompt_index.rebuild(rows)
+        print(f"✅ 提示词索引已加载 {len(rows)} 个任务")
+    
+    def find_tasks_by_prompt(self, prompt: str, statuses: List[str], order_by: str = 'id DESC',
+                             limit: int = 1, unbound_only: bool = False) -> List[Dict]:
+        """
+        按规范化提示词哈希精确查找任务（走 idx_prompt_hash 索引）
+        
+        Args:
+            prompt: 提示词
+            statuses: 任务状态范围
+            order_by: 排序（仅供内部调用传入固定的列名）
+            limit: 最多返回条数
+            unbound_only: 只查找尚未绑定 Sora 任务ID的任务
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ', '.join(['%s'] * len(statuses))
+        cursor.execute(f"""
+            SELECT id, prompt, status, start_time, created_at, profile_id
+            FROM tasks
+            WHERE prompt_hash = %s AND status IN ({placeholders})
+            {'AND sora_task_id IS NULL' if unbound_only else ''}
+            ORDER BY {order_by}
+            LIMIT %s
+        """, [prompt_hash(prompt), *statuses, limit])
+        
+        tasks = cursor.fetchall()
+        conn.close()
+        return tasks
+    
+    def search_similar_prompts(self, prompt: str, statuses: List[str], min_score: float,
+                               limit: int = 5, unbound_only: bool = False) -> List[Dict]:
+        """
+        按提示词相似度模糊查找任务
+        
+        候选任务来自内存索引，再到数据库确认当前状态（索引中状态过期的任务会被修正）；
+        unbound_only 为 True 时跳过已绑定 Sora 任务ID的任务
+        
+        Returns:
+            任务列表（含 score 字段），按相似度从高到低排序
+        """
+        # 索引中的状态可能落后于数据库（部分状态由插件回调直接写库），这里不按状态过滤，
+        # 按相似度分页到数据库确认状态，直到凑够 limit 个状态符合的任务
+        # （同一提示词的新任务或已结束的旧任务再多，也不会把真正要找的任务挤出候选）
+        candidates = self.prompt_index.search(prompt, min_score=min_score, limit=None)
+        page_size = max(limit * 4, 20)
+        
+        tasks = []
+        for start in range(0, len(candidates), page_size):
+            page = candidates[start:start + page_size]
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            try:
+                placeholders = ', '.join(['%s'] * len(page))
+                cursor.execute(f"""
+                    SELECT id, prompt, status, start_time, created_at, profile_id, sora_task_id
+                    FROM tasks
+                    WHERE id IN ({placeholders})
+                """, [task_id for task_id, _ in page])
+                rows = {row['id']: row for row in cursor.fetchall()}
+            finally:
+                conn.close()
+            
+            for task_id, score in page:
+                row = rows.get(task_id)
+                if row is None:
+                    self.prompt_index.remove(task_id)
+                    continue
+                if row['status'] not in PROMPT_INDEX_STATUSES:
+                    self.prompt_index.remove(task_id)
+                    continue
+                if row['status'] not in statuses:
+                    self.prompt_index.set_status(task_id, row['status'])
+                    continue
+                if unbound_only and row['sora_task_id']:
+                    continue
+                row['score'] = score
+                tasks.append(row)
+                if len(tasks) >= limit:
+                    return tasks
+        return tasks
+    
+    def match_unbound_task(self, prompt: str, statuses: List[str], min_score: float) -> Optional[Dict]:
+        """
+        为插件上报的 Sora 任务查找尚未绑定的本地任务
+        
+        先按提示词哈希精确匹配（状态按 statuses 的顺序优先），再从模糊匹配索引中取相似度最高的任务
+        （模糊匹配只覆盖索引中的待处理 / 运行中任务）
+        
+        Returns:
+            任务（含 score 字段，精确匹配为 1.0）；没有匹配时返回 None
+        """
+        if not prompt:
+            return None
+        # 排序只用固定的状态名拼接（statuses 由调用方传入常量）
+        exact = self.find_tasks_by_prompt(
+            prompt, statuses,
+            order_by=f"FIELD(status, {', '.join(repr(status) for status in statuses)}), id DESC",
+            unbound_only=True
+        )
+        if exact:
+            exact[0]['score'] = 1.0
+            return exact[0]
+        
+        fuzzy_statuses = [status for status in statuses if status in PROMPT_INDEX_STATUSES]
+        if not fuzzy_statuses:
+            return None
+        similar = self.search_similar_prompts(prompt, fuzzy_statuses, min_score=min_score, limit=1,
+                                              unbound_only=True)
+        return similar[0] if similar else None
+    
     def get_tasks_by_account(self, account_id: int) -> List[Dict]:
         """获取指定账号的任务"""
         conn = self.get_connection()
@@ -597,12 +1284,65 @@ class Database:
         print(f"  ✅ 任务 {task_id} 已绑定 Sora 任务ID: {sora_task_id}")
 
     
+    def bind_sora_task(self, task_id: int, sora_task_id: str, status: str) -> bool:
+        """
+        把插件上报的 Sora 任务绑定到提示词匹配到的本地任务，并更新任务状态
+        
+        Args:
+            status: running（已提交、正在生成，没有开始时间时补上）或 success（草稿已生成）
+        
+        Returns:
+            是否绑定成功（任务已被其他回调绑定时返回 False）
+        """
+        now = datetime.now().isoformat()
+        if status == 'success':
+            self.progress_buffer.discard_task(task_id)
+            updates = "status = 'success', end_time = %s, progress = 100, progress_message = 'completed'"
+        else:
+            updates = "status = %s, start_time = COALESCE(start_time, %s)"
+        params = [now] if status == 'success' else [status, now]
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                UPDATE tasks
+                SET sora_task_id = %s, {updates}
+                WHERE id = %s AND sora_task_id IS NULL
+            """, [sora_task_id, *params, task_id])
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return False
+            self._sync_prompt_index(cursor, task_id, status)
+            conn.commit()
+        finally:
+            conn.close()
+        
+        self.task_count_cache.invalidate()
+        self._emit_task_event('status', task_id, status=status, sora_task_id=sora_task_id)
+        print(f"  ✅ 任务 {task_id} 已绑定 Sora 任务ID: {sora_task_id}")
+        return True
+    
+    def _sync_prompt_index(self, cursor, task_id: int, status: str):
+        """同步提示词索引：只保留待处理 / 运行中的任务"""
+        if status in PROMPT_INDEX_STATUSES and not self.prompt_index.set_status(task_id, status):
+            cursor.execute("SELECT prompt FROM tasks WHERE id = %s", (task_id,))
+            row = cursor.fetchone()
+            if row:
+                self.prompt_index.add(task_id, row['prompt'], status)
+        elif status not in PROMPT_INDEX_STATUSES:
+            self.prompt_index.remove(task_id)
+    
     def update_task_status(self, task_id: int, status: str, 
                           start_time: Optional[str] = None,
                           end_time: Optional[str] = None,
                           video_url: Optional[str] = None,
                           error_message: Optional[str] = None):
         """更新任务状态"""
+        if status in ('success', 'published', 'failed'):
+            # 终态直接写库，缓冲中尚未写入的旧进度作废
+            self.progress_buffer.discard_task(task_id)
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -640,6 +1380,10 @@ class Database:
         elif status == 'running':
             # running 状态不修改 progress_message，保留之前的进度信息
             pass
+        elif status == 'pending':
+            # 退回队列（重试 / 终止）时释放租约，让任务可以立即被重新领取
+            updates.append("lease_owner = NULL")
+            updates.append("lease_expires_at = NULL")
         
         params.append(task_id)
         
@@ -649,8 +1393,13 @@ class Database:
             WHERE id = %s
         """, params)
         
+        self._sync_prompt_index(cursor, task_id, status)
+        
         conn.commit()
         conn.close()
+        
+        self.task_count_cache.invalidate()
+        self._emit_task_event('status', task_id, status=status, video_url=video_url, error_message=error_message)
     
     def delete_task(self, task_id: int):
         """删除任务"""
@@ -661,6 +1410,10 @@ class Database:
         
         conn.commit()
         conn.close()
+        
+        self.prompt_index.remove(task_id)
+        self.task_count_cache.invalidate()
+        self._emit_task_event('deleted', task_id)
     
     # ==================== 统计信息 ====================
     
@@ -734,71 +1487,97 @@ class Database:
             conn.commit()
         finally:
             conn.close()
+        
+        self.sora_stats_cache.invalidate()
     
-    def save_sora_videos(self, account_email: str, videos_data: dict) -> dict:
+    def save_sora_videos(self, account_email: str, videos_data: dict, batch_size: int = 500) -> dict:
         """
         保存 Sora 视频数据，并处理状态变化
-        返回统计信息：新增、更新、状态变化的数量
-        """
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        返回统计信息：新增、更新、状态变化、未变化的数量
         
+        每批视频先用一条 SELECT ... IN 取出已有记录，只把新增和内容有变化的视频
+        用一条多行 INSERT ... ON DUPLICATE KEY UPDATE 写入，未变化的视频不写库
+        """
         stats = {
             'new': 0,
             'updated': 0,
-            'status_changed': 0
+            'status_changed': 0,
+            'unchanged': 0
         }
         
-        try:
-            # 处理所有视频
-            all_videos = []
-            all_videos.extend(videos_data.get('published', []))
-            all_videos.extend(videos_data.get('generating', []))
-            all_videos.extend(videos_data.get('unpublished', []))
-            
-            for video in all_videos:
+        # 处理所有视频（同一视频出现多次时以最后一次为准）
+        incoming = {}
+        for key in ('published', 'generating', 'unpublished'):
+            for video in videos_data.get(key, []):
                 video_id = video.get('id')
-                url = video.get('url')
-                status = video.get('status')
-                prompt = video.get('prompt')
-                source = video.get('source')
-                progress = video.get('progress', 0)
+                if not video_id:
+                    continue
+                incoming[video_id] = (
+                    video_id,
+                    account_email,
+                    video.get('url'),
+                    video.get('status'),
+                    video.get('prompt'),
+                    video.get('source'),
+                    _video_progress(video.get('progress', 0))
+                )
+        
+        if not incoming:
+            return stats
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            video_ids = list(incoming)
+            for start in range(0, len(video_ids), batch_size):
+                batch_ids = video_ids[start:start + batch_size]
+                placeholders = ','.join(['%s'] * len(batch_ids))
                 
                 # 检查视频是否已存在
-                cursor.execute("""
-                    SELECT status FROM sora_videos WHERE video_id = %s
-                """, (video_id,))
-                existing = cursor.fetchone()
+                cursor.execute(f"""
+                    SELECT video_id, url, status, prompt, source, progress
+                    FROM sora_videos WHERE video_id IN ({placeholders})
+                """, batch_ids)
+                existing = {row['video_id']: row for row in cursor.fetchall()}
+                
+                rows = []
+                for video_id in batch_ids:
+                    row = incoming[video_id]
+                    old = existing.get(video_id)
+                    if old is None:
+                        stats['new'] += 1
+                    elif (old['url'], old['status'], old['prompt'], old['source'], old['progress']) == row[2:]:
+                        stats['unchanged'] += 1
+                        continue
+                    else:
+                        stats['updated'] += 1
+                        # 检查状态是否变化
+                        if old['status'] != row[3]:
+                            stats['status_changed'] += 1
+                            print(f"[视频状态变化] {video_id}: {old['status']} -> {row[3]}")
+                    rows.append(row)
                 
-                if existing:
-                    old_status = existing['status']
-                    
-                    # 更新视频信息
-                    cursor.execute("""
-                        UPDATE sora_videos 
-                        SET url = %s, status = %s, prompt = %s, source = %s, progress = %s, updated_at = CURRENT_TIMESTAMP
-                        WHERE video_id = %s
-                    """, (url, status, prompt, source, progress, video_id))
-                    
-                    stats['updated'] += 1
-                    
-                    # 检查状态是否变化
-                    if old_status != status:
-                        stats['status_changed'] += 1
-                        print(f"[视频状态变化] {video_id}: {old_status} -> {status}")
-                else:
-                    # 插入新视频
-                    cursor.execute("""
+                if rows:
+                    # 已有视频不修改所属账号
+                    cursor.executemany("""
                         INSERT INTO sora_videos (video_id, account_email, url, status, prompt, source, progress)
                         VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """, (video_id, account_email, url, status, prompt, source, progress))
-                    
-                    stats['new'] += 1
+                        ON DUPLICATE KEY UPDATE
+                            url = VALUES(url),
+                            status = VALUES(status),
+                            prompt = VALUES(prompt),
+                            source = VALUES(source),
+                            progress = VALUES(progress),
+                            updated_at = CURRENT_TIMESTAMP
+                    """, rows)
             
             conn.commit()
         finally:
             conn.close()
         
+        if stats['new'] or stats['updated']:
+            self.sora_stats_cache.invalidate()
         return stats
     
     def get_sora_videos_by_account(self, account_email: str) -> dict:
@@ -824,29 +1603,158 @@ class Database:
             }
             
             for video in videos:
-                video_dict = {
-                    'id': video['video_id'],
-                    'url': video['url'],
-                    'status': video['status'],
-                    'prompt': video['prompt'],
-                    'source': video['source'],
-                    'progress': video['progress'],
-                    'timestamp': int(video['updated_at'].timestamp() * 1000) if video['updated_at'] else None
-                }
-                
-                status = video['status']
-                
-                if status == 'published':
-                    result['published'].append(video_dict)
-                elif status == 'generating':
-                    result['generating'].append(video_dict)
-                elif status == 'unpublished':
-                    result['unpublished'].append(video_dict)
+                self._append_sora_video(result, video)
             
             return result
         finally:
             conn.close()
     
+    def _append_sora_video(self, result: dict, video: dict):
+        """把 sora_videos 行转换为前端格式，按状态放入 published / generating / unpublished"""
+        status = video['status']
+        if status not in result:
+            return
+        result[status].append({
+            'id': video['video_id'],
+            'url': video['url'],
+            'status': status,
+            'prompt': video['prompt'],
+            'source': video['source'],
+            'progress': video['progress'],
+            'timestamp': int(video['updated_at'].timestamp() * 1000) if video['updated_at'] else None
+        })
+    
+    def get_sora_videos_grouped(self) -> Dict[str, dict]:
+        """一次查询获取所有账号的视频，按账号邮箱分组"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT video_id, account_email, url, status, prompt, source, progress, updated_at
+                FROM sora_videos
+                ORDER BY updated_at DESC
+            """)
+            
+            grouped = {}
+            for video in cursor.fetchall():
+                result = grouped.setdefault(video['account_email'], {
+                    'published': [],
+                    'generating': [],
+                    'unpublished': []
+                })
+                self._append_sora_video(result, video)
+            return grouped
+        finally:
+            conn.close()
+    
+    def get_sora_account_stats(self) -> List[dict]:
+        """
+        获取每个 Sora 账号的视频数量汇总和最新配额（集合查询，结果短时间缓存）
+        
+        Returns:
+            账号列表，每项包含账号信息、published / generating / unpublished 数量和 quota_remaining
+        """
+        def load():
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT a.email, a.name, a.user_id, a.image, a.updated_at,
+                           COALESCE(v.published, 0) AS published,
+                           COALESCE(v.generating, 0) AS generating,
+                           COALESCE(v.unpublished, 0) AS unpublished,
+                           q.estimated_num_videos_remaining AS quota_remaining,
+                           q.credit_remaining
+                    FROM sora_accounts a
+                    LEFT JOIN (
+                        SELECT account_email,
+                               SUM(status = 'published') AS published,
+                               SUM(status = 'generating') AS generating,
+                               SUM(status = 'unpublished') AS unpublished
+                        FROM sora_videos
+                        GROUP BY account_email
+                    ) v ON v.account_email = a.email
+                    LEFT JOIN sora_quota_latest q ON q.account_email = a.email
+                    ORDER BY a.updated_at DESC
+                """)
+                rows = cursor.fetchall()
+                for row in rows:
+                    for key in ('published', 'generating', 'unpublished'):
+                        row[key] = int(row[key])
+                return rows
+            finally:
+                conn.close()
+        
+        return self.sora_stats_cache.get_or_load('account_stats', load)
+    
+    def save_sora_quota(self, quota: dict):
+        """保存配额记录：写入配额历史，并更新该账号的最新配额"""
+        values = (
+            quota.get('account_email'),
+            quota.get('user_id'),
+            quota.get('remaining'),
+            quota.get('total'),
+            quota.get('used'),
+            quota.get('reset_at'),
+            quota.get('estimated_num_videos_remaining'),
+            quota.get('estimated_num_purchased_videos_remaining'),
+            quota.get('credit_remaining'),
+            1 if quota.get('rate_limit_reached') else 0,
+            quota.get('access_resets_in_seconds'),
+            quota.get('type_status'),
+            quota.get('captured_at')
+        )
+        placeholders = ', '.join(['%s'] * len(values))
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(f"""
+                INSERT INTO sora_quota ({SORA_QUOTA_COLUMNS})
+                VALUES ({placeholders})
+            """, values)
+            
+            if quota.get('account_email'):
+                cursor.execute(f"""
+                    INSERT INTO sora_quota_latest ({SORA_QUOTA_COLUMNS})
+                    VALUES ({placeholders})
+                    ON DUPLICATE KEY UPDATE
+                        user_id = VALUES(user_id),
+                        remaining = VALUES(remaining),
+                        total = VALUES(total),
+                        used = VALUES(used),
+                        reset_at = VALUES(reset_at),
+                        estimated_num_videos_remaining = VALUES(estimated_num_videos_remaining),
+                        estimated_num_purchased_videos_remaining = VALUES(estimated_num_purchased_videos_remaining),
+                        credit_remaining = VALUES(credit_remaining),
+                        rate_limit_reached = VALUES(rate_limit_reached),
+                        access_resets_in_seconds = VALUES(access_resets_in_seconds),
+                        type_status = VALUES(type_status),
+                        captured_at = VALUES(captured_at),
+                        updated_at = CURRENT_TIMESTAMP
+                """, values)
+            
+            conn.commit()
+        finally:
+            conn.close()
+        
+        self.sora_stats_cache.invalidate()
+    
+    def get_latest_quotas(self) -> Dict[str, dict]:
+        """获取所有账号的最新配额，按账号邮箱索引"""
+        def load():
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT {SORA_QUOTA_COLUMNS}, updated_at FROM sora_quota_latest")
+                return {row['account_email']: row for row in cursor.fetchall()}
+            finally:
+                conn.close()
+        
+        return self.sora_stats_cache.get_or_load('latest_quotas', load)
+    
     def get_all_sora_accounts(self) -> List[dict]:
         """获取所有 Sora 账号"""
         conn = self.get_connection()
@@ -887,6 +1795,7 @@ class Database:
                 DELETE FROM sora_videos WHERE video_id = %s
             """, (video_id,))
             conn.commit()
+            self.sora_stats_cache.invalidate()
             
             return video_info
         finally:
@@ -903,6 +1812,7 @@ class Database:
                 DELETE FROM sora_videos WHERE video_id IN ({placeholders})
             """, video_ids)
             conn.commit()
+            self.sora_stats_cache.invalidate()
             return cursor.rowcount
         finally:
             conn.close()
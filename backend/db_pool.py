@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MySQL 连接池模块
+
+借出的连接是一个代理对象，调用方仍然按原来的方式使用
+conn.cursor() / conn.commit() / conn.close()，
+只是 close() 不再断开 TCP 连接，而是把连接归还到连接池。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+
+class PoolTimeoutError(Exception):
+    """等待空闲连接超时"""
+    pass
+
+
+class PooledConnection:
+    """连接池借出的连接代理"""
+
+    def __init__(self, pool, raw_conn, created_at: float):
+        self._pool = pool
+        self._conn = raw_conn
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise pymysql.err.InterfaceError(0, '连接已归还到连接池')
+        return getattr(conn, name)
+
+    def close(self):
+        """归还连接到连接池"""
+        conn = self.__dict__.get('_conn')
+        if conn is not None:
+            self._conn = None
+            self._pool._release(conn, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        # 调用方在异常路径上没有 close() 时，回收名额，避免连接池被耗尽
+        conn = self.__dict__.get('_conn')
+        if conn is not None:
+            self._conn = None
+            try:
+                self._pool._release(conn, self._created_at, discard=True)
+            except Exception:
+                pass
+
+
+class ConnectionPool:
+    """线程安全的有界连接池（带健康检查、最长存活时间回收和等待统计）"""
+
+    def __init__(self, connect: Callable, max_size: int = 20, max_lifetime: float = 1800,
+                 health_check_interval: float = 30, wait_timeout: float = 10):
+        """
+        Args:
+            connect: 创建新连接的函数
+            max_size: 最大连接数（含已借出的连接）
+            max_lifetime: 连接最长存活时间（秒），超过后关闭并重建
+            health_check_interval: 空闲超过该时间的连接在借出前先 ping 检查（秒）
+            wait_timeout: 连接池耗尽时最长等待时间（秒）
+        """
+        self._connect = connect
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.wait_timeout = wait_timeout
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # [(conn, created_at, last_used)]
+        self._size = 0  # 已创建的连接数（空闲 + 借出）
+
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total_ms': 0.0,
+            'wait_time_max_ms': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'health_check_failures': 0,
+            'discarded': 0
+        }
+
+    def get_connection(self) -> PooledConnection:
+        """借出一个连接，连接池耗尽时阻塞等待"""
+        start = time.monotonic()
+        deadline = start + self.wait_timeout
+        waited = False
+        conn = None
+        created_at = None
+        last_used = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    # 后进先出，优先使用最近用过的热连接
+                    conn, created_at, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # 先占住名额，在锁外建立连接
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(f'等待数据库连接超时（{self.wait_timeout} 秒，连接池上限 {self.max_size}）')
+                waited = True
+                self._cond.wait(remaining)
+
+        now = time.monotonic()
+
+        if conn is not None:
+            if now - created_at > self.max_lifetime:
+                self._close_quietly(conn)
+                conn = None
+                self._record('recycled')
+            elif now - last_used > self.health_check_interval:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    self._close_quietly(conn)
+                    conn = None
+                    self._record('health_check_failures')
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            created_at = time.monotonic()
+            self._record('created')
+
+        wait_ms = (time.monotonic() - start) * 1000
+        with self._cond:
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_total_ms'] += wait_ms
+                self._stats['wait_time_max_ms'] = max(self._stats['wait_time_max_ms'], wait_ms)
+
+        return PooledConnection(self, conn, created_at)
+
+    def _release(self, conn, created_at: float, discard: bool = False):
+        """归还连接（由 PooledConnection.close 调用）"""
+        if not discard:
+            try:
+                # 结束未提交的事务，避免下一个使用者读到旧快照
+                status = conn.server_status
+                if status is None or status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        if not discard and time.monotonic() - created_at > self.max_lifetime:
+            discard = True
+            self._record('recycled')
+
+        if discard:
+            self._close_quietly(conn)
+
+        with self._cond:
+            if discard:
+                self._size -= 1
+                self._stats['discarded'] += 1
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def _record(self, key: str):
+        with self._cond:
+            self._stats[key] += 1
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict:
+        """获取连接池统计信息"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['max_size'] = self.max_size
+        stats['wait_time_avg_ms'] = round(stats['wait_time_total_ms'] / stats['waits'], 2) if stats['waits'] else 0.0
+        stats['wait_time_total_ms'] = round(stats['wait_time_total_ms'], 2)
+        stats['wait_time_max_ms'] = round(stats['wait_time_max_ms'], 2)
+        return stats
+
+    def close_all(self):
+        """关闭所有空闲连接（借出的连接归还时会正常回收）"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务事件总线
+
+任务状态 / 进度在写入数据库的同时发布到总线，SSE 接口订阅后实时推送给前端和外部客户端，
+不再需要客户端轮询任务接口。
+
+publish() 可以在任意线程调用（执行任务的线程、接口处理函数），
+事件通过 loop.call_soon_threadsafe 投递到订阅者所在事件循环的队列中。
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class Subscription:
+    def __init__(self, loop, task_id: Optional[int], max_queue: int):
+        self.loop = loop
+        self.task_id = task_id
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def _deliver(self, event: Dict):
+        """在订阅者的事件循环中执行：队列满时丢弃最旧的事件，保证最新状态能送达"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+
+class TaskEventBus:
+    def __init__(self, max_queue: int = 200):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._published = 0
+
+    def subscribe(self, task_id: Optional[int] = None) -> Subscription:
+        """
+        订阅任务事件（需在事件循环中调用）
+
+        Args:
+            task_id: 只订阅指定任务；None 表示订阅全部任务
+        """
+        subscription = Subscription(asyncio.get_running_loop(), task_id, self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type: str, task_id: int, **data):
+        """
+        发布任务事件（线程安全）
+
+        Args:
+            event_type: 事件类型，如 progress / status
+            task_id: 任务ID
+            data: 事件数据（progress / message / status / video_url 等）
+        """
+        event = {
+            'type': event_type,
+            'task_id': task_id,
+            'timestamp': datetime.now().isoformat(),
+            **{k: v for k, v in data.items() if v is not None}
+        }
+
+        with self._lock:
+            self._published += 1
+            targets = [s for s in self._subscribers if s.task_id is None or s.task_id == task_id]
+
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+            except RuntimeError:
+                # 事件循环已关闭
+                self.unsubscribe(subscription)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self._published,
+                'dropped': sum(s.dropped for s in self._subscribers)
+            }
+
+
+def format_sse(event: Dict) -> str:
+    """格式化为 SSE 消息"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
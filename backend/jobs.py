@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后台作业登记表
+
+耗时较长的操作（大文件导入等）在后台线程中执行，接口立即返回作业ID，
+客户端通过 GET /api/jobs/{job_id} 查询进度和结果。
+"""
+
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+class Job:
+    def __init__(self, job_type: str, meta: Dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.type = job_type
+        self.status = 'pending'  # pending / running / success / failed
+        self.meta = meta
+        self.progress = {}  # 各类作业自定义的进度数据
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'meta': dict(self.meta),
+            'progress': dict(self.progress),
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobRegistry:
+    def __init__(self, max_finished: int = 100):
+        """
+        Args:
+            max_finished: 最多保留的已结束作业数量，超过后删除最早的作业
+        """
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job_id -> Job
+
+    def create(self, job_type: str, **meta) -> Job:
+        job = Job(job_type, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune_locked()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self, job_type: Optional[str] = None) -> List[Dict]:
+        """按创建时间倒序列出作业"""
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())
+                    if job_type is None or job.type == job_type]
+
+    def start(self, job: Job):
+        with self._lock:
+            job.status = 'running'
+            job.started_at = datetime.now().isoformat()
+
+    def update(self, job: Job, **progress):
+        """更新作业进度"""
+        with self._lock:
+            job.progress.update(progress)
+
+    def finish(self, job: Job, result=None):
+        with self._lock:
+            job.status = 'success'
+            job.result = result
+            job.finished_at = datetime.now().isoformat()
+
+    def fail(self, job: Job, error: str):
+        with self._lock:
+            job.status = 'failed'
+            job.error = error
+            job.finished_at = datetime.now().isoformat()
+
+    def run(self, job: Job, func: Callable, *args, **kwargs):
+        """
+        在当前线程中执行作业：func 的返回值作为作业结果，抛出异常时作业失败
+
+        Returns:
+            func 的返回值；失败时返回 None
+        """
+        self.start(job)
+        try:
+            result = func(*args, **kwargs)
+            self.finish(job, result)
+            return result
+        except Exception as e:
+            print(f"❌ 后台作业 {job.type}:{job.id} 失败: {e}")
+            traceback.print_exc()
+            self.fail(job, str(e))
+            return None
+
+    def run_in_background(self, job: Job, func: Callable, *args, **kwargs) -> threading.Thread:
+        """在后台线程中执行作业"""
+        thread = threading.Thread(
+            target=self.run,
+            args=(job, func) + args,
+            kwargs=kwargs,
+            name=f"job-{job.type}-{job.id}",
+            daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _prune_locked(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ('success', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+进度写缓冲模块
+
+任务进度和插件上报的 Sora 进度更新频繁，但只有最新值有意义。
+写入先进入内存缓冲（同一任务只保留最新一次），由后台线程按固定间隔
+用多行语句批量写入数据库，把每次更新一个连接一次提交合并成每个间隔一次提交。
+
+终态（成功 / 失败）不经过缓冲，由调用方直接写库，并丢弃该任务缓冲中的旧进度。
+"""
+
+import threading
+import time
+import traceback
+from typing import Dict, Optional
+
+# sora_task_progress 表批量写入的字段（顺序与 INSERT 语句一致）
+SORA_PROGRESS_FIELDS = (
+    'task_id', 'status', 'progress_pct', 'prompt',
+    'title', 'thumbnail_url', 'failure_reason', 'captured_at'
+)
+
+
+class ProgressBuffer:
+    def __init__(self, get_connection, flush_interval: float = 1.0, max_batch: int = 500):
+        """
+        Args:
+            get_connection: 获取数据库连接的函数
+            flush_interval: 批量写入间隔（秒）
+            max_batch: 单条语句最多写入的行数
+        """
+        self._get_connection = get_connection
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task_progress = {}  # task_id -> (progress, message)
+        self._sora_progress = {}  # sora_task_id -> tuple(SORA_PROGRESS_FIELDS)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self._stats = {
+            'task_updates': 0,
+            'sora_updates': 0,
+            'coalesced': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'errors': 0
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='progress-buffer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止后台线程并写入剩余的缓冲数据"""
+        self._stop_event.set()
+        self.flush()
+
+    def put_task_progress(self, task_id: int, progress: int, message: Optional[str]):
+        """缓冲任务进度（同一任务只保留最新一次）"""
+        with self._lock:
+            if task_id in self._task_progress:
+                self._stats['coalesced'] += 1
+            self._task_progress[task_id] = (progress, message)
+            self._stats['task_updates'] += 1
+
+    def put_sora_progress(self, row: Dict):
+        """缓冲插件上报的 Sora 任务进度（同一 Sora 任务只保留最新一次）"""
+        values = tuple(row.get(field) for field in SORA_PROGRESS_FIELDS)
+        with self._lock:
+            if values[0] in self._sora_progress:
+                self._stats['coalesced'] += 1
+            self._sora_progress[values[0]] = values
+            self._stats['sora_updates'] += 1
+
+    def discard_task(self, task_id: int):
+        """丢弃任务缓冲中的进度（任务进入终态或直接写库时调用）"""
+        with self._lock:
+            self._task_progress.pop(task_id, None)
+
+    def discard_sora(self, sora_task_id: str):
+        with self._lock:
+            self._sora_progress.pop(sora_task_id, None)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_task_updates'] = len(self._task_progress)
+            stats['pending_sora_updates'] = len(self._sora_progress)
+        stats['flush_interval'] = self.flush_interval
+        return stats
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """把缓冲中的数据批量写入数据库"""
+        with self._flush_lock:
+            with self._lock:
+                task_progress = self._task_progress
+                sora_progress = self._sora_progress
+                self._task_progress = {}
+                self._sora_progress = {}
+
+            if not task_progress and not sora_progress:
+                return
+
+            try:
+                rows = self._write(task_progress, sora_progress)
+                with self._lock:
+                    self._stats['flushes'] += 1
+                    self._stats['rows_written'] += rows
+            except Exception as e:
+                print(f"⚠️ 批量写入进度失败: {e}")
+                traceback.print_exc()
+                with self._lock:
+                    self._stats['errors'] += 1
+                    # 写入失败时放回缓冲，期间有更新的数据以新数据为准
+                    for key, value in task_progress.items():
+                        self._task_progress.setdefault(key, value)
+                    for key, value in sora_progress.items():
+                        self._sora_progress.setdefault(key, value)
+                time.sleep(self.flush_interval)
+
+    def _write(self, task_progress: Dict, sora_progress: Dict) -> int:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            items = list(task_progress.items())
+            for start in range(0, len(items), self.max_batch):
+                batch = items[start:start + self.max_batch]
+                # 派生表 + UPDATE JOIN：一条语句更新多个任务；
+                # 只更新未进入终态的任务，避免旧进度覆盖已经写入的成功 / 失败状态
+                derived = ' UNION ALL '.join(
+                    ['SELECT %s AS id, %s AS progress, %s AS progress_message'] * len(batch)
+                )
+                params = [value for task_id, (progress, message) in batch for value in (task_id, progress, message)]
+                cursor.execute(f"""
+                    UPDATE tasks t
+                    JOIN ({derived}) u ON t.id = u.id
+                    SET t.progress = u.progress,
+                        t.progress_message = u.progress_message
+                    WHERE t.status IN ('pending', 'running')
+                """, params)
+
+            rows = list(sora_progress.values())
+            for start in range(0, len(rows), self.max_batch):
+                # executemany 会把 INSERT ... VALUES 改写成一条多行 INSERT
+                cursor.executemany("""
+                    INSERT INTO sora_task_progress (
+                        task_id, status, progress_pct, prompt,
+                        title, thumbnail_url, failure_reason, captured_at
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        status = VALUES(status),
+                        progress_pct = VALUES(progress_pct),
+                        prompt = VALUES(prompt),
+                        title = VALUES(title),
+                        thumbnail_url = VALUES(thumbnail_url),
+                        failure_reason = VALUES(failure_reason)
+                """, rows[start:start + self.max_batch])
+
+            conn.commit()
+            return len(items) + len(rows)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+提示词索引模块
+
+- normalize_prompt / prompt_hash: 提示词规范化和哈希，哈希值保存在 tasks.prompt_hash 上用于精确匹配
+- image_hash: 参考图哈希，与 prompt_hash 一起用于导入任务时去重
+- PromptIndex: 内存中的三元组（trigram）倒排索引，用于模糊匹配，返回相似度分数
+"""
+
+import hashlib
+import re
+import threading
+from collections import Counter
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt: Optional[str]) -> str:
+    """规范化提示词：去掉首尾空白、合并连续空白、转小写"""
+    if not prompt:
+        return ''
+    return _WHITESPACE_RE.sub(' ', prompt.strip()).lower()
+
+
+def prompt_hash(prompt: Optional[str]) -> str:
+    """规范化提示词的 SHA-256（十六进制，64 位）"""
+    return hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+
+
+def image_hash(image: Optional[str]) -> str:
+    """参考图（URL 或 base64）的 SHA-256；无图片时为空字符串的哈希"""
+    return hashlib.sha256((image or '').encode('utf-8')).hexdigest()
+
+
+def _trigrams(text: str) -> frozenset:
+    """提取三元组；中文提示词同样按字符切分"""
+    if not text:
+        return frozenset()
+    padded = f'  {text} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class PromptIndex:
+    """线程安全的提示词三元组倒排索引"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # task_id -> (status, trigrams)
+        self._postings = {}  # trigram -> set(task_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def rebuild(self, rows: Iterable[Dict]):
+        """用数据库中的任务重建索引（rows 需包含 id / prompt / status）"""
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            for row in rows:
+                self._add_locked(row['id'], row['prompt'], row['status'])
+
+    def add(self, task_id: int, prompt: str, status: str):
+        """添加或更新任务"""
+        with self._lock:
+            self._remove_locked(task_id)
+            self._add_locked(task_id, prompt, status)
+
+    def set_status(self, task_id: int, status: str) -> bool:
+        """更新已索引任务的状态，任务不在索引中时返回 False"""
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is None:
+                return False
+            self._entries[task_id] = (status, entry[1])
+            return True
+
+    def remove(self, task_id: int):
+        with self._lock:
+            self._remove_locked(task_id)
+
+    def search(self, prompt: str, statuses: Optional[Iterable[str]] = None,
+               min_score: float = 0.0, limit: Optional[int] = 5) -> List[Tuple[int, float]]:
+        """
+        模糊查找相似提示词
+
+        相似度为两个提示词三元组集合的 Dice 系数（0~1，完全相同为 1）；limit 为 None 时返回全部
+
+        Returns:
+            [(task_id, score), ...]，按相似度从高到低排序
+        """
+        grams = _trigrams(normalize_prompt(prompt))
+        if not grams:
+            return []
+        statuses = set(statuses) if statuses else None
+
+        with self._lock:
+            # 统计每个任务与查询共有的三元组数量
+            shared = Counter(chain.from_iterable(self._postings.get(gram, ()) for gram in grams))
+
+            results = []
+            for task_id, count in shared.items():
+                status, task_grams = self._entries[task_id]
+                if statuses and status not in statuses:
+                    continue
+                score = 2.0 * count / (len(grams) + len(task_grams))
+                if score >= min_score:
+                    results.append((task_id, round(score, 4)))
+
+        results.sort(key=lambda item: (-item[1], -item[0]))
+        return results if limit is None else results[:limit]
+
+    def _add_locked(self, task_id: int, prompt: str, status: str):
+        grams = _trigrams(normalize_prompt(prompt))
+        self._entries[task_id] = (status, grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(task_id)
+
+    def _remove_locked(self, task_id: int):
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return
+        for gram in entry[1]:
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(task_id)
+                if not postings:
+                    del self._postings[gram]
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+参考图预处理和缓存
+
+任务被领取时就在后台线程中预取参考图（下载 URL / 解码 base64 / 读取本地文件），
+缩放、重新编码后按内容哈希保存到磁盘；粘贴图片时直接读取处理好的文件，
+多个任务使用同一张图片时只下载一次。
+
+- 缓存文件名为处理后内容的 SHA-256（内容寻址），图片来源到内容哈希的映射保存在 .ref 文件中
+  （本地文件的来源键包含修改时间和大小，文件被替换后重新处理；URL 的映射超过 url_ttl 后重新下载）
+- 缓存总大小超过上限时按最近使用时间淘汰（LRU）
+- 安装了 Pillow 时把超过尺寸上限的图片缩小并重新编码；未安装时原样缓存
+"""
+
+import base64
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp'
+}
+_MIME_TYPES = {ext: mime for mime, ext in _EXTENSIONS.items()}
+_MIME_TYPES['.jpeg'] = 'image/jpeg'
+
+
+def guess_mime_type(path_or_url: str, default: str = 'image/jpeg') -> str:
+    ext = os.path.splitext(path_or_url.split('?')[0])[1].lower()
+    return _MIME_TYPES.get(ext, default)
+
+
+def load_image(source: str, timeout: float = 10):
+    """
+    读取原始图片
+
+    Args:
+        source: URL、base64 Data URL 或本地文件路径
+
+    Returns:
+        (图片字节, MIME 类型)
+    """
+    if source.startswith('data:image'):
+        header, _, data = source.partition(',')
+        mime_type = header[5:].split(';')[0] or 'image/jpeg'
+        return base64.b64decode(data), mime_type
+
+    if _is_url(source):
+        import requests
+        response = requests.get(source, timeout=timeout)
+        if response.status_code != 200:
+            raise Exception(f'下载图片失败: HTTP {response.status_code}')
+        mime_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+        if not mime_type.startswith('image/'):
+            mime_type = guess_mime_type(source)
+        return response.content, mime_type
+
+    with open(source, 'rb') as f:
+        return f.read(), guess_mime_type(source)
+
+
+def _is_url(source: str) -> bool:
+    return source.startswith('http://') or source.startswith('https://')
+
+
+def to_data_url(image_bytes: bytes, mime_type: str) -> str:
+    return f'data:{mime_type};base64,{base64.b64encode(image_bytes).decode("utf-8")}'
+
+
+class CachedImage:
+    def __init__(self, path: str, mime_type: str, size: int):
+        self.path = path
+        self.mime_type = mime_type
+        self.size = size
+
+    def read(self) -> bytes:
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def to_data_url(self) -> str:
+        return to_data_url(self.read(), self.mime_type)
+
+
+class ImageCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024, max_dimension: int = 2048,
+                 jpeg_quality: int = 90, download_timeout: float = 10, max_workers: int = 4,
+                 url_ttl: float = 24 * 3600):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节），超过后淘汰最久未使用的图片
+            max_dimension: 图片长边上限（像素），超过时缩小（需要 Pillow）
+            jpeg_quality: 重新编码 JPEG 的质量
+            download_timeout: 下载图片的超时时间（秒）
+            max_workers: 预取线程数
+            url_ttl: URL 到缓存图片的映射有效期（秒），过期后重新下载（同一 URL 的内容可能被更换）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+        self.download_timeout = download_timeout
+        self.url_ttl = url_ttl
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 文件名 -> 大小，按最近使用排序
+        self._total_bytes = 0
+        self._refs = {}  # 文件名 -> 指向它的来源键集合（淘汰图片时删除对应的 .ref 文件）
+        self._inflight = {}  # 来源键 -> Future
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-prefetch')
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'errors': 0}
+        self._load_existing()
+
+    def prefetch(self, source: str):
+        """在后台预取并缓存图片（同一图片正在预取时不重复提交）"""
+        if not source:
+            return None
+        key = self._source_key(source)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._resolve, source, key)
+            self._inflight[key] = future
+        # 回调可能在当前线程立即执行，需在锁外注册
+        future.add_done_callback(lambda done: self._finish_inflight(key, done))
+        return future
+
+    def get(self, source: str) -> CachedImage:
+        """获取处理好的图片；正在预取时等待预取完成，未预取时当场处理"""
+        key = self._source_key(source)
+        with self._lock:
+            future = self._inflight.get(key)
+        if future is not None:
+            try:
+                return future.result()
+            except Exception as e:
+                print(f'  ⚠️ 预取参考图失败，重新获取: {e}')
+        return self._resolve(source, key)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'inflight': len(self._inflight),
+                'resize_enabled': Image is not None
+            })
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def _finish_inflight(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _source_key(self, source: str) -> str:
+        """来源键：URL 和 base64 为来源字符串本身；本地文件加上修改时间和大小"""
+        if not source.startswith('data:') and not _is_url(source):
+            try:
+                stat = os.stat(source)
+                source = f'{source}\n{stat.st_mtime_ns}\n{stat.st_size}'
+            except OSError:
+                pass
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def _resolve(self, source: str, key: str) -> CachedImage:
+        cached = self._lookup(key, self.url_ttl if _is_url(source) else None)
+        if cached is not None:
+            with self._lock:
+                self._stats['hits'] += 1
+            return cached
+
+        with self._lock:
+            self._stats['misses'] += 1
+        try:
+            image_bytes, mime_type = load_image(source, self.download_timeout)
+            original_size = len(image_bytes)
+            image_bytes, mime_type = self._process(image_bytes, mime_type)
+        except Exception:
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        filename = digest + _EXTENSIONS.get(mime_type, '.img')
+        path = os.path.join(self.cache_dir, filename)
+        if not os.path.exists(path):
+            self._write_atomic(path, image_bytes)
+        self._write_atomic(os.path.join(self.cache_dir, key + '.ref'), f'{filename}\n{mime_type}'.encode('utf-8'))
+
+        with self._lock:
+            if filename not in self._entries:
+                self._entries[filename] = len(image_bytes)
+                self._total_bytes += len(image_bytes)
+            self._entries.move_to_end(filename)
+            self._refs.setdefault(filename, set()).add(key)
+        self._evict()
+
+        print(f'  ✓ 参考图已缓存: {original_size} → {len(image_bytes)} 字节 ({mime_type})')
+        return CachedImage(path, mime_type, len(image_bytes))
+
+    def _lookup(self, key: str, ttl: float = None):
+        """
+        按来源键查找缓存的图片
+
+        Args:
+            ttl: 映射的有效期（秒），.ref 文件写入时间超过 ttl 时视为未缓存；None 表示不过期
+        """
+        ref_path = os.path.join(self.cache_dir, key + '.ref')
+        try:
+            if ttl is not None and time.time() - os.path.getmtime(ref_path) > ttl:
+                return None
+            with open(ref_path, 'r', encoding='utf-8') as f:
+                filename, mime_type = f.read().split('\n', 1)
+        except (OSError, ValueError):
+            return None
+
+        path = os.path.join(self.cache_dir, filename)
+        with self._lock:
+            size = self._entries.get(filename)
+            if size is None:
+                # 图片已被淘汰
+                return None
+            self._entries.move_to_end(filename)
+        try:
+            now = time.time()
+            os.utime(path, (now, now))
+        except OSError:
+            return None
+        return CachedImage(path, mime_type, size)
+
+    def _process(self, image_bytes: bytes, mime_type: str):
+        """缩小超过尺寸上限的图片并重新编码（未安装 Pillow 或是动图时原样返回）"""
+        if Image is None:
+            return image_bytes, mime_type
+
+        from io import BytesIO
+        try:
+            with Image.open(BytesIO(image_bytes)) as img:
+                if getattr(img, 'is_animated', False) or max(img.size) <= self.max_dimension:
+                    return image_bytes, mime_type
+                img.thumbnail((self.max_dimension, self.max_dimension))
+                output = BytesIO()
+                if img.mode in ('RGBA', 'LA', 'P'):
+                    img.save(output, format='PNG', optimize=True)
+                    return output.getvalue(), 'image/png'
+                img.convert('RGB').save(output, format='JPEG', quality=self.jpeg_quality, optimize=True)
+                return output.getvalue(), 'image/jpeg'
+        except Exception as e:
+            print(f'  ⚠️ 图片预处理失败，使用原图: {e}')
+            return image_bytes, mime_type
+
+    def _write_atomic(self, path: str, data: bytes):
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _load_existing(self):
+        """启动时登记已有的缓存文件（按修改时间作为最近使用时间），删除指向已不存在图片的 .ref 文件"""
+        files = []
+        refs = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp') or not os.path.isfile(path):
+                continue
+            if name.endswith('.ref'):
+                refs.append(name)
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        for name in refs:
+            ref_path = os.path.join(self.cache_dir, name)
+            try:
+                with open(ref_path, 'r', encoding='utf-8') as f:
+                    filename = f.read().split('\n', 1)[0]
+                if filename in self._entries:
+                    self._refs.setdefault(filename, set()).add(name[:-len('.ref')])
+                else:
+                    os.remove(ref_path)
+            except OSError:
+                pass
+        self._evict()
+
+    def _evict(self):
+        removed = []
+        with self._lock:
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                filename, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                self._stats['evictions'] += 1
+                removed.append(filename)
+                removed.extend(key + '.ref' for key in self._refs.pop(filename, ()))
+        for name in removed:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
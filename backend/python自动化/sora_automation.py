@@ -15,8 +15,67 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from image_cache import load_image, to_data_url
+from cancellation import TaskCancelled
+
+# 页面状态探测脚本：一次 execute_script 遍历页面文本，同时找出完成通知和错误提示，
+# 代替按关键词逐个 find_elements 再逐个元素 is_displayed / location 的多次 WebDriver 往返
+PAGE_STATUS_PROBE_SCRIPT = r"""
+var notificationKeywords = arguments[0];
+var errorKeywords = arguments[1];
+var viewWidth = window.innerWidth || document.documentElement.clientWidth;
+var viewHeight = window.innerHeight || document.documentElement.clientHeight;
+var result = {notification: null, error: null, position: null};
+
+function isVisible(el) {
+    if (!el.getClientRects().length) return false;
+    var style = window.getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.display !== 'none' && style.opacity !== '0';
+}
+
+function containsAny(text, keywords) {
+    for (var i = 0; i < keywords.length; i++) {
+        if (text.indexOf(keywords[i]) !== -1) return true;
+    }
+    return false;
+}
+
+var walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT, null, false);
+var checked = new Set();
+var node;
+while ((node = walker.nextNode())) {
+    var el = node.parentElement;
+    if (!el || checked.has(el)) continue;
+    var text = node.nodeValue;
+    var isNotification = result.notification === null && containsAny(text, notificationKeywords);
+    var isError = result.error === null && containsAny(text, errorKeywords);
+    if (!isNotification && !isError) continue;
+    checked.add(el);
+    if (!isVisible(el)) continue;
+
+    if (isNotification) {
+        // 通知一般出现在页面右上角
+        var rect = el.getBoundingClientRect();
+        if (rect.left > viewWidth * 0.5 && rect.top < viewHeight * 0.3) {
+            result.notification = (el.innerText || text).trim().slice(0, 200);
+            result.position = {x: Math.round(rect.left), y: Math.round(rect.top)};
+        }
+    }
+    if (isError) {
+        var errorText = (el.innerText || text).trim();
+        if (errorText.length > 3) result.error = errorText.slice(0, 500);
+    }
+    if (result.notification !== null && result.error !== null) break;
+}
+return result;
+"""
+
 
 class SoraAutomation:
+    # 完成通知 / 错误提示关键词
+    NOTIFICATION_KEYWORDS = ['完成', '成功', 'Complete', 'Success', 'finished', 'done']
+    ERROR_KEYWORDS = ['错误', 'error', 'Error', '失败', 'failed', 'Failed']
+    
     def __init__(self, profile_id=None):
         """
         初始化 Sora 自动化工具
@@ -29,11 +88,34 @@ class SoraAutomation:
         self.driver = None
         self.debugging_address = None
         self.is_mobile = None  # 是否为手机UA
+        # 后端传入的阶段回调 phase_callback(phase)，phase 为 open / navigate / input / submit / wait
+        self.phase_callback = None
+        self._cancel_token = None  # 当前任务的取消令牌（后端终止任务 / 看门狗取消时设置）
         
         # 创建错误截图保存目录
         self.error_screenshot_dir = os.path.join(os.path.dirname(__file__), '..', 'err_picture')
         os.makedirs(self.error_screenshot_dir, exist_ok=True)
     
+    def _check_cancelled(self):
+        """检查点：当前任务已被取消时抛出 TaskCancelled"""
+        if self._cancel_token is not None:
+            self._cancel_token.raise_if_cancelled()
+    
+    def _sleep(self, seconds):
+        """可被取消打断的等待"""
+        if self._cancel_token is not None:
+            self._cancel_token.wait(seconds)
+        else:
+            time.sleep(seconds)
+    
+    def _enter_phase(self, phase):
+        """通知后端任务进入新阶段"""
+        if self.phase_callback:
+            try:
+                self.phase_callback(phase)
+            except Exception as e:
+                print(f'  阶段回调失败: {e}')
+    
     def _save_error_screenshot(self, prefix='error'):
         """保存错误截图到指定目录"""
         try:
@@ -364,7 +446,7 @@ class SoraAutomation:
             return True  # 返回 True 继续执行
 
     
-    def _paste_image(self, image_data):
+    def _paste_image(self, image_data, image_cache=None):
         """
         粘贴图片到输入框
         
@@ -373,56 +455,21 @@ class SoraAutomation:
                 - URL字符串: "https://example.com/image.jpg"
                 - Base64字符串: "data:image/jpeg;base64,/9j/4AAQ..."
                 - 本地文件路径: "C:/path/to/image.jpg"
+            image_cache: 参考图缓存；传入时使用预取并缩小后的图片，否则当场读取原图
         """
         print('  准备粘贴图片...')
         print(f'  图片数据类型: {type(image_data)}')
         
         try:
-            import requests
-            import base64
-            from io import BytesIO
-            
             # 1. 将图片转换为Base64格式
-            base64_image = None
-            
-            if image_data.startswith('data:image'):
-                # 已经是Base64格式
-                print('  图片已是Base64格式')
-                base64_image = image_data
-            elif image_data.startswith('http://') or image_data.startswith('https://'):
-                # 从URL下载图片
-                print(f'  从URL下载图片: {image_data[:50]}...')
-                response = requests.get(image_data, timeout=10)
-                if response.status_code == 200:
-                    # 转换为Base64
-                    image_bytes = response.content
-                    base64_str = base64.b64encode(image_bytes).decode('utf-8')
-                    
-                    # 检测图片类型
-                    content_type = response.headers.get('Content-Type', 'image/jpeg')
-                    base64_image = f'data:{content_type};base64,{base64_str}'
-                    print(f'  ✓ 图片已下载并转换为Base64 (大小: {len(base64_str)} 字符)')
-                else:
-                    raise Exception(f'下载图片失败: HTTP {response.status_code}')
+            if image_cache is not None:
+                cached = image_cache.get(image_data)
+                base64_image = cached.to_data_url()
+                print(f'  ✓ 使用缓存的图片 (大小: {cached.size} 字节, {cached.mime_type})')
             else:
-                # 假设是本地文件路径
-                print(f'  读取本地文件: {image_data}')
-                with open(image_data, 'rb') as f:
-                    image_bytes = f.read()
-                    base64_str = base64.b64encode(image_bytes).decode('utf-8')
-                    
-                    # 根据文件扩展名判断类型
-                    if image_data.lower().endswith('.png'):
-                        mime_type = 'image/png'
-                    elif image_data.lower().endswith('.jpg') or image_data.lower().endswith('.jpeg'):
-                        mime_type = 'image/jpeg'
-                    elif image_data.lower().endswith('.gif'):
-                        mime_type = 'image/gif'
-                    else:
-                        mime_type = 'image/jpeg'
-                    
-                    base64_image = f'data:{mime_type};base64,{base64_str}'
-                    print(f'  ✓ 本地图片已转换为Base64 (大小: {len(base64_str)} 字符)')
+                image_bytes, mime_type = load_image(image_data)
+                base64_image = to_data_url(image_bytes, mime_type)
+                print(f'  ✓ 图片已转换为Base64 (大小: {len(base64_image)} 字符)')
             
             if not base64_image:
                 raise Exception('无法获取图片的Base64数据')
@@ -666,6 +713,8 @@ class SoraAutomation:
             time.sleep(1)
             
             # 步骤4: 直接查找并点击发送按钮（手机端最可靠的方法）
+            self._check_cancelled()
+            self._enter_phase('submit')
             print('  [DEBUG] 查找发送按钮...')
             send_success = False
             
@@ -870,6 +919,8 @@ class SoraAutomation:
                 print(f'  再次点击失败: {e}，继续执行...')
             
             # 步骤5: 按回车键发送
+            self._check_cancelled()
+            self._enter_phase('submit')
             print('  按回车键发送...')
             try:
                 textarea.send_keys(Keys.RETURN)
@@ -987,7 +1038,64 @@ class SoraAutomation:
             traceback.print_exc()
             raise
     
-    def _wait_for_video(self, timeout=None, progress_callback=None, task_id=None):
+    def _fetch_task_status(self, task_id, elapsed):
+        """通过后端API查询任务数据（独立运行、没有完成信号时使用）"""
+        try:
+            import requests
+            response = requests.get(f'http://localhost:8000/api/tasks/{task_id}', timeout=2)
+            if response.status_code == 200:
+                task_data = response.json()
+                # 接口返回 {"success": true, "data": {...}}
+                return task_data.get('data') or task_data
+        except Exception as e:
+            if elapsed % 30 == 0:
+                print(f'  检查任务状态时出错: {e}')
+        return None
+    
+    def _check_task_update(self, task_data, progress_callback=None):
+        """
+        根据任务最新数据判断视频是否已生成
+        
+        Returns:
+            'success' / 'failed'，还在生成中返回 None
+        """
+        # 🆕 最优先：检查是否已经有 video_url（说明插件已完成匹配）
+        if task_data.get('video_url'):
+            print(f'  ✓ 检测到视频URL已存在: {task_data["video_url"][:80]}...')
+            if progress_callback:
+                progress_callback(100, '视频URL已获取')
+            return 'success'
+        # 优先检查任务状态是否已经是 success 或 published（说明插件已完成匹配）
+        if task_data.get('status') in ['success', 'published']:
+            print(f'  ✓ 检测到任务状态已更新为 {task_data.get("status")}（插件已完成匹配）')
+            if progress_callback:
+                progress_callback(95, '视频生成完成')
+            return 'success'
+        # 检查是否有generation_id（说明plug-renwu已捕获到草稿）
+        if task_data.get('generation_id'):
+            print(f'  ✓ 检测到草稿数据: generation_id={task_data["generation_id"]}')
+            if progress_callback:
+                progress_callback(95, '视频生成完成')
+            return 'success'
+        # 插件回调已把任务标记为失败（如内容违规）
+        if task_data.get('status') == 'failed':
+            print(f'  ✗ 检测到任务已失败: {task_data.get("error_message")}')
+            return 'failed'
+        return None
+    
+    def _probe_page_status(self):
+        """
+        一次 execute_script 检测页面上的完成通知和错误提示
+        
+        Returns:
+            dict: {'notification': 通知文字, 'error': 错误文字, 'position': 通知位置}，未检测到的字段为 None
+        """
+        result = self.driver.execute_script(
+            PAGE_STATUS_PROBE_SCRIPT, self.NOTIFICATION_KEYWORDS, self.ERROR_KEYWORDS
+        )
+        return result or {}
+    
+    def _wait_for_video(self, timeout=None, progress_callback=None, task_id=None, completion_waiter=None):
         """
         等待视频生成完成 - 只检测生成完成的通知
         
@@ -995,20 +1103,29 @@ class SoraAutomation:
             timeout: 超时时间（秒），None表示无限等待
             progress_callback: 进度回调函数
             task_id: 任务ID（用于从后端API检查进度）
+            completion_waiter: 完成信号等待函数 waiter(timeout) -> 任务最新数据 或 None，
+                               由后端传入；为 None 时（独立运行）退回到轮询后端API
         
         注意：不再尝试获取视频URL，URL将由插件通过提示词匹配来关联
         """
         print('  等待视频生成完成...')
         print('  注意：视频URL将由插件自动匹配，无需在此获取')
-        print('  ⚠️  已禁用超时检测，将一直等待直到成功或失败')
-        if task_id:
+        print('  ⚠️  不设超时，将一直等待直到成功、失败或被后端取消')
+        if completion_waiter is not None:
+            print(f'  任务ID: {task_id}，将等待后端推送的完成信号')
+        elif task_id:
             print(f'  任务ID: {task_id}，将通过后端API检查进度')
         
         start_time = time.time()
         last_progress_report = 0
         notification_detected = False
+        task_update = None  # 最近一次收到的任务数据（完成信号或API查询结果）
         
-        while True:  # 移除超时限制，无限等待
+        while True:  # 不设超时，由后端看门狗按阶段截止时间取消
+            if self._cancel_token is not None and self._cancel_token.cancelled:
+                print(f'  ✗ 任务已被取消: {self._cancel_token.reason}')
+                return {'success': False, 'error': f'任务已取消: {self._cancel_token.reason}', 'cancelled': True,
+                        'duration': int(time.time() - start_time)}
             try:
                 elapsed = int(time.time() - start_time)
                 
@@ -1019,69 +1136,38 @@ class SoraAutomation:
                     progress_callback(estimated_progress, f'视频生成中 ({elapsed}秒)')
                     last_progress_report = elapsed
                 
-                # 方法1: 检测右上角的成功通知弹窗
-                if not notification_detected:
+                # 一次脚本调用同时检测通知和错误（已收到任务数据时先处理任务数据）
+                page_status = {}
+                if not task_update:
                     try:
-                        # 查找可能的通知元素（通常包含"完成"、"成功"、"Complete"、"Success"等文字）
-                        notification_keywords = ['完成', '成功', 'Complete', 'Success', 'finished', 'done']
-                        
-                        for keyword in notification_keywords:
-                            # 查找包含关键词的元素
-                            elements = self.driver.find_elements(By.XPATH, f"//*[contains(text(), '{keyword}')]")
-                            
-                            for elem in elements:
-                                try:
-                                    if elem.is_displayed():
-                                        # 检查元素位置是否在右上角（通常通知在页面右上角）
-                                        location = elem.location
-                                        size = self.driver.get_window_size()
-                                        
-                                        # 如果元素在页面右侧且靠近顶部，可能是通知
-                                        if location['x'] > size['width'] * 0.5 and location['y'] < size['height'] * 0.3:
-                                            print(f'  ✓ 检测到成功通知: {elem.text[:50]}...')
-                                            notification_detected = True
-                                            if progress_callback:
-                                                progress_callback(95, '视频生成完成')
-                                            break
-                                except:
-                                    continue
-                            
-                            if notification_detected:
-                                break
+                        page_status = self._probe_page_status()
                     except Exception as e:
                         if elapsed % 30 == 0:
-                            print(f'  检查通知时出错: {e}')
+                            print(f'  检查页面状态时出错: {e}')
                 
-                # 方法2: 通过后端API检查任务进度（从plug-renwu插件捕获的数据）
+                # 方法1: 检测右上角的成功通知弹窗
+                if not notification_detected and page_status.get('notification'):
+                    print(f'  ✓ 检测到成功通知: {page_status["notification"][:50]}... 位置: {page_status.get("position")}')
+                    notification_detected = True
+                    if progress_callback:
+                        progress_callback(95, '视频生成完成')
+                
+                # 方法2: 检查任务数据（从plug-renwu插件捕获的数据）
+                # 后端运行时由插件回调直接推送完成信号；独立运行时通过后端API查询
                 if not notification_detected and task_id:
-                    try:
-                        import requests
-                        # 检查任务状态，看是否已经有草稿数据（说明视频已生成）
-                        response = requests.get(f'http://localhost:8000/api/tasks/{task_id}', timeout=2)
-                        if response.status_code == 200:
-                            task_data = response.json()
-                            
-                            # 🆕 最优先：检查是否已经有 video_url（说明插件已完成匹配）
-                            if task_data.get('video_url'):
-                                print(f'  ✓ 检测到视频URL已存在: {task_data["video_url"][:80]}...')
-                                notification_detected = True
-                                if progress_callback:
-                                    progress_callback(100, '视频URL已获取')
-                            # 优先检查任务状态是否已经是 success 或 published（说明插件已完成匹配）
-                            elif task_data.get('status') in ['success', 'published']:
-                                print(f'  ✓ 检测到任务状态已更新为 {task_data.get("status")}（插件已完成匹配）')
-                                notification_detected = True
-                                if progress_callback:
-                                    progress_callback(95, '视频生成完成')
-                            # 检查是否有generation_id（说明plug-renwu已捕获到草稿）
-                            elif task_data.get('generation_id'):
-                                print(f'  ✓ 检测到草稿数据: generation_id={task_data["generation_id"]}')
-                                notification_detected = True
-                                if progress_callback:
-                                    progress_callback(95, '视频生成完成')
-                    except Exception as e:
-                        if elapsed % 30 == 0:
-                            print(f'  检查任务状态时出错: {e}')
+                    if completion_waiter is None:
+                        task_update = self._fetch_task_status(task_id, elapsed)
+                    if task_update:
+                        outcome = self._check_task_update(task_update, progress_callback)
+                        error_message = task_update.get('error_message')
+                        task_update = None
+                        if outcome == 'failed':
+                            error_text = error_message or '任务已被标记为失败'
+                            if progress_callback:
+                                progress_callback(0, f'错误: {error_text}')
+                            return {'success': False, 'error': error_text, 'duration': elapsed}
+                        if outcome == 'success':
+                            notification_detected = True
                 
                 # 如果检测到通知，视频生成完成
                 if notification_detected:
@@ -1112,23 +1198,18 @@ class SoraAutomation:
                     }
                 
                 # 方法3: 检查错误
-                try:
-                    error_keywords = ['错误', 'error', 'Error', '失败', 'failed', 'Failed']
-                    for keyword in error_keywords:
-                        error_elements = self.driver.find_elements(By.XPATH, f"//*[contains(text(), '{keyword}')]")
-                        for elem in error_elements:
-                            if elem.is_displayed():
-                                error_text = elem.text.strip()
-                                if error_text and len(error_text) > 3:
-                                    print(f'  ✗ 检测到错误: {error_text}')
-                                    if progress_callback:
-                                        progress_callback(0, f'错误: {error_text}')
-                                    return {'success': False, 'error': error_text, 'duration': elapsed}
-                except:
-                    pass
+                if page_status.get('error'):
+                    error_text = page_status['error']
+                    print(f'  ✗ 检测到错误: {error_text}')
+                    if progress_callback:
+                        progress_callback(0, f'错误: {error_text}')
+                    return {'success': False, 'error': error_text, 'duration': elapsed}
                 
-                # 每5秒检查一次
-                time.sleep(5)
+                # 每5秒检查一次；有完成信号或任务被取消时立即唤醒
+                if completion_waiter is not None:
+                    task_update = completion_waiter(5)
+                else:
+                    self._sleep(5)
                 
                 # 显示等待进度（每30秒）
                 if elapsed % 30 == 0 and elapsed > 0:
@@ -1138,7 +1219,7 @@ class SoraAutomation:
                 print(f'  检查时出错: {e}')
                 import traceback
                 traceback.print_exc()
-                time.sleep(5)
+                self._sleep(5)
         
         # 这段代码永远不会执行到，因为上面是无限循环
         # 只有在检测到成功或错误时才会 return
@@ -1162,41 +1243,52 @@ class SoraAutomation:
             print(f'  下载失败: {e}')
             return False
     
-    def generate_video(self, prompt, image=None, auto_download=True, progress_callback=None, task_id=None):
+    def submit_video(self, prompt, image=None, progress_callback=None, image_cache=None, cancel_token=None):
         """
-        生成视频
+        提交视频生成（打开页面、粘贴参考图、输入提示词并发送），不等待生成结果
+        
+        流水线模式下后端用它连续提交多个提示词，生成结果由插件回调推送
         
         Args:
             prompt: 视频提示词
             image: 参考图片 URL（可选）
-            auto_download: 是否自动下载
             progress_callback: 进度回调函数 callback(progress, message)
-            task_id: 任务ID（用于从后端API检查进度）
+            image_cache: 参考图缓存（后端传入，领取任务时已开始预取）
+            cancel_token: 取消令牌（CancelToken），每个步骤之间检查
         
         Returns:
-            dict: 生成结果
+            dict: {'success': True} 或 {'success': False, 'error': 错误信息}；被取消时带 'cancelled': True
         """
+        self._cancel_token = cancel_token
         try:
             # 1. 打开浏览器
+            self._check_cancelled()
             if self.driver is None:
+                self._enter_phase('open')
                 if progress_callback:
                     progress_callback(10, '打开浏览器窗口')
                 self._open_browser()
             
             # 2. 导航到 Sora
+            self._check_cancelled()
+            self._enter_phase('navigate')
             if progress_callback:
                 progress_callback(20, '导航到Sora页面')
             self._navigate_to_sora()
             
             # 3. 如果有图片，先粘贴图片
+            self._check_cancelled()
+            self._enter_phase('input')
             if image:
                 if progress_callback:
                     progress_callback(25, '粘贴参考图片')
                 print(f'  ========== 开始粘贴图片 ==========')
                 print(f'  检测到图片参数: {image[:100] if isinstance(image, str) else image}...')
                 try:
-                    self._paste_image(image)
+                    self._paste_image(image, image_cache)
                     print(f'  ========== 图片粘贴完成 ==========')
+                except TaskCancelled:
+                    raise
                 except Exception as e:
                     print(f'  ========== 图片粘贴失败 ==========')
                     print(f'  错误: {e}')
@@ -1209,14 +1301,51 @@ class SoraAutomation:
             
             # 4. 输入提示词（不需要先点击创建按钮）
             # 输入后会自动出现创建视频按钮
+            self._check_cancelled()
             if progress_callback:
                 progress_callback(30, '输入提示词')
             self._input_prompt(prompt)
             
+            return {'success': True}
+        
+        except TaskCancelled as e:
+            print(f'  ✗ 任务已被取消: {e}')
+            return {'success': False, 'error': f'任务已取消: {e}', 'cancelled': True}
+        except Exception as e:
+            if progress_callback:
+                progress_callback(0, f'错误: {str(e)}')
+            return {'success': False, 'error': str(e)}
+    
+    def generate_video(self, prompt, image=None, auto_download=True, progress_callback=None, task_id=None,
+                       completion_waiter=None, image_cache=None, cancel_token=None):
+        """
+        生成视频（提交后阻塞等待生成完成）
+        
+        Args:
+            prompt: 视频提示词
+            image: 参考图片 URL（可选）
+            auto_download: 是否自动下载
+            progress_callback: 进度回调函数 callback(progress, message)
+            task_id: 任务ID（用于从后端API检查进度）
+            completion_waiter: 完成信号等待函数（后端传入，见 _wait_for_video）
+            image_cache: 参考图缓存（后端传入，领取任务时已开始预取）
+            cancel_token: 取消令牌（CancelToken），提交的每个步骤之间和等待生成的每次轮询中检查
+        
+        Returns:
+            dict: 生成结果；被取消时带 'cancelled': True
+        """
+        submitted = self.submit_video(prompt, image, progress_callback, image_cache, cancel_token)
+        if not submitted['success']:
+            return submitted
+        
+        try:
             # 5. 等待视频生成
+            self._check_cancelled()
+            self._enter_phase('wait')
             if progress_callback:
                 progress_callback(40, '等待视频生成')
-            result = self._wait_for_video(progress_callback=progress_callback, task_id=task_id)
+            result = self._wait_for_video(progress_callback=progress_callback, task_id=task_id,
+                                          completion_waiter=completion_waiter)
             
             # 5. 不再下载视频（video_url由插件匹配）
             # 旧逻辑：下载视频
@@ -1230,6 +1359,9 @@ class SoraAutomation:
             
             return result
         
+        except TaskCancelled as e:
+            print(f'  ✗ 任务已被取消: {e}')
+            return {'success': False, 'error': f'任务已取消: {e}', 'cancelled': True}
         except Exception as e:
             if progress_callback:
                 progress_callback(0, f'错误: {str(e)}')
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+账号配额模型
+
+插件捕获的配额（剩余视频数、是否触发速率限制、距离重置的秒数）以前只写入 sora_quota 表，
+分派任务时并不参考，任务被分给额度已用完的账号后只会失败并白白占用一轮窗口。
+
+QuotaModel 在内存中维护每个账号的配额：
+- 收到配额捕获时更新（启动时从 sora_quota_latest 加载）
+- 每提交一个视频减 1（两次捕获之间的估计值）
+- 额度用完或触发速率限制的账号在预计重置时间之前视为不可用
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+
+class _AccountQuota:
+    __slots__ = ('remaining', 'rate_limited', 'reset_at', 'captured_at', 'submitted')
+
+    def __init__(self):
+        self.remaining = None  # 估计的剩余视频数；None 表示未知
+        self.rate_limited = False
+        self.reset_at = None  # 预计重置时间（time.time() 时间戳）
+        self.captured_at = None  # 最近一次配额捕获时间
+        self.submitted = 0  # 最近一次捕获之后提交的视频数
+
+
+class QuotaModel:
+    def __init__(self, recheck_interval: float = 600):
+        """
+        Args:
+            recheck_interval: 额度用完但不知道重置时间时，多久之后重新尝试（秒）
+        """
+        self.recheck_interval = recheck_interval
+        self._lock = threading.Lock()
+        self._accounts = {}  # 账号邮箱 -> _AccountQuota
+
+    def update(self, email: str, remaining: Optional[int], rate_limited: bool = False,
+               resets_in_seconds: Optional[float] = None, captured_at: float = None):
+        """收到配额捕获"""
+        if not email:
+            return
+        now = captured_at or time.time()
+        with self._lock:
+            quota = self._accounts.setdefault(email, _AccountQuota())
+            if quota.captured_at is not None and now < quota.captured_at:
+                return  # 迟到的旧数据
+            quota.remaining = remaining
+            quota.rate_limited = bool(rate_limited)
+            quota.reset_at = now + resets_in_seconds if resets_in_seconds else None
+            quota.captured_at = now
+            quota.submitted = 0
+
+    def load(self, latest_quotas: Dict[str, dict]):
+        """从最新配额记录（Database.get_latest_quotas）初始化"""
+        for email, row in latest_quotas.items():
+            captured_at = row.get('updated_at')
+            timestamp = captured_at.timestamp() if isinstance(captured_at, datetime) else None
+            self.update(
+                email,
+                row.get('estimated_num_videos_remaining'),
+                rate_limited=row.get('rate_limit_reached'),
+                resets_in_seconds=row.get('access_resets_in_seconds'),
+                captured_at=timestamp
+            )
+
+    def consume(self, email: str, count: int = 1):
+        """提交了视频，估计的剩余视频数减少"""
+        if not email:
+            return
+        with self._lock:
+            quota = self._accounts.get(email)
+            if quota is None:
+                return
+            quota.submitted += count
+            if quota.remaining is not None:
+                quota.remaining = max(0, quota.remaining - count)
+
+    def is_available(self, email: Optional[str], now: float = None) -> bool:
+        """账号当前能否提交视频（没有配额数据的账号视为可用）"""
+        return self.unavailable_until(email, now) is None
+
+    def unavailable_until(self, email: Optional[str], now: float = None) -> Optional[float]:
+        """
+        账号不可用时返回预计恢复的时间戳，可用时返回 None
+
+        额度用完或触发速率限制时，在重置时间之前不可用；
+        不知道重置时间时，在最近一次捕获后 recheck_interval 秒内不可用
+        """
+        if not email:
+            return None
+        now = now or time.time()
+        with self._lock:
+            quota = self._accounts.get(email)
+            if quota is None:
+                return None
+            exhausted = quota.rate_limited or (quota.remaining is not None and quota.remaining <= 0)
+            if not exhausted:
+                return None
+            until = quota.reset_at or (quota.captured_at or now) + self.recheck_interval
+            if until <= now:
+                # 已过重置时间：清除过期的限制，等待下一次捕获确认实际额度
+                quota.rate_limited = False
+                quota.remaining = None
+                quota.reset_at = None
+                return None
+            return until
+
+    def remaining(self, email: Optional[str]) -> Optional[int]:
+        with self._lock:
+            quota = self._accounts.get(email) if email else None
+            return quota.remaining if quota else None
+
+    def order_by_remaining(self, items: Iterable, email_of) -> List:
+        """
+        按估计剩余视频数从多到少排序（剩余多的账号先分到任务，各账号的额度尽量同时用完）
+
+        没有配额数据的账号排在有剩余额度的账号之后
+        """
+        def key(item):
+            remaining = self.remaining(email_of(item))
+            return (remaining is None, -(remaining or 0))
+        return sorted(items, key=key)
+
+    def get_stats(self) -> Dict:
+        now = time.time()
+        accounts = {}
+        with self._lock:
+            emails = list(self._accounts)
+        for email in emails:
+            until = self.unavailable_until(email, now)
+            with self._lock:
+                quota = self._accounts[email]
+                accounts[email] = {
+                    'remaining': quota.remaining,
+                    'rate_limited': quota.rate_limited,
+                    'submitted_since_capture': quota.submitted,
+                    'available': until is None,
+                    'resets_in_seconds': round(until - now) if until else None,
+                    'captured_at': datetime.fromtimestamp(quota.captured_at).isoformat() if quota.captured_at else None
+                }
+        return {
+            'accounts': accounts,
+            'available': sum(1 for a in accounts.values() if a['available']),
+            'exhausted': sum(1 for a in accounts.values() if not a['available']),
+            'total_remaining': sum(a['remaining'] or 0 for a in accounts.values())
+        }
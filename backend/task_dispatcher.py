@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+事件驱动的任务分派器
+
+维护一个空闲窗口就绪队列，只在以下事件发生时唤醒分派：
+- 有新任务（创建 / 导入 / 重试 / 终止后退回队列）
+- 窗口变为空闲
+- 窗口打开
+没有事件时线程一直休眠，不再定时扫描窗口状态和查询数据库。
+"""
+
+import threading
+import traceback
+from collections import deque
+from typing import Callable, List
+
+
+class TaskDispatcher:
+    def __init__(self, assign_func: Callable[[List[int]], List[int]], fallback_interval: float = 60):
+        """
+        Args:
+            assign_func: 分派函数，参数为就绪的窗口ID列表，
+                         返回仍然空闲但没有分到任务的窗口ID列表
+            fallback_interval: 兜底检查间隔（秒），用于发现绕过后端直接写入数据库的任务
+        """
+        self._assign = assign_func
+        self.fallback_interval = fallback_interval
+
+        self._cond = threading.Condition()
+        self._ready = deque()
+        self._ready_set = set()
+        # 每次有新任务事件时版本号 +1；分派时发现任务不足会记下当时的版本号，
+        # 在版本号变化之前不再用剩余的空闲窗口去查询数据库
+        self._tasks_version = 0
+        self._exhausted_version = -1
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """启动分派线程（重复调用无副作用）"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='task-dispatcher', daemon=True)
+        self._thread.start()
+        print("任务分派器已启动")
+
+    def stop(self):
+        """停止分派线程"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def mark_idle(self, profile_id: int):
+        """窗口变为空闲（或刚打开），加入就绪队列"""
+        with self._cond:
+            if profile_id not in self._ready_set:
+                self._ready.append(profile_id)
+                self._ready_set.add(profile_id)
+            self._cond.notify()
+
+    def discard(self, profile_id: int):
+        """窗口关闭或不再可用，从就绪队列移除"""
+        with self._cond:
+            if profile_id in self._ready_set:
+                self._ready_set.discard(profile_id)
+                self._ready.remove(profile_id)
+
+    def notify_tasks(self):
+        """有新的待处理任务"""
+        with self._cond:
+            self._tasks_version += 1
+            self._cond.notify()
+
+    def get_ready_profiles(self) -> List[int]:
+        """获取当前就绪队列中的窗口（用于状态展示）"""
+        with self._cond:
+            return list(self._ready)
+
+    def _has_work(self) -> bool:
+        return bool(self._ready) and self._tasks_version != self._exhausted_version
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._has_work():
+                    signaled = self._cond.wait(timeout=self.fallback_interval)
+                    if not signaled and self._ready:
+                        # 兜底：长时间没有事件但仍有空闲窗口，重新查一次数据库
+                        self._tasks_version += 1
+                if not self._running:
+                    return
+
+                profile_ids = list(self._ready)
+                self._ready.clear()
+                self._ready_set.clear()
+                version = self._tasks_version
+
+            try:
+                leftover = self._assign(profile_ids) or []
+            except Exception as e:
+                print(f"任务分派出错: {e}")
+                traceback.print_exc()
+                # 出错时保留窗口，等待下一个事件或兜底检查再试
+                leftover = profile_ids
+
+            with self._cond:
+                for profile_id in leftover:
+                    if profile_id not in self._ready_set:
+                        self._ready.append(profile_id)
+                        self._ready_set.add(profile_id)
+                if leftover:
+                    self._exhausted_version = version
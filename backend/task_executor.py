@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务执行器模块
+
+- TaskExecutor: 有界任务执行器（守护线程），限制同时执行的任务数，支持关闭时等待任务排空
+- DelayedScheduler: 基于最小堆的延迟调度器，用一个线程处理所有延迟操作，
+  代替在任务线程里 time.sleep 等待
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from typing import Callable, Dict
+
+
+class TaskExecutor:
+    """
+    有界任务执行器
+
+    每个任务在一个守护线程中执行（不使用 ThreadPoolExecutor：它的工作线程不是守护线程，
+    解释器退出时会先等待所有工作线程结束，再执行 atexit 清理，卡住的自动化线程会让后端无法退出）
+    """
+
+    def __init__(self, max_workers: int, on_slot_free: Callable = None):
+        """
+        Args:
+            max_workers: 最大并发执行数
+            on_slot_free: 有任务执行完、空出名额时的回调
+        """
+        self.max_workers = max_workers
+        self._on_slot_free = on_slot_free
+        self._lock = threading.Condition()
+        self._active = 0  # 正在执行的任务数
+        self._seq = itertools.count(1)
+        self._accepting = True
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'errors': 0
+        }
+
+    def free_slots(self) -> int:
+        """当前空闲名额"""
+        with self._lock:
+            if not self._accepting:
+                return 0
+            return self.max_workers - self._active
+
+    def submit(self, func: Callable, *args) -> bool:
+        """提交任务，名额已满或正在关闭时返回 False"""
+        with self._lock:
+            if not self._accepting or self._active >= self.max_workers:
+                return False
+            self._active += 1
+            self._stats['submitted'] += 1
+            name = f'task-worker-{next(self._seq)}'
+        threading.Thread(target=self._run, args=(func,) + args, name=name, daemon=True).start()
+        return True
+
+    def _run(self, func: Callable, *args):
+        try:
+            func(*args)
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            print(f"任务执行线程出错: {e}")
+            traceback.print_exc()
+        finally:
+            self._on_done()
+
+    def _on_done(self):
+        with self._lock:
+            self._active -= 1
+            self._stats['completed'] += 1
+            accepting = self._accepting
+            self._lock.notify_all()
+        if accepting and self._on_slot_free:
+            try:
+                self._on_slot_free()
+            except Exception as e:
+                print(f"名额释放回调出错: {e}")
+
+    def get_stats(self) -> Dict:
+        """获取执行器统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active'] = self._active
+            stats['max_workers'] = self.max_workers
+        return stats
+
+    def shutdown(self, timeout: float = None) -> int:
+        """
+        停止接收新任务，并等待正在执行的任务结束
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            超时后仍未结束的任务数
+        """
+        with self._lock:
+            self._accepting = False
+            if self._active:
+                print(f"等待 {self._active} 个正在执行的任务结束（最多 {timeout} 秒）...")
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+            # 不再等待剩余任务：执行线程是守护线程，进程退出时随之结束
+            return self._active
+
+
+class DelayedScheduler:
+    """基于最小堆的延迟调度器"""
+
+    def __init__(self, name: str = 'delayed-scheduler'):
+        self._heap = []  # [(due, seq, func, args)]
+        self._seq = itertools.count()
+        self._cancelled = set()
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def schedule(self, delay: float, func: Callable, *args) -> int:
+        """延迟 delay 秒后执行 func(*args)，返回可用于取消的句柄"""
+        with self._cond:
+            seq = next(self._seq)
+            heapq.heappush(self._heap, (time.monotonic() + delay, seq, func, args))
+            self._cond.notify()
+        return seq
+
+    def cancel(self, handle: int):
+        """取消尚未执行的延迟操作"""
+        with self._cond:
+            if any(item[1] == handle for item in self._heap):
+                self._cancelled.add(handle)
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._heap) - len(self._cancelled)
+
+    def shutdown(self):
+        """停止调度，丢弃尚未到期的延迟操作"""
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self._cancelled.clear()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    remaining = self._heap[0][0] - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._running:
+                    return
+                _, seq, func, args = heapq.heappop(self._heap)
+                if seq in self._cancelled:
+                    self._cancelled.discard(seq)
+                    continue
+
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"延迟任务执行出错: {e}")
+                traceback.print_exc()
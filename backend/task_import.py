@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务文件流式导入
+
+大文件（含 base64 图片的提示词导出等）不再整体读入内存后解析：
+逐条读取任务，每攒满一批就写入数据库并提交，内存占用只与批大小有关。
+
+支持的格式（与 python自动化/main.py 读取的格式一致）:
+- json:  {"tasks": [...]} 或顶层数组 [...]，增量解析，不整体加载
+- jsonl: 每行一个任务对象（.jsonl / .ndjson）
+- csv:   表头包含 prompt，可选 image / account_id / profile_id / model
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+from typing import Callable, Dict, Iterator, Optional
+
+# 导入的任务（字段与 TaskImport 一致，供 Database.import_tasks 使用）
+ImportedTask = namedtuple('ImportedTask', 'account_id profile_id prompt image model')
+
+# 单个任务的最大大小（字节），防止格式错误的文件把整个文件读入缓冲区
+MAX_RECORD_BYTES = 64 * 1024 * 1024
+
+# 最多记录的无效任务错误信息条数
+MAX_REPORTED_ERRORS = 20
+
+_WHITESPACE_RE = re.compile(r'\s*')
+
+# CSV 中的 base64 图片可能超过默认的 128KB 字段长度限制
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def detect_import_format(filename: Optional[str]) -> Optional[str]:
+    """根据文件扩展名判断格式，无法判断时返回 None"""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.csv':
+        return 'csv'
+    if ext == '.json':
+        return 'json'
+    return None
+
+
+class _CountingReader(io.RawIOBase):
+    """统计已读取字节数的文件包装，用于计算导入进度"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._raw.readinto(buffer)
+        self.bytes_read += n or 0
+        return n
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+class _JsonStream:
+    """在文本流上逐个解析 JSON 值，缓冲区只保留尚未解析的部分"""
+
+    def __init__(self, fp, chunk_size: int = 1024 * 1024):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int) -> bool:
+        if self.eof:
+            return False
+        chunk = self.fp.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符（文件结束时返回空字符串）"""
+        while True:
+            self.pos = _WHITESPACE_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill(self.chunk_size):
+                return ''
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON 格式错误: 期望 '{char}'，实际为 '{found or '文件结束'}'")
+        self.pos += 1
+
+    def value(self):
+        """解析下一个 JSON 值；数据不完整时继续读取"""
+        self.peek()
+        read_size = self.chunk_size
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+                # 数字可能在缓冲区末尾被截断，读到更多数据后再确认
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if len(self.buf) - self.pos > MAX_RECORD_BYTES:
+                raise ValueError(f"单个任务超过 {MAX_RECORD_BYTES // (1024 * 1024)}MB，或 JSON 格式错误")
+            if not self._fill(read_size):
+                continue
+            read_size *= 2
+
+
+def iter_json_tasks(fp) -> Iterator[Dict]:
+    """增量解析 {"tasks": [...]} 或顶层数组"""
+    stream = _JsonStream(fp)
+    first = stream.peek()
+    if first == '{':
+        stream.expect('{')
+        while True:
+            if stream.peek() == '}':
+                raise ValueError("JSON 文件必须包含 'tasks' 字段")
+            key = stream.value()
+            stream.expect(':')
+            if key == 'tasks':
+                break
+            stream.value()  # 跳过其他字段
+            if stream.peek() == ',':
+                stream.expect(',')
+    elif first != '[':
+        raise ValueError("无效的 JSON 格式")
+
+    if stream.peek() != '[':
+        raise ValueError("'tasks' 必须是数组")
+    stream.expect('[')
+    if stream.peek() == ']':
+        return
+    while True:
+        yield stream.value()
+        char = stream.peek()
+        if char == ']':
+            return
+        stream.expect(',')
+
+
+def iter_jsonl_tasks(fp) -> Iterator[Dict]:
+    for line_no, line in enumerate(fp, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"第 {line_no} 行 JSON 格式错误: {e}")
+
+
+def iter_csv_tasks(fp) -> Iterator[Dict]:
+    reader = csv.DictReader(fp)
+    if not reader.fieldnames or 'prompt' not in reader.fieldnames:
+        raise ValueError("CSV 文件必须包含 prompt 列")
+    yield from reader
+
+
+_PARSERS = {
+    'json': iter_json_tasks,
+    'jsonl': iter_jsonl_tasks,
+    'csv': iter_csv_tasks
+}
+
+
+def _optional_int(value):
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def to_imported_task(record) -> ImportedTask:
+    """把解析出的记录转换为 ImportedTask，字段不合法时抛出 ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError("任务必须是对象")
+    prompt = record.get('prompt')
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError("缺少必需字段: 'prompt'")
+    try:
+        account_id = _optional_int(record.get('account_id'))
+        profile_id = _optional_int(record.get('profile_id'))
+    except (TypeError, ValueError):
+        raise ValueError("account_id / profile_id 必须是整数")
+    return ImportedTask(
+        account_id=account_id,
+        profile_id=profile_id,
+        prompt=prompt,
+        image=record.get('image') or None,
+        model=record.get('model') or None
+    )
+
+
+def import_task_file(path: str, fmt: str, import_func: Callable, chunk_size: int = 500,
+                     on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    流式导入任务文件
+
+    Args:
+        path: 文件路径
+        fmt: 文件格式（json / jsonl / csv）
+        import_func: 写入一批任务的函数（Database.import_tasks），返回 {'created', 'skipped'}
+        chunk_size: 每批写入的任务数量
+        on_progress: 每批提交后回调，参数为当前统计
+
+    Returns:
+        导入统计（数量、无效任务、耗时、吞吐量）
+    """
+    if fmt not in _PARSERS:
+        raise ValueError(f"不支持的文件格式: {fmt}")
+
+    start = time.perf_counter()
+    stats = {
+        'format': fmt,
+        'total': 0,
+        'created': 0,
+        'skipped': 0,
+        'invalid': 0,
+        'errors': [],
+        'bytes_read': 0,
+        'total_bytes': os.path.getsize(path)
+    }
+
+    def flush(chunk):
+        result = import_func(chunk)
+        stats['created'] += result['created']
+        stats['skipped'] += result['skipped']
+
+    def report():
+        elapsed = time.perf_counter() - start
+        stats['bytes_read'] = min(counter.bytes_read, stats['total_bytes'])
+        stats['elapsed_ms'] = round(elapsed * 1000, 1)
+        stats['tasks_per_second'] = round(stats['total'] / elapsed, 1) if elapsed > 0 else None
+        if on_progress:
+            on_progress(dict(stats))
+
+    counter = _CountingReader(open(path, 'rb', buffering=0))
+    with io.TextIOWrapper(io.BufferedReader(counter), encoding='utf-8-sig', newline='') as fp:
+        chunk = []
+        for index, record in enumerate(_PARSERS[fmt](fp)):
+            stats['total'] += 1
+            try:
+                chunk.append(to_imported_task(record))
+            except ValueError as e:
+                stats['invalid'] += 1
+                if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                    stats['errors'].append(f"任务 {index}: {e}")
+                continue
+
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+                report()
+
+        if chunk:
+            flush(chunk)
+        report()
+
+    return stats
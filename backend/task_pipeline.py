@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+窗口任务流水线
+
+Sora 一个账号可以同时生成多个视频，而一个视频要生成 3~5 分钟，
+逐个执行时窗口几乎一直在等待。流水线模式下窗口提交提示词后不再阻塞等待，
+最多同时有 depth 个已提交、正在生成的任务（占用窗口的名额）；
+生成结果由插件回调（按 sora_task_id 绑定到任务）推送，收到完成信号后释放名额。
+
+PipelineTracker 只负责记录每个窗口正在生成的任务，窗口状态和任务状态由 WindowManager 处理。
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class PipelineTracker:
+    def __init__(self, depth: int):
+        """
+        Args:
+            depth: 每个窗口最多同时生成的任务数；1 表示不启用流水线（提交后阻塞等待结果）
+        """
+        self.depth = max(1, depth)
+        self._lock = threading.Lock()
+        self._tasks = {}  # task_id -> {'profile_id', 'submitted_at', 'timeout_handle'}
+        self._by_window = {}  # profile_id -> set(task_id)
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'timeout': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.depth > 1
+
+    def add(self, profile_id: int, task_id: int, timeout_handle: int = None):
+        """登记已提交、正在生成的任务"""
+        with self._lock:
+            self._tasks[task_id] = {
+                'profile_id': profile_id,
+                'submitted_at': time.time(),
+                'timeout_handle': timeout_handle
+            }
+            self._by_window.setdefault(profile_id, set()).add(task_id)
+            self._stats['submitted'] += 1
+
+    def remove(self, task_id: int, outcome: str = None) -> Optional[Dict]:
+        """
+        移除任务（生成完成、失败、超时或被终止）
+
+        Args:
+            outcome: completed / failed / timeout，用于统计；None 表示不计入统计（如手动终止）
+
+        Returns:
+            任务的登记信息；任务未登记时返回 None
+        """
+        with self._lock:
+            entry = self._tasks.pop(task_id, None)
+            if entry is None:
+                return None
+            window_tasks = self._by_window.get(entry['profile_id'])
+            if window_tasks is not None:
+                window_tasks.discard(task_id)
+                if not window_tasks:
+                    del self._by_window[entry['profile_id']]
+            if outcome in self._stats:
+                self._stats[outcome] += 1
+            return entry
+
+    def remove_profile(self, profile_id: int, outcome: str = None) -> Dict[int, Dict]:
+        """
+        移除窗口正在生成的全部任务（窗口被关闭或回收，插件不会再回报这些任务的结果）
+
+        Returns:
+            {task_id: 登记信息}
+        """
+        with self._lock:
+            entries = {task_id: self._tasks.pop(task_id) for task_id in self._by_window.pop(profile_id, ())}
+            if outcome in self._stats:
+                self._stats[outcome] += len(entries)
+            return entries
+
+    def contains(self, task_id: int) -> bool:
+        with self._lock:
+            return task_id in self._tasks
+
+    def count(self, profile_id: int) -> int:
+        """窗口正在生成的任务数"""
+        with self._lock:
+            return len(self._by_window.get(profile_id, ()))
+
+    def tasks(self, profile_id: int) -> List[int]:
+        with self._lock:
+            return sorted(self._by_window.get(profile_id, ()))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'depth': self.depth,
+                'in_flight': len(self._tasks),
+                'windows': {profile_id: len(tasks) for profile_id, tasks in self._by_window.items()}
+            })
+            return stats
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务看门狗
+
+等待视频生成的循环没有超时，页面卡住、插件没有回报或浏览器会话断开时，
+窗口会一直处于 busy 状态，直到有人发现。TaskWatchdog 按阶段（打开窗口、导航、输入、提交、等待生成）
+跟踪每个正在执行的任务，阶段超过截止时间时：
+1. 先请求自动化线程协作取消（线程在下一个检查点退出）
+2. 宽限时间内线程仍未退出，则回收窗口（重新打开）
+
+提交之前的阶段超时，任务退回待处理队列；提交及之后的阶段超时，提示词可能已经发出，
+再次执行会重复生成，任务标记为失败。
+
+每个阶段的截止时间从最近成功完成的耗时中学习（P95 × 余量），不超过该阶段的硬上限；
+样本不足时使用默认截止时间。启动时用数据库中最近成功任务的耗时初始化 wait 阶段的样本。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Tuple
+
+PHASES = ('open', 'navigate', 'input', 'submit', 'wait')
+# 提示词尚未发出的阶段：超时的任务可以安全地退回队列
+PRE_SUBMIT_PHASES = ('open', 'navigate', 'input')
+
+
+class TaskRun:
+    """一次任务执行（同一个任务退回队列后再次执行是另一个 TaskRun）"""
+
+    __slots__ = ('task_id', 'profile_id', 'phase', 'phase_started', 'deadline', 'learned',
+                 'started_at', 'state', 'cancel_at')
+
+    def __init__(self, task_id: int, profile_id: int):
+        self.task_id = task_id
+        self.profile_id = profile_id
+        self.phase = None
+        self.phase_started = None
+        self.deadline = None  # 当前阶段的截止时间（秒）
+        self.learned = False  # 截止时间是否来自历史耗时
+        self.started_at = time.monotonic()
+        self.state = 'running'  # running / cancelling / reclaimed
+        self.cancel_at = None
+
+    @property
+    def intervened(self) -> bool:
+        """看门狗是否已经介入（请求取消或已回收窗口）"""
+        return self.state != 'running'
+
+    def phase_elapsed(self, now: float = None) -> float:
+        return (now or time.monotonic()) - self.phase_started
+
+
+class TaskWatchdog:
+    def __init__(self, on_expired: Callable[[TaskRun, str], None], default_deadlines: Dict[str, float],
+                 ceilings: Dict[str, float], min_deadline: float = 30, margin: float = 2.0,
+                 min_samples: int = 5, history_size: int = 100, cancel_grace: float = 60,
+                 check_interval: float = 5):
+        """
+        Args:
+            on_expired: 介入回调 on_expired(run, action)，action 为 cancel（请求协作取消）或 reclaim（回收窗口）
+            default_deadlines: 样本不足时各阶段的截止时间（秒）
+            ceilings: 各阶段截止时间的硬上限（秒）
+            min_deadline: 学习到的截止时间下限（秒）
+            margin: 学习到的截止时间 = 最近耗时的 P95 × margin
+            min_samples: 开始使用学习到的截止时间所需的样本数
+            history_size: 每个阶段保留的最近耗时样本数
+            cancel_grace: 请求取消后等待线程退出的时间（秒），超时后回收窗口
+            check_interval: 检查间隔（秒）
+        """
+        self.on_expired = on_expired
+        self.default_deadlines = default_deadlines
+        self.ceilings = ceilings
+        self.min_deadline = min_deadline
+        self.margin = margin
+        self.min_samples = min_samples
+        self.cancel_grace = cancel_grace
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._runs = {}  # task_id -> TaskRun
+        self._history = {phase: deque(maxlen=history_size) for phase in PHASES}
+        self._stats = {'cancelled': 0, 'reclaimed': 0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='task-watchdog', daemon=True)
+        self._thread.start()
+
+    def seed(self, phase: str, samples):
+        """用历史耗时（秒）初始化阶段的样本（如启动时从数据库加载），不覆盖已有样本"""
+        with self._lock:
+            history = self._history[phase]
+            for sample in samples:
+                if len(history) >= history.maxlen:
+                    break
+                history.appendleft(sample)
+
+    def start(self, task_id: int, profile_id: int) -> TaskRun:
+        """开始跟踪任务执行（从 open 阶段开始）"""
+        run = TaskRun(task_id, profile_id)
+        with self._lock:
+            self._set_phase(run, 'open', time.monotonic())
+            self._runs[task_id] = run
+        return run
+
+    def enter_phase(self, run: TaskRun, phase: str):
+        """任务进入新阶段：记录上一阶段的耗时，按新阶段设置截止时间"""
+        now = time.monotonic()
+        with self._lock:
+            if run.intervened or run.phase == phase:
+                return
+            self._record(run, now)
+            self._set_phase(run, phase, now)
+
+    def finish(self, run: TaskRun, completed: bool):
+        """
+        任务执行结束（线程已退出）
+
+        Args:
+            completed: 最后一个阶段是否正常完成（失败时不记录该阶段的耗时）
+        """
+        with self._lock:
+            if completed and not run.intervened:
+                self._record(run, time.monotonic())
+            if self._runs.get(run.task_id) is run:
+                del self._runs[run.task_id]
+
+    def deadline_for(self, phase: str) -> Tuple[float, bool]:
+        """
+        阶段的截止时间
+
+        Returns:
+            (截止时间秒数, 是否来自历史耗时)
+        """
+        ceiling = self.ceilings.get(phase, max(self.ceilings.values()))
+        samples = sorted(self._history.get(phase, ()))
+        if len(samples) < self.min_samples:
+            return min(self.default_deadlines.get(phase, ceiling), ceiling), False
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return min(ceiling, max(self.min_deadline, p95 * self.margin)), True
+
+    def _set_phase(self, run: TaskRun, phase: str, now: float):
+        run.phase = phase
+        run.phase_started = now
+        run.deadline, run.learned = self.deadline_for(phase)
+
+    def _record(self, run: TaskRun, now: float):
+        if run.phase in self._history:
+            self._history[run.phase].append(now - run.phase_started)
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            now = time.monotonic()
+            actions = []
+            with self._lock:
+                for run in self._runs.values():
+                    if run.state == 'running' and run.phase_elapsed(now) > run.deadline:
+                        run.state = 'cancelling'
+                        run.cancel_at = now
+                        self._stats['cancelled'] += 1
+                        actions.append((run, 'cancel'))
+                    elif run.state == 'cancelling' and now - run.cancel_at > self.cancel_grace:
+                        run.state = 'reclaimed'
+                        self._stats['reclaimed'] += 1
+                        actions.append((run, 'reclaim'))
+            for run, action in actions:
+                try:
+                    self.on_expired(run, action)
+                except Exception as e:
+                    print(f"⚠️ 看门狗处理任务 {run.task_id} 失败: {e}")
+
+    def shutdown(self):
+        self._stop.set()
+
+    def get_stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            runs = [{
+                'task_id': run.task_id,
+                'profile_id': run.profile_id,
+                'phase': run.phase,
+                'phase_elapsed': round(run.phase_elapsed(now), 1),
+                'deadline': round(run.deadline, 1),
+                'learned': run.learned,
+                'state': run.state
+            } for run in self._runs.values()]
+            stats = dict(self._stats)
+            deadlines = {}
+            for phase in PHASES:
+                deadline, learned = self.deadline_for(phase)
+                deadlines[phase] = {
+                    'deadline': round(deadline, 1),
+                    'learned': learned,
+                    'samples': len(self._history[phase]),
+                    'ceiling': self.ceilings[phase]
+                }
+        stats.update({'running': runs, 'phases': deadlines, 'cancel_grace': self.cancel_grace})
+        return stats
@@ -8,10 +8,13 @@
 import sys
 import os
 from datetime import datetime
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
 import threading
 import time
 import atexit
+import socket
+import uuid
 
 # 添加 python自动化 目录到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'python自动化'))
@@ -21,7 +24,27 @@ from ixbrowser_local_api import IXBrowserClient
 from selenium.webdriver import Chrome
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from config import AUTO_CLOSE_WINDOWS_ON_SHUTDOWN, AUTO_DETECT_OPEN_WINDOWS_ON_STARTUP
+from config import (AUTO_CLOSE_WINDOWS_ON_SHUTDOWN, AUTO_DETECT_OPEN_WINDOWS_ON_STARTUP, TASK_DISPATCH_FALLBACK_INTERVAL,
+                    TASK_LEASE_SECONDS, TASK_LEASE_RENEW_INTERVAL,
+                    WINDOW_OPEN_CONCURRENCY, WINDOW_REATTACH_CONCURRENCY, WINDOW_LIST_REFRESH_INTERVAL,
+                    WINDOW_CLOSE_CONCURRENCY, WINDOW_CLOSE_TIMEOUT, WINDOW_CLEANUP_TIMEOUT,
+                    TASK_EXECUTOR_MAX_WORKERS, TASK_EXECUTOR_DRAIN_TIMEOUT, TASK_PIPELINE_DEPTH, TASK_PIPELINE_TIMEOUT,
+                    TASK_COMPLETION_DB_CHECK_INTERVAL,
+                    IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB, IMAGE_CACHE_URL_TTL, IMAGE_MAX_DIMENSION, QUOTA_RECHECK_INTERVAL,
+                    COOLDOWN_INITIAL_DELAY, COOLDOWN_MIN_DELAY, COOLDOWN_MAX_DELAY, COOLDOWN_DECREASE_STEP,
+                    COOLDOWN_BACKOFF_FACTOR, COOLDOWN_VIOLATION_FACTOR, COOLDOWN_JITTER,
+                    WATCHDOG_PHASE_DEADLINES, WATCHDOG_PHASE_CEILINGS, WATCHDOG_MIN_DEADLINE, WATCHDOG_DEADLINE_MARGIN,
+                    WATCHDOG_MIN_SAMPLES, WATCHDOG_CANCEL_GRACE, WATCHDOG_CHECK_INTERVAL)
+from task_dispatcher import TaskDispatcher
+from task_executor import TaskExecutor, DelayedScheduler
+from completion_registry import CompletionRegistry
+from task_pipeline import PipelineTracker
+from image_cache import ImageCache
+from window_registry import WindowStateRegistry
+from quota_model import QuotaModel
+from cooldown import CooldownController, is_rate_limit_error
+from task_watchdog import PRE_SUBMIT_PHASES, TaskWatchdog, TaskRun
+from cancellation import CancelToken
 
 class WindowManager:
     def __init__(self, database):
@@ -30,7 +53,55 @@ class WindowManager:
         self.active_windows = {}  # profile_id -> SoraAutomation
         self.window_status = {}  # profile_id -> {'status': 'idle'/'busy', 'current_task_id': None}
         self.lock = threading.Lock()
+        self._cancel_tokens = {}  # task_id -> CancelToken，正在执行的任务的取消令牌
+        self._opening_windows = set()  # 正在打开的窗口，防止并发请求重复打开同一个窗口
+        self._reattaching_windows = set()  # 启动时正在重新连接的窗口
+        self.reattach_progress = {'status': 'idle'}  # 启动时重新连接窗口的进度
+        self._registry_client = None  # 窗口状态登记表刷新线程专用的 ixBrowser 客户端
         self.task_queue_running = False
+        # 当前后端进程标识，作为任务租约的持有者（多台机器 / 多个进程共享同一个 MySQL）
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # 事件驱动的任务分派器：新任务 / 窗口空闲 / 窗口打开时才唤醒
+        self.dispatcher = TaskDispatcher(self._dispatch_tasks, fallback_interval=TASK_DISPATCH_FALLBACK_INTERVAL)
+        # 有界任务执行线程池 + 延迟调度器（任务成功后的冷却等待不再占用线程）
+        self.executor = TaskExecutor(TASK_EXECUTOR_MAX_WORKERS, on_slot_free=self._on_executor_slot_free)
+        self.scheduler = DelayedScheduler()
+        self._capacity_limited = False  # 上一次分派是否因为执行名额不足而有窗口没分到任务
+        # 任务完成信号：插件回调更新任务后直接唤醒等待中的自动化线程
+        self.completions = CompletionRegistry()
+        # 任务流水线：每个窗口最多同时生成 TASK_PIPELINE_DEPTH 个视频（1 表示提交后阻塞等待结果）
+        self.pipeline = PipelineTracker(TASK_PIPELINE_DEPTH)
+        # 窗口状态登记表：后台刷新 ixBrowser 窗口列表和账号索引，窗口状态接口直接读取内存
+        self.window_registry = WindowStateRegistry(self._list_profiles, self.db.get_all_accounts,
+                                                   refresh_interval=WINDOW_LIST_REFRESH_INTERVAL)
+        self.db.add_account_listener(self.window_registry.invalidate_accounts)
+        self.window_registry.start()
+        # 参考图缓存：领取任务时预取并预处理，粘贴时直接使用
+        self.image_cache = ImageCache(IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_MB * 1024 * 1024,
+                                      max_dimension=IMAGE_MAX_DIMENSION, url_ttl=IMAGE_CACHE_URL_TTL)
+        # 账号配额模型：分派时跳过额度用完的账号，优先分给剩余额度多的账号
+        self.quota = QuotaModel(recheck_interval=QUOTA_RECHECK_INTERVAL)
+        self._quota_waits = {}  # profile_id -> 额度重置后放回就绪队列的延迟调度句柄
+        try:
+            self.quota.load(self.db.get_latest_quotas())
+        except Exception as e:
+            print(f"⚠️ 加载账号配额失败: {e}")
+        # 窗口自适应冷却：任务成功后的等待时间按限流信号逐窗口调整
+        self.cooldown = CooldownController(
+            initial_delay=COOLDOWN_INITIAL_DELAY, min_delay=COOLDOWN_MIN_DELAY, max_delay=COOLDOWN_MAX_DELAY,
+            decrease_step=COOLDOWN_DECREASE_STEP, backoff_factor=COOLDOWN_BACKOFF_FACTOR, jitter=COOLDOWN_JITTER
+        )
+        # 任务看门狗：执行阶段超过截止时间时取消任务，线程不退出则回收窗口
+        self.watchdog = TaskWatchdog(
+            self._on_task_stuck, WATCHDOG_PHASE_DEADLINES, WATCHDOG_PHASE_CEILINGS,
+            min_deadline=WATCHDOG_MIN_DEADLINE, margin=WATCHDOG_DEADLINE_MARGIN, min_samples=WATCHDOG_MIN_SAMPLES,
+            cancel_grace=WATCHDOG_CANCEL_GRACE, check_interval=WATCHDOG_CHECK_INTERVAL
+        )
+        try:
+            # 重启后不必重新积累样本：最近成功任务的总耗时作为 wait 阶段的样本（偏大，截止时间更宽松）
+            self.watchdog.seed('wait', self.db.get_recent_task_durations())
+        except Exception as e:
+            print(f"⚠️ 加载任务耗时历史失败: {e}")
         
         # 🆕 启动时自动修复误判为失败的任务
         self._auto_fix_failed_tasks()
@@ -39,8 +110,9 @@ class WindowManager:
         atexit.register(self._cleanup_on_shutdown)
         
         # 启动时检测已打开的窗口（如果配置启用）
+        # 在后台线程中进行，接口在连接过程中即可使用，进度见窗口状态接口
         if AUTO_DETECT_OPEN_WINDOWS_ON_STARTUP:
-            self._detect_open_windows()
+            self._start_reattach()
     
     def _auto_fix_failed_tasks(self):
         """自动修复状态为 failed 但有 video_url 的任务"""
@@ -77,427 +149,710 @@ class WindowManager:
             # 不影响主程序启动
     
     def _start_task_queue_monitor(self):
-        """启动任务队列监控"""
-        if not self.task_queue_running:
+        """启动任务分派器（并行打开窗口时可能被多个线程同时调用）"""
+        with self.lock:
+            if self.task_queue_running:
+                return
             self.task_queue_running = True
-            threading.Thread(target=self._task_queue_worker, daemon=True).start()
-            print("任务队列监控已启动")
+        self.dispatcher.start()
+        threading.Thread(target=self._lease_heartbeat_worker, name='task-lease-heartbeat', daemon=True).start()
+        print("任务队列监控已启动")
+    
+    def mark_window_idle(self, profile_id: int, task_id: int = None) -> str:
+        """
+        将窗口标记为空闲并放入就绪队列
+        
+        Args:
+            profile_id: 窗口ID
+            task_id: 释放窗口的任务ID；指定时只有窗口当前任务仍是该任务才释放，
+                     避免迟到的释放把已经领取了新任务的窗口改回空闲；
+                     流水线模式下释放该任务占用的生成名额
+        
+        Returns:
+            窗口原来的状态；窗口不在管理器中或任务不匹配时返回 None
+        """
+        return self._release_window(profile_id, task_id, release_slot=True)
+    
+    def _release_window(self, profile_id: int, task_id: int = None, release_slot: bool = True,
+                        end_submission: bool = True) -> str:
+        """
+        结束窗口上的任务提交 / 释放生成名额，窗口可以领取新任务时标记为空闲并放入就绪队列
+        
+        Args:
+            release_slot: 是否释放任务在流水线中占用的名额（流水线模式下提交完成时为 False）
+            end_submission: 是否结束窗口当前的任务提交（流水线任务生成完成时为 False，
+                            窗口可能正在提交另一个任务）
+        """
+        with self.lock:
+            window_state = self.window_status.get(profile_id)
+            if window_state is None:
+                return None
+            in_pipeline = task_id is not None and release_slot and self.pipeline.remove(task_id) is not None
+            current_task_id = window_state.get('current_task_id')
+            if end_submission:
+                if task_id is not None and not in_pipeline and current_task_id not in (None, task_id):
+                    return None
+                if task_id is None or current_task_id == task_id:
+                    current_task_id = None
+            old_status = window_state['status']
+            # 窗口没有正在提交的任务、且正在生成的任务数未达到上限时才能领取新任务
+            available = current_task_id is None and self.pipeline.count(profile_id) < self.pipeline.depth
+            self.window_status[profile_id] = {
+                'status': 'idle' if available else 'busy',
+                'current_task_id': current_task_id
+            }
+            is_active = profile_id in self.active_windows
+        
+        if is_active and available:
+            self.dispatcher.mark_idle(profile_id)
+        return old_status
+    
+    def notify_task_change(self, task_id: int, **info) -> bool:
+        """任务状态被插件回调更新后调用，唤醒正在等待该任务的自动化线程"""
+        return self.completions.signal(task_id, **info)
     
-    def _task_queue_worker(self):
-        """任务队列工作线程 - 自动分配任务给空闲窗口"""
+    def notify_tasks_available(self):
+        """通知分派器有新的待处理任务（创建 / 导入 / 重试 / 终止后调用）"""
+        self.dispatcher.notify_tasks()
+    
+    def _dispatch_tasks(self, profile_ids: List[int]) -> List[int]:
+        """
+        把待处理任务分配给就绪的窗口（由任务分派器线程调用）
+        
+        Returns:
+            仍然空闲但没有分到任务的窗口ID列表
+        """
+        # 过滤掉已关闭或已被占用的窗口
+        idle_windows = []
+        with self.lock:
+            for profile_id in profile_ids:
+                status = self.window_status.get(profile_id)
+                # 只选择状态为 'idle' 的窗口，排除 'busy' 和 'stopped'
+                if status and status['status'] == 'idle' and profile_id in self.active_windows:
+                    idle_windows.append(profile_id)
+        
+        if not idle_windows:
+            return []
+        
+        # 跳过额度用完的账号（到预计重置时间再放回就绪队列），其余按剩余额度从多到少分派
+        idle_windows = self._filter_by_quota(idle_windows)
+        if not idle_windows:
+            return []
+        
+        # 只领取执行线程池还能容纳的任务数，其余窗口等有名额空出后再分派
+        free_slots = self.executor.free_slots()
+        if free_slots < len(idle_windows):
+            self._capacity_limited = True
+            if free_slots <= 0:
+                return idle_windows
+        
+        # 在一个事务内原子领取任务并写入窗口ID和租约（多个后端进程不会拿到同一个任务）
+        claimed_tasks = self.db.claim_tasks(idle_windows[:free_slots], self.worker_id, TASK_LEASE_SECONDS)
+        if not claimed_tasks:
+            return idle_windows
+        
+        print(f"发现 {len(idle_windows)} 个空闲窗口，领取到 {len(claimed_tasks)} 个待处理任务")
+        
+        # 将任务数据缓存到内存
+        assignments = []  # [(profile_id, task_id, task_data), ...]
+        for task in claimed_tasks:
+            assignments.append((task['profile_id'], task['id'], dict(task)))
+            # 窗口导航到 Sora 页面期间在后台下载并处理参考图
+            if task.get('image'):
+                self.image_cache.prefetch(task['image'])
+        
+        # 更新窗口状态并启动任务执行（使用缓存的任务数据）
+        for profile_id, task_id, task_data in assignments:
+            # 标记窗口为忙碌，并为本次执行创建取消令牌（执行线程退出后移除）
+            with self.lock:
+                self.window_status[profile_id] = {
+                    'status': 'busy',
+                    'current_task_id': task_id
+                }
+                self._cancel_tokens[task_id] = CancelToken()
+            
+            # 提交到执行线程池（传入缓存的任务数据）
+            if not self.executor.submit(self._execute_task_and_continue, profile_id, task_id, task_data):
+                # 只会在关闭过程中发生：任务退回队列，由其他进程或下次启动后领取
+                print(f"  ⚠️ 执行线程池已关闭，任务 {task_id} 退回待处理队列")
+                self.db.update_task_status(task_id, 'pending')
+                continue
+            
+            print(f"  分配任务 {task_id} 到窗口 {profile_id}")
+        
+        assigned = {profile_id for profile_id, _, _ in assignments}
+        return [profile_id for profile_id in idle_windows if profile_id not in assigned]
+    
+    def _profile_emails(self) -> Dict[int, str]:
+        """窗口ID -> 账号邮箱（窗口名称通常就是账号邮箱，否则使用关联账号的用户名）"""
+        profiles, account_map, _ = self.window_registry.snapshot()
+        emails = {}
+        for profile in profiles:
+            if '@' in profile['name']:
+                emails[profile['profile_id']] = profile['name']
+        for profile_id, account in account_map.items():
+            if profile_id not in emails and '@' in (account.get('username') or ''):
+                emails[profile_id] = account['username']
+        return emails
+    
+    def _filter_by_quota(self, profile_ids: List[int]) -> List[int]:
+        """
+        去掉额度用完的账号的窗口，并按剩余额度从多到少排序
+        
+        被跳过的窗口不再返回给分派器，而是在预计重置时间放回就绪队列
+        """
+        emails = self._profile_emails()
+        available = []
+        now = time.time()
+        for profile_id in profile_ids:
+            until = self.quota.unavailable_until(emails.get(profile_id), now)
+            if until is None:
+                available.append(profile_id)
+                continue
+            with self.lock:
+                if profile_id in self._quota_waits:
+                    continue
+                self._quota_waits[profile_id] = self.scheduler.schedule(until - now, self._on_quota_reset, profile_id)
+            print(f"  ⏸️ 窗口 {profile_id}（{emails[profile_id]}）额度已用完，{round(until - now)} 秒后再分派任务")
+        return self.quota.order_by_remaining(available, emails.get)
+    
+    def _on_quota_reset(self, profile_id: int):
+        """账号额度预计已重置：窗口仍然空闲时放回就绪队列"""
+        with self.lock:
+            self._quota_waits.pop(profile_id, None)
+            state = self.window_status.get(profile_id)
+            ready = state is not None and state['status'] == 'idle' and profile_id in self.active_windows
+        if ready:
+            print(f"窗口 {profile_id} 的账号额度预计已重置，重新参与分派")
+            self.dispatcher.mark_idle(profile_id)
+    
+    def update_quota(self, data: Dict):
+        """收到插件捕获的配额：更新配额模型，额度恢复时立即唤醒该账号的空闲窗口"""
+        email = data.get('account_email')
+        if not email:
+            return
+        self.quota.update(
+            email,
+            data.get('estimated_num_videos_remaining'),
+            rate_limited=data.get('rate_limit_reached'),
+            resets_in_seconds=data.get('access_resets_in_seconds')
+        )
+        profile_ids = [profile_id for profile_id, profile_email in self._profile_emails().items() if profile_email == email]
+        if data.get('rate_limit_reached'):
+            for profile_id in profile_ids:
+                if self.cooldown.penalize(profile_id, 'quota_rate_limit'):
+                    print(f"  ⏳ 窗口 {profile_id} 触发速率限制，冷却时间调整为 {self.cooldown.current_delay(profile_id):.0f} 秒")
+        if not self.quota.is_available(email):
+            return
+        for profile_id in profile_ids:
+            with self.lock:
+                handle = self._quota_waits.get(profile_id)
+            if handle is not None:
+                self.scheduler.cancel(handle)
+                self._on_quota_reset(profile_id)
+    
+    def report_content_violation(self, profile_id: int):
+        """插件捕获到内容违规草稿：适度加大该窗口的冷却时间"""
+        if profile_id and self.cooldown.penalize(profile_id, 'content_violation', COOLDOWN_VIOLATION_FACTOR):
+            print(f"  ⏳ 窗口 {profile_id} 出现内容违规，冷却时间调整为 {self.cooldown.current_delay(profile_id):.0f} 秒")
+    
+    def get_cooldown_stats(self) -> Dict:
+        """获取每个窗口的冷却时间和学到的提交速率"""
+        return self.cooldown.get_stats()
+    
+    def get_quota_stats(self) -> Dict:
+        """获取配额模型统计信息"""
+        stats = self.quota.get_stats()
+        with self.lock:
+            stats['waiting_windows'] = sorted(self._quota_waits)
+        return stats
+    
+    def _on_executor_slot_free(self):
+        """执行线程池空出名额：如果之前有窗口因为名额不足没分到任务，重新触发分派"""
+        if self._capacity_limited:
+            self._capacity_limited = False
+            self.notify_tasks_available()
+    
+    def _lease_heartbeat_worker(self):
+        """租约心跳线程 - 续期本进程持有的任务租约，并回收已退出进程的过期租约"""
         while self.task_queue_running:
+            time.sleep(TASK_LEASE_RENEW_INTERVAL)
             try:
-                # 检查是否有空闲窗口
-                idle_windows = []
-                with self.lock:
-                    for profile_id, status in self.window_status.items():
-                        # 只选择状态为 'idle' 的窗口，排除 'busy' 和 'stopped'
-                        if status['status'] == 'idle' and profile_id in self.active_windows:
-                            idle_windows.append(profile_id)
-                
-                if idle_windows:
-                    # 快速读取待处理任务到内存（减少数据库锁定时间）
-                    pending_tasks = self.db.get_pending_tasks(limit=len(idle_windows))
-                    
-                    if pending_tasks:
-                        print(f"发现 {len(idle_windows)} 个空闲窗口和 {len(pending_tasks)} 个待处理任务")
-                        
-                        # 批量分配任务
-                        assignments = []  # [(profile_id, task_id, task_data), ...]
-                        
-                        for i, task in enumerate(pending_tasks):
-                            if i < len(idle_windows):
-                                profile_id = idle_windows[i]
-                                # 将任务数据缓存到内存，并更新 profile_id
-                                task_data = dict(task)
-                                task_data['profile_id'] = profile_id  # 在缓存中设置窗口ID
-                                assignments.append((profile_id, task['id'], task_data))
-                        
-                        # 批量更新数据库（一次性完成，减少锁定时间）
-                        if assignments:
-                            conn = self.db.get_connection()
-                            cursor = conn.cursor()
-                            try:
-                                for profile_id, task_id, _ in assignments:
-                                    cursor.execute(
-                                        "UPDATE tasks SET profile_id = %s WHERE id = %s",
-                                        (profile_id, task_id)
-                                    )
-                                conn.commit()
-                            except Exception as e:
-                                print(f"批量更新任务失败: {e}")
-                                conn.rollback()
-                            finally:
-                                conn.close()
-                        
-                        # 更新窗口状态并启动任务执行（使用缓存的任务数据）
-                        for profile_id, task_id, task_data in assignments:
-                            # 标记窗口为忙碌
-                            with self.lock:
-                                self.window_status[profile_id] = {
-                                    'status': 'busy',
-                                    'current_task_id': task_id
-                                }
-                            
-                            # 启动任务执行（传入缓存的任务数据）
-                            threading.Thread(
-                                target=self._execute_task_and_continue,
-                                args=(profile_id, task_id, task_data),
-                                daemon=True
-                            ).start()
-                            
-                            print(f"  分配任务 {task_id} 到窗口 {profile_id}")
-                
-                # 缩短检查间隔到2秒
-                time.sleep(2)
-                
+                self.db.renew_task_leases(self.worker_id, TASK_LEASE_SECONDS)
+                reclaimed = self.db.reclaim_expired_leases()
+                if reclaimed > 0:
+                    print(f"回收了 {reclaimed} 个租约过期的任务")
+                    self.notify_tasks_available()
             except Exception as e:
-                print(f"任务队列工作线程出错: {e}")
-                import traceback
-                traceback.print_exc()
-                time.sleep(2)
+                print(f"续期任务租约失败: {e}")
     
     def _execute_task_and_continue(self, profile_id: int, task_id: int, task_data: Dict = None):
         """执行任务并在完成后继续处理队列"""
         task_success = False
+        submitted = False
+        reclaimed = False
+        error_message = None
+        with self.lock:
+            token = self._cancel_tokens.get(task_id)
         try:
             result = self.execute_task(task_id, task_data)
-            # 检查任务是否成功
-            task = self.db.get_task_by_id(task_id)
-            if task and task['status'] == 'success':
-                task_success = True
+            if result == 'submitted':
+                submitted = True
+            elif result == 'reclaimed':
+                # 看门狗已回收窗口（重新打开后会重新放入就绪队列），这里不再处理窗口
+                reclaimed = True
+            else:
+                # 检查任务是否成功
+                task = self.db.get_task_by_id(task_id)
+                if task and task['status'] == 'success':
+                    task_success = True
+                elif task and task['status'] == 'failed':
+                    error_message = task.get('error_message')
         except Exception as e:
             print(f"任务执行异常: {e}")
             task_success = False
+            error_message = str(e)
         finally:
-            if task_success:
-                # 任务成功，随机等待60-120秒后继续领取新任务
-                import random
-                wait_time = random.randint(60, 120)
-                print(f"窗口 {profile_id} 任务成功完成，等待 {wait_time} 秒后再领取新任务...")
-                time.sleep(wait_time)
-                
-                # 标记窗口为空闲
-                with self.lock:
-                    if profile_id in self.window_status:
-                        self.window_status[profile_id] = {
-                            'status': 'idle',
-                            'current_task_id': None
-                        }
-                print(f"窗口 {profile_id} 已标记为空闲，可以领取新任务")
+            # 执行线程已退出：移除取消令牌（任务被终止后可能已由其他窗口重新领取，只移除本次执行的令牌）
+            with self.lock:
+                if token is not None and self._cancel_tokens.get(task_id) is token:
+                    del self._cancel_tokens[task_id]
+            if reclaimed:
+                pass
+            elif submitted:
+                # 流水线模式：提示词已提交，生成结果由插件回调推送；冷却结束后窗口还有名额时领取下一个任务
+                wait_time = self.cooldown.next_delay(profile_id)
+                print(f"窗口 {profile_id} 已提交任务 {task_id}，正在生成 {self.pipeline.count(profile_id)}/{self.pipeline.depth} 个，"
+                      f"{wait_time:.0f} 秒后再提交下一个")
+                self.scheduler.schedule(wait_time, self._release_window, profile_id, task_id, False)
+            elif task_success:
+                # 任务成功，按窗口的自适应冷却时间等待后继续领取新任务（由延迟调度器处理，不占用执行线程）
+                self.cooldown.record_success(profile_id)
+                wait_time = self.cooldown.next_delay(profile_id)
+                print(f"窗口 {profile_id} 任务成功完成，等待 {wait_time:.0f} 秒后再领取新任务...")
+                self.scheduler.schedule(wait_time, self._release_window_after_cooldown, profile_id, task_id)
+            elif is_rate_limit_error(error_message):
+                # 像是触发了速率限制：加大冷却时间，冷却结束后再领取新任务（立即领取只会再次失败）
+                self.cooldown.penalize(profile_id, 'task_error')
+                wait_time = self.cooldown.next_delay(profile_id)
+                print(f"窗口 {profile_id} 任务失败（疑似速率限制），等待 {wait_time:.0f} 秒后再领取新任务...")
+                self.scheduler.schedule(wait_time, self._release_window_after_cooldown, profile_id, task_id)
             else:
                 # 任务失败，只标记窗口为空闲，不关闭窗口
                 # 这样窗口可以继续处理其他任务
                 print(f"窗口 {profile_id} 任务失败，标记为空闲状态（保持窗口打开）")
-                with self.lock:
-                    if profile_id in self.window_status:
-                        self.window_status[profile_id] = {
-                            'status': 'idle',  # 标记为空闲，而不是error
-                            'current_task_id': None
-                        }
+                self.mark_window_idle(profile_id, task_id)  # 标记为空闲，而不是error
                 print(f"窗口 {profile_id} 已标记为空闲，可以继续领取新任务")
     
+    def _release_window_after_cooldown(self, profile_id: int, task_id: int):
+        """任务成功后的冷却时间结束，标记窗口为空闲"""
+        if self.mark_window_idle(profile_id, task_id) is not None:
+            print(f"窗口 {profile_id} 已标记为空闲，可以领取新任务")
+    
     def _cleanup_on_shutdown(self):
         """后端关闭时的清理操作"""
+        # 停止分派新任务，等待正在执行的任务排空
+        self.task_queue_running = False
+        self.dispatcher.stop()
+        self.scheduler.shutdown()
+        self.watchdog.shutdown()
+        self.image_cache.shutdown()
+        self.window_registry.stop()
+        remaining = self.executor.shutdown(timeout=TASK_EXECUTOR_DRAIN_TIMEOUT)
+        if remaining > 0:
+            # 执行线程是守护线程，不会阻止进程退出；先把任务退回队列，再让线程在下一个检查点停止操作浏览器
+            with self.lock:
+                running_task_ids = list(self._cancel_tokens)
+            print(f"⚠️ 仍有 {remaining} 个任务未执行完，退回待处理队列")
+            for task_id in running_task_ids:
+                try:
+                    self.db.update_task_status(task_id, 'pending')
+                except Exception as e:
+                    print(f"  ⚠️ 任务 {task_id} 退回队列失败: {e}")
+                self._signal_cancel(task_id, '后端关闭')
+        
         if AUTO_CLOSE_WINDOWS_ON_SHUTDOWN:
             print("\n后端正在关闭，自动关闭所有窗口...")
             profile_ids = list(self.active_windows.keys())
             if profile_ids:
-                results = self.close_windows(profile_ids)
-                success_count = sum(1 for r in results if r['status'] == 'success')
-                print(f"已关闭 {success_count}/{len(profile_ids)} 个窗口")
+                summary = self.close_windows(profile_ids)['summary']
+                print(f"已关闭 {summary['closed']}/{len(profile_ids)} 个窗口")
+                if summary['forced'] or summary['timed_out']:
+                    print(f"强制关闭的窗口: {summary['forced'] + summary['timed_out']}")
             else:
                 print("没有需要关闭的窗口")
         else:
             print("\n后端正在关闭，保持窗口打开状态...")
     
+    def _list_profiles(self, page: int, limit: int):
+        """分页获取 ixBrowser 窗口列表（只在窗口状态登记表的刷新线程中调用）"""
+        if self._registry_client is None:
+            self._registry_client = IXBrowserClient()
+        return self._registry_client.get_profile_list(page=page, limit=limit)
+    
+    def _start_reattach(self):
+        """在后台线程中重新连接已打开的窗口，不阻塞后端启动"""
+        with self.lock:
+            if self.reattach_progress['status'] == 'running':
+                return
+            self.reattach_progress = {
+                'status': 'running',
+                'total': 0,
+                'done': 0,
+                'attached': 0,
+                'failed': 0,
+                'started_at': datetime.now().isoformat(),
+                'finished_at': None
+            }
+        threading.Thread(target=self._detect_open_windows, name='window-reattach', daemon=True).start()
+
+    def get_reattach_progress(self) -> Dict:
+        """获取启动时重新连接窗口的进度"""
+        with self.lock:
+            return dict(self.reattach_progress)
+
+    def _update_reattach_progress(self, **fields):
+        with self.lock:
+            self.reattach_progress.update(fields)
+
     def _detect_open_windows(self):
-        """检测并连接到已打开的窗口"""
+        """检测并并行连接到已打开的窗口"""
         print("检测已打开的窗口...")
-        
         try:
             # 获取所有账号
             accounts = self.db.get_all_accounts()
-            
-            for account in accounts:
-                profile_id = account.get('profile_id')
-                if not profile_id:
-                    continue
-                
-                try:
-                    # 尝试打开窗口，如果已打开会返回错误
-                    result = self.client.open_profile(
-                        profile_id,
-                        cookies_backup=False,
-                        load_profile_info_page=False
-                    )
-                    
-                    # 检查是否已打开
-                    if result is None and self.client.message:
-                        error_msg = str(self.client.message).lower()
-                        if 'already open' in error_msg or '已经打开' in error_msg or '已打开' in error_msg:
-                            print(f"  检测到窗口 {profile_id} 已打开，尝试连接...")
-                            
-                            # 再次调用获取连接信息
-                            time.sleep(0.5)
-                            result = self.client.open_profile(
-                                profile_id,
-                                cookies_backup=False,
-                                load_profile_info_page=False
-                            )
-                            
-                            if result and 'debugging_address' in result:
-                                try:
-                                    automation = SoraAutomation(profile_id=profile_id)
-                                    automation.debugging_address = result['debugging_address']
-                                    
-                                    # 连接到已打开的浏览器
-                                    chrome_options = Options()
-                                    chrome_options.add_experimental_option("debuggerAddress", result['debugging_address'])
-                                    
-                                    automation.driver = Chrome(
-                                        service=Service(result['webdriver']),
-                                        options=chrome_options
-                                    )
-                                    
-                                    with self.lock:
-                                        self.active_windows[profile_id] = automation
-                                    
-                                    print(f"  ✓ 已连接到窗口 {profile_id}")
-                                except Exception as e:
-                                    print(f"  ✗ 连接窗口 {profile_id} 失败: {e}")
-                    elif result:
-                        # 窗口被打开了（之前是关闭的），立即关闭
-                        try:
-                            self.client.close_profile(profile_id)
-                        except:
-                            pass
-                            
-                except Exception as e:
-                    print(f"  检测窗口 {profile_id} 时出错: {e}")
-                    
+            profile_ids = list(dict.fromkeys(acc['profile_id'] for acc in accounts if acc.get('profile_id')))
+
+            # 只连接 ixBrowser 报告为已打开的窗口，不再逐个试探打开
+            opened = IXBrowserClient().get_opened_profile_list()
+            if opened is None:
+                print("⚠️ 获取已打开窗口列表失败，逐个检测账号窗口")
+                targets = [(profile_id, None) for profile_id in profile_ids]
+            else:
+                opened_by_id = {item.get('profile_id'): item for item in opened if isinstance(item, dict)}
+                targets = [(profile_id, opened_by_id[profile_id]) for profile_id in profile_ids
+                           if profile_id in opened_by_id]
+                print(f"  ixBrowser 中有 {len(opened_by_id)} 个窗口已打开，其中 {len(targets)} 个关联了账号")
+
+            self._update_reattach_progress(total=len(targets))
+            if targets:
+                workers = min(WINDOW_REATTACH_CONCURRENCY, len(targets))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='window-reattach') as pool:
+                    list(pool.map(lambda target: self._reattach_window(*target), targets))
+
+            self._update_reattach_progress(status='done', finished_at=datetime.now().isoformat())
         except Exception as e:
             print(f"检测已打开窗口失败: {e}")
-        
+            self._update_reattach_progress(status='failed', error=str(e), finished_at=datetime.now().isoformat())
+
         print(f"检测完成，已连接 {len(self.active_windows)} 个窗口")
-    
-    def open_windows(self, profile_ids: List[int]) -> Dict:
-        """批量打开窗口"""
-        results = []
-        
-        for profile_id in profile_ids:
-            try:
-                # 检查窗口是否已打开
-                if profile_id in self.active_windows:
-                    results.append({
-                        "profile_id": profile_id,
-                        "status": "already_open",
-                        "message": "窗口已打开"
-                    })
-                    continue
-                
-                # 打开窗口
+
+    def _reattach_window(self, profile_id: int, opened_info: Dict = None):
+        """
+        连接到单个已打开的窗口
+
+        Args:
+            profile_id: 窗口ID
+            opened_info: 已打开窗口列表中的条目；包含连接信息时直接连接，
+                         否则通过 open_profile 获取（窗口未打开时会被打开，需要再关闭）
+        """
+        with self.lock:
+            if profile_id in self.active_windows or profile_id in self._opening_windows:
+                self.reattach_progress['done'] += 1
+                return
+            self._reattaching_windows.add(profile_id)
+
+        # 每个线程使用独立的客户端（客户端的 message 等状态不是线程安全的）
+        client = IXBrowserClient()
+        attached = False
+        try:
+            result = opened_info if opened_info and opened_info.get('debugging_address') and opened_info.get('webdriver') else None
+            if result is None:
+                result = client.open_profile(profile_id, cookies_backup=False, load_profile_info_page=False)
+                if result is None and client.message:
+                    error_msg = str(client.message).lower()
+                    if 'already open' in error_msg or '已经打开' in error_msg or '已打开' in error_msg:
+                        # 再次调用获取连接信息
+                        time.sleep(0.5)
+                        result = client.open_profile(profile_id, cookies_backup=False, load_profile_info_page=False)
+                elif result and opened_info is None:
+                    # 窗口被打开了（之前是关闭的），立即关闭
+                    try:
+                        client.close_profile(profile_id)
+                    except Exception:
+                        pass
+                    return
+
+            if result and 'debugging_address' in result:
+                print(f"  检测到窗口 {profile_id} 已打开，尝试连接...")
                 automation = SoraAutomation(profile_id=profile_id)
-                automation._open_browser()
-                
+                automation.debugging_address = result['debugging_address']
+
+                # 连接到已打开的浏览器
+                chrome_options = Options()
+                chrome_options.add_experimental_option("debuggerAddress", result['debugging_address'])
+
+                automation.driver = Chrome(
+                    service=Service(result['webdriver']),
+                    options=chrome_options
+                )
+
                 with self.lock:
                     self.active_windows[profile_id] = automation
-                
-                # 检测登录状态
-                print(f"检测窗口 {profile_id} 的登录状态...")
-                is_logged_in = automation._check_login_status()
-                
-                # 查找该窗口对应的账号
-                accounts = self.db.get_all_accounts()
-                account = next((acc for acc in accounts if acc.get('profile_id') == profile_id), None)
-                
-                print(f"窗口 {profile_id} 查找账号结果: {account}")
-                print(f"窗口 {profile_id} 登录状态: {'已登录' if is_logged_in else '未登录'}")
-                
-                if account:
-                    # 如果未登录，尝试登录
-                    if not is_logged_in:
-                        print(f"窗口 {profile_id} 未登录，尝试登录账号 {account['username']}")
-                        login_success = automation._login_account(account['username'], account['password'])
-                        
-                        if not login_success:
-                            results.append({
-                                "profile_id": profile_id,
-                                "status": "warning",
-                                "message": "窗口已打开，但登录失败，请手动登录"
-                            })
-                            continue
-                    else:
-                        print(f"窗口 {profile_id} 已登录，跳过登录步骤")
-                else:
-                    print(f"窗口 {profile_id} 未关联账号，但已登录，将直接导航到 Sora")
-                
-                # 无论是否有关联账号，只要已登录就导航到 Sora 页面
-                if is_logged_in:
-                    automation._navigate_to_sora()
-                else:
-                    print(f"窗口 {profile_id} 未登录且无关联账号，请手动登录")
-                
-                # 标记窗口为空闲状态
-                with self.lock:
-                    self.window_status[profile_id] = {
-                        'status': 'idle',
-                        'current_task_id': None
-                    }
-                
-                # 启动任务队列监控（如果还没启动）
-                self._start_task_queue_monitor()
-                
-                results.append({
-                    "profile_id": profile_id,
-                    "status": "success",
-                    "message": f"窗口已打开{'（已登录）' if is_logged_in else '（已登录）'}，等待任务分配"
-                })
-                
-            except Exception as e:
-                results.append({
-                    "profile_id": profile_id,
-                    "status": "error",
-                    "message": str(e)
-                })
-        
-        return results
-    
-    def close_windows(self, profile_ids: List[int]) -> Dict:
-        """批量关闭窗口 - 带超时和强制关闭"""
-        results = []
-        
-        for profile_id in profile_ids:
-            print(f"\n开始关闭窗口 {profile_id}...")
-            try:
-                # 检查窗口是否在活跃列表中
-                if profile_id not in self.active_windows:
-                    print(f"  窗口 {profile_id} 不在活跃列表中，尝试通过 API 关闭...")
-                    try:
-                        result = self.client.close_profile(profile_id)
-                        if result:
-                            print(f"  ✓ 窗口 {profile_id} 已通过API关闭")
-                        else:
-                            print(f"  ⚠️  API返回: {self.client.message}")
-                    except Exception as e:
-                        print(f"  ⚠️  API关闭失败: {e}")
-                    
-                    results.append({
-                        "profile_id": profile_id,
-                        "status": "success",
-                        "message": "窗口已关闭"
-                    })
-                    continue
-                
-                # 窗口在活跃列表中，需要清理
-                print(f"  窗口 {profile_id} 在活跃列表中，开始清理...")
-                automation = self.active_windows[profile_id]
-                
-                # 使用线程来执行cleanup，避免主线程卡住
-                import threading
-                cleanup_done = [False]
-                cleanup_error = [None]
-                
-                def do_cleanup():
-                    try:
-                        automation.cleanup()
-                        cleanup_done[0] = True
-                    except Exception as e:
-                        cleanup_error[0] = e
-                
-                cleanup_thread = threading.Thread(target=do_cleanup)
-                cleanup_thread.daemon = True
-                cleanup_thread.start()
-                cleanup_thread.join(timeout=10)  # 最多等待10秒
-                
-                if not cleanup_done[0]:
-                    print(f"  ⚠️  窗口 {profile_id} cleanup超时，强制清理...")
-                
-                if cleanup_error[0]:
-                    print(f"  ⚠️  cleanup出错: {cleanup_error[0]}")
-                
-                # 无论cleanup是否成功，都从活跃列表中移除
-                with self.lock:
-                    if profile_id in self.active_windows:
-                        del self.active_windows[profile_id]
-                        print(f"  ✓ 已从活跃列表移除窗口 {profile_id}")
-                    
-                    if profile_id in self.window_status:
-                        del self.window_status[profile_id]
-                        print(f"  ✓ 已清除窗口 {profile_id} 的状态")
-                
-                # 释放该窗口的待处理任务
+                attached = True
+                print(f"  ✓ 已连接到窗口 {profile_id}")
+        except Exception as e:
+            print(f"  ✗ 连接窗口 {profile_id} 失败: {e}")
+        finally:
+            with self.lock:
+                self._reattaching_windows.discard(profile_id)
+                self.reattach_progress['done'] += 1
+                if attached:
+                    self.reattach_progress['attached'] += 1
+                elif opened_info is not None:
+                    self.reattach_progress['failed'] += 1
+
+    def open_windows(self, profile_ids: List[int], on_progress: Callable = None,
+                     max_workers: int = None) -> List[Dict]:
+        """
+        批量打开窗口（并行启动、检测登录、导航）
+
+        Args:
+            profile_ids: 窗口ID列表
+            on_progress: 进度回调 on_progress(profile_id, stage, result)，
+                         stage 为 opening / checking_login / logging_in / navigating / done，
+                         result 只在 done 时传入
+            max_workers: 同时启动的窗口数量，默认 WINDOW_OPEN_CONCURRENCY
+
+        Returns:
+            每个窗口的结果，顺序与 profile_ids 一致
+        """
+        profile_ids = list(dict.fromkeys(profile_ids))
+        if not profile_ids:
+            return []
+
+        # 账号只查询一次，按窗口ID建立索引
+        accounts_by_profile = {}
+        for account in self.db.get_all_accounts():
+            if account.get('profile_id'):
+                accounts_by_profile.setdefault(account['profile_id'], account)
+
+        def report(profile_id, stage, result=None):
+            if on_progress:
                 try:
-                    conn = self.db.get_connection()
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        UPDATE tasks 
-                        SET profile_id = NULL 
-                        WHERE profile_id = %s AND status IN ('pending', 'running')
-                    """, (profile_id,))
-                    released_count = cursor.rowcount
-                    conn.commit()
-                    conn.close()
-                    if released_count > 0:
-                        print(f"  ✓ 释放了窗口 {profile_id} 的 {released_count} 个任务")
+                    on_progress(profile_id, stage, result)
                 except Exception as e:
-                    print(f"  ⚠️  释放任务失败: {e}")
-                
-                # 最后尝试通过API强制关闭（确保窗口真的关闭）
-                try:
-                    print(f"  最后通过API确保窗口 {profile_id} 关闭...")
-                    self.client.close_profile(profile_id)
-                except:
-                    pass
-                
-                results.append({
+                    print(f"⚠️ 窗口 {profile_id} 进度回调失败: {e}")
+
+        def open_one(profile_id):
+            result = self._open_window(profile_id, accounts_by_profile.get(profile_id), report)
+            report(profile_id, 'done', result)
+            return result
+
+        workers = max(1, min(max_workers or WINDOW_OPEN_CONCURRENCY, len(profile_ids)))
+        print(f"批量打开 {len(profile_ids)} 个窗口（并发 {workers}）...")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='window-open') as pool:
+            return list(pool.map(open_one, profile_ids))
+
+    def _open_window(self, profile_id: int, account: Dict, report: Callable) -> Dict:
+        """打开单个窗口：启动浏览器、检测登录状态、按需登录、导航到 Sora"""
+        # 检查窗口是否已打开或正在被其他请求打开
+        with self.lock:
+            if (profile_id in self.active_windows or profile_id in self._opening_windows
+                    or profile_id in self._reattaching_windows):
+                return {
                     "profile_id": profile_id,
-                    "status": "success",
-                    "message": "窗口已关闭"
-                })
-                
-                print(f"✓ 窗口 {profile_id} 关闭完成\n")
-                
-            except Exception as e:
-                print(f"✗ 关闭窗口 {profile_id} 失败: {e}\n")
-                import traceback
-                traceback.print_exc()
-                
-                # 即使出错，也尝试从列表中移除
-                try:
-                    with self.lock:
-                        if profile_id in self.active_windows:
-                            del self.active_windows[profile_id]
-                        if profile_id in self.window_status:
-                            del self.window_status[profile_id]
-                except:
-                    pass
-                
-                results.append({
+                    "status": "already_open",
+                    "message": "窗口已打开"
+                }
+            self._opening_windows.add(profile_id)
+
+        try:
+            # 打开窗口（每个 SoraAutomation 使用自己的 ixBrowser 客户端，可在线程间并行）
+            report(profile_id, 'opening')
+            automation = SoraAutomation(profile_id=profile_id)
+            automation._open_browser()
+
+            with self.lock:
+                self.active_windows[profile_id] = automation
+
+            # 检测登录状态
+            report(profile_id, 'checking_login')
+            print(f"检测窗口 {profile_id} 的登录状态...")
+            is_logged_in = automation._check_login_status()
+
+            print(f"窗口 {profile_id} 查找账号结果: {account['username'] if account else None}")
+            print(f"窗口 {profile_id} 登录状态: {'已登录' if is_logged_in else '未登录'}")
+
+            if account:
+                # 如果未登录，尝试登录
+                if not is_logged_in:
+                    report(profile_id, 'logging_in')
+                    print(f"窗口 {profile_id} 未登录，尝试登录账号 {account['username']}")
+                    login_success = automation._login_account(account['username'], account['password'])
+
+                    if not login_success:
+                        return {
+                            "profile_id": profile_id,
+                            "status": "warning",
+                            "message": "窗口已打开，但登录失败，请手动登录"
+                        }
+                else:
+                    print(f"窗口 {profile_id} 已登录，跳过登录步骤")
+            else:
+                print(f"窗口 {profile_id} 未关联账号，但已登录，将直接导航到 Sora")
+
+            # 无论是否有关联账号，只要已登录就导航到 Sora 页面
+            if is_logged_in:
+                report(profile_id, 'navigating')
+                automation._navigate_to_sora()
+            else:
+                print(f"窗口 {profile_id} 未登录且无关联账号，请手动登录")
+
+            # 标记窗口为空闲状态
+            with self.lock:
+                self.window_status[profile_id] = {
+                    'status': 'idle',
+                    'current_task_id': None
+                }
+
+            # 启动任务队列监控（如果还没启动），并把新窗口放入就绪队列
+            self._start_task_queue_monitor()
+            self.dispatcher.mark_idle(profile_id)
+
+            return {
+                "profile_id": profile_id,
+                "status": "success",
+                "message": "窗口已打开（已登录），等待任务分配"
+            }
+
+        except Exception as e:
+            return {
+                "profile_id": profile_id,
+                "status": "error",
+                "message": str(e)
+            }
+        finally:
+            with self.lock:
+                self._opening_windows.discard(profile_id)
+
+    def close_windows(self, profile_ids: List[int], timeout: float = None) -> Dict:
+        """
+        批量关闭窗口（并行关闭，整体有截止时间）
+
+        先把窗口移出活跃列表并用一条 UPDATE 释放这些窗口的任务，再并行清理浏览器：
+        单个窗口清理超时或出错时通过 API 强制关闭；到截止时间仍未完成的窗口统一强制关闭，不再等待。
+
+        Args:
+            profile_ids: 窗口ID列表
+            timeout: 整体截止时间（秒），默认 WINDOW_CLOSE_TIMEOUT
+
+        Returns:
+            {'results': 每个窗口的结果, 'summary': 统计（含需要强制关闭 / 超时的窗口ID）}
+        """
+        start = time.monotonic()
+        deadline = start + (timeout or WINDOW_CLOSE_TIMEOUT)
+        profile_ids = list(dict.fromkeys(profile_ids))
+
+        # 移出活跃列表，之后不会再有任务分派到这些窗口
+        automations = {}
+        for profile_id in profile_ids:
+            self.dispatcher.discard(profile_id)
+        with self.lock:
+            running_task_ids = []
+            for profile_id in profile_ids:
+                automation = self.active_windows.pop(profile_id, None)
+                if automation is not None:
+                    automations[profile_id] = automation
+                state = self.window_status.pop(profile_id, None)
+                if state and state.get('current_task_id') is not None:
+                    running_task_ids.append(state['current_task_id'])
+            all_closed = not self.active_windows
+        # 正在这些窗口上执行的任务在下一个检查点退出，不再继续操作即将关闭的浏览器
+        for task_id in running_task_ids:
+            self._signal_cancel(task_id, '窗口已关闭')
+        for profile_id in profile_ids:
+            self._drop_pipelined_tasks(profile_id, '窗口已关闭')
+
+        released_count = self._release_window_tasks(profile_ids)
+
+        print(f"\n开始关闭 {len(profile_ids)} 个窗口（其中 {len(automations)} 个由本进程管理，"
+              f"并发 {WINDOW_CLOSE_CONCURRENCY}，截止时间 {timeout or WINDOW_CLOSE_TIMEOUT} 秒）...")
+
+        # 使用守护线程执行清理：卡住的 driver.quit() 不会阻止进程退出
+        cond = threading.Condition()
+        pending = list(profile_ids)
+        results = {}
+
+        def worker():
+            # 每个线程使用独立的客户端（客户端的 message 等状态不是线程安全的）
+            client = IXBrowserClient()
+            while True:
+                with cond:
+                    if not pending or time.monotonic() >= deadline:
+                        return
+                    profile_id = pending.pop(0)
+                result = self._close_window(profile_id, automations.get(profile_id), client)
+                with cond:
+                    results[profile_id] = result
+                    cond.notify_all()
+
+        workers = max(1, min(WINDOW_CLOSE_CONCURRENCY, len(profile_ids)))
+        for i in range(workers if profile_ids else 0):
+            threading.Thread(target=worker, name=f'window-close-{i}', daemon=True).start()
+
+        with cond:
+            while len(results) < len(profile_ids):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                cond.wait(remaining)
+            timed_out = [profile_id for profile_id in profile_ids if profile_id not in results]
+            for profile_id in timed_out:
+                results[profile_id] = {
                     "profile_id": profile_id,
-                    "status": "error",
-                    "message": str(e)
-                })
-        
+                    "status": "timeout",
+                    "message": "关闭超时，已通过 API 强制关闭"
+                }
+
+        if timed_out:
+            print(f"  ⚠️ {len(timed_out)} 个窗口在截止时间内未关闭，通过 API 强制关闭: {timed_out}")
+            self._force_close_profiles(timed_out)
+
+        ordered = [results[profile_id] for profile_id in profile_ids]
+        summary = {
+            'total': len(profile_ids),
+            'closed': sum(1 for r in ordered if r['status'] == 'success'),
+            'forced': [r['profile_id'] for r in ordered if r['status'] == 'forced'],
+            'timed_out': timed_out,
+            'errors': [r['profile_id'] for r in ordered if r['status'] == 'error'],
+            'released_tasks': released_count,
+            'elapsed_ms': round((time.monotonic() - start) * 1000, 1)
+        }
+        print(f"✓ 窗口关闭完成: 正常关闭 {summary['closed']} 个, 强制关闭 {len(summary['forced'])} 个 {summary['forced']}, "
+              f"超时 {len(timed_out)} 个, 失败 {len(summary['errors'])} 个, 耗时 {summary['elapsed_ms']} ms")
+
         # 检查是否所有窗口都已关闭
-        if len(self.active_windows) == 0:
+        if all_closed:
             print("所有窗口已关闭，释放所有队列中的任务...")
             try:
                 conn = self.db.get_connection()
                 cursor = conn.cursor()
                 # 将 running 状态的任务重置为 pending
+                # 只处理本进程领取的任务和没有租约的旧任务，不影响其他后端进程正在执行的任务
                 cursor.execute("""
                     UPDATE tasks 
-                    SET status = 'pending', profile_id = NULL, start_time = NULL
-                    WHERE status = 'running'
-                """)
+                    SET status = 'pending', profile_id = NULL, start_time = NULL,
+                        lease_owner = NULL, lease_expires_at = NULL
+                    WHERE status = 'running' AND (lease_owner IS NULL OR lease_owner = %s)
+                """, (self.worker_id,))
                 running_count = cursor.rowcount
                 # 清除 pending 任务的 profile_id
                 cursor.execute("""
                     UPDATE tasks 
-                    SET profile_id = NULL 
-                    WHERE status = 'pending'
-                """)
+                    SET profile_id = NULL, lease_owner = NULL, lease_expires_at = NULL
+                    WHERE status = 'pending' AND (lease_owner IS NULL OR lease_owner = %s)
+                """, (self.worker_id,))
                 pending_count = cursor.rowcount
                 conn.commit()
                 conn.close()
@@ -507,65 +862,154 @@ class WindowManager:
                     print(f"释放了 {pending_count} 个待处理任务")
             except Exception as e:
                 print(f"释放队列任务失败: {e}")
-        
-        return results
-    
+
+        return {'results': ordered, 'summary': summary}
+
+    def _release_window_tasks(self, profile_ids: List[int]) -> int:
+        """用一条 UPDATE 释放这些窗口的待处理 / 进行中任务"""
+        if not profile_ids:
+            return 0
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            placeholders = ', '.join(['%s'] * len(profile_ids))
+            cursor.execute(f"""
+                UPDATE tasks 
+                SET profile_id = NULL, lease_owner = NULL, lease_expires_at = NULL
+                WHERE profile_id IN ({placeholders}) AND status IN ('pending', 'running')
+            """, profile_ids)
+            released_count = cursor.rowcount
+            conn.commit()
+            conn.close()
+            if released_count > 0:
+                print(f"  ✓ 释放了 {len(profile_ids)} 个窗口的 {released_count} 个任务")
+            return released_count
+        except Exception as e:
+            print(f"  ⚠️  释放任务失败: {e}")
+            return 0
+
+    def _close_window(self, profile_id: int, automation, client) -> Dict:
+        """
+        关闭单个窗口：清理浏览器（最多等待 WINDOW_CLEANUP_TIMEOUT 秒），再通过 API 确保窗口关闭
+
+        清理超时或出错时结果状态为 forced（已通过 API 强制关闭）
+        """
+        try:
+            if automation is None:
+                print(f"  窗口 {profile_id} 不在活跃列表中，尝试通过 API 关闭...")
+                if client.close_profile(profile_id):
+                    print(f"  ✓ 窗口 {profile_id} 已通过API关闭")
+                else:
+                    print(f"  ⚠️  API返回: {client.message}")
+                return {"profile_id": profile_id, "status": "success", "message": "窗口已关闭"}
+
+            # 使用线程来执行cleanup，避免卡住关闭线程
+            cleanup_done = [False]
+            cleanup_error = [None]
+
+            def do_cleanup():
+                try:
+                    automation.cleanup()
+                    cleanup_done[0] = True
+                except Exception as e:
+                    cleanup_error[0] = e
+
+            cleanup_thread = threading.Thread(target=do_cleanup, name=f'window-cleanup-{profile_id}', daemon=True)
+            cleanup_thread.start()
+            cleanup_thread.join(timeout=WINDOW_CLEANUP_TIMEOUT)
+
+            forced_reason = None
+            if cleanup_error[0]:
+                forced_reason = f"清理出错: {cleanup_error[0]}"
+            elif not cleanup_done[0]:
+                forced_reason = f"清理超过 {WINDOW_CLEANUP_TIMEOUT} 秒"
+            if forced_reason:
+                print(f"  ⚠️  窗口 {profile_id} {forced_reason}，强制关闭...")
+
+            # 最后尝试通过API强制关闭（确保窗口真的关闭）
+            try:
+                client.close_profile(profile_id)
+            except Exception:
+                pass
+
+            if forced_reason:
+                return {"profile_id": profile_id, "status": "forced", "message": f"{forced_reason}，已通过 API 强制关闭"}
+            print(f"✓ 窗口 {profile_id} 关闭完成")
+            return {"profile_id": profile_id, "status": "success", "message": "窗口已关闭"}
+
+        except Exception as e:
+            print(f"✗ 关闭窗口 {profile_id} 失败: {e}")
+            return {"profile_id": profile_id, "status": "error", "message": str(e)}
+
+    def _force_close_profiles(self, profile_ids: List[int]):
+        """通过 API 强制关闭窗口（支持批量关闭时一次请求完成）"""
+        client = IXBrowserClient()
+        try:
+            if hasattr(client, 'close_profile_in_batches'):
+                if client.close_profile_in_batches(profile_ids) is not None:
+                    return
+                print(f"  ⚠️  批量关闭失败: {client.message}，逐个关闭")
+            for profile_id in profile_ids:
+                client.close_profile(profile_id)
+        except Exception as e:
+            print(f"  ⚠️  强制关闭窗口失败: {e}")
+
     def get_window_status(self, profile_id: int) -> Dict:
         """获取窗口状态"""
         # 检查是否在活跃窗口列表中
         is_open = profile_id in self.active_windows
         
+        if is_open:
+            status = "active"
+        elif profile_id in self._reattaching_windows:
+            status = "reattaching"
+        else:
+            status = "inactive"
+        
         return {
             "profile_id": profile_id,
             "is_open": is_open,
-            "status": "active" if is_open else "inactive"
+            "status": status
         }
     
     def get_all_windows_status(self) -> List[Dict]:
-        """获取所有窗口状态"""
+        """获取所有窗口状态（窗口列表和账号来自窗口状态登记表的内存快照，不访问 ixBrowser 和数据库）"""
         statuses = []
+        profiles, account_map, _ = self.window_registry.snapshot()
         
-        try:
-            # 从 ixBrowser API 获取所有窗口
-            all_profiles = self.client.get_profile_list(limit=100)
+        for profile in profiles:
+            profile_id = profile['profile_id']
+            status = self.get_window_status(profile_id)
+            status['name'] = profile['name']
             
-            if all_profiles:
-                # 获取所有账号信息，用于匹配
-                accounts = self.db.get_all_accounts()
-                account_map = {acc['profile_id']: acc for acc in accounts if acc.get('profile_id')}
-                
-                for profile in all_profiles:
-                    profile_id = profile.get('profile_id')
-                    if profile_id:
-                        status = self.get_window_status(profile_id)
-                        status['name'] = profile.get('name', f'窗口 {profile_id}')
-                        
-                        # 添加窗口工作状态
-                        if profile_id in self.window_status:
-                            window_state = self.window_status[profile_id]
-                            status['work_status'] = window_state['status']
-                            status['current_task_id'] = window_state.get('current_task_id')
-                            # 如果是异常状态，添加错误时间
-                            if window_state['status'] == 'error':
-                                status['error_time'] = window_state.get('error_time')
-                        else:
-                            status['work_status'] = 'unknown'
-                            status['current_task_id'] = None
-                        
-                        # 如果窗口已关联账号，添加账号信息
-                        if profile_id in account_map:
-                            account = account_map[profile_id]
-                            status['username'] = account['username']
-                            status['account_id'] = account['id']
-                            status['has_account'] = True
-                        else:
-                            status['username'] = '未关联'
-                            status['account_id'] = None
-                            status['has_account'] = False
-                        
-                        statuses.append(status)
-        except Exception as e:
-            print(f"获取窗口列表失败: {e}")
+            # 添加窗口工作状态
+            window_state = self.window_status.get(profile_id)
+            if window_state:
+                status['work_status'] = window_state['status']
+                status['current_task_id'] = window_state.get('current_task_id')
+                # 如果是异常状态，添加错误时间
+                if window_state['status'] == 'error':
+                    status['error_time'] = window_state.get('error_time')
+            else:
+                status['work_status'] = 'unknown'
+                status['current_task_id'] = None
+            # 流水线模式下正在生成的任务
+            status['generating_task_ids'] = self.pipeline.tasks(profile_id)
+            # 账号额度用完、等待重置的窗口
+            status['quota_waiting'] = profile_id in self._quota_waits
+            
+            # 如果窗口已关联账号，添加账号信息
+            account = account_map.get(profile_id)
+            if account:
+                status['username'] = account['username']
+                status['account_id'] = account['id']
+                status['has_account'] = True
+            else:
+                status['username'] = '未关联'
+                status['account_id'] = None
+                status['has_account'] = False
+            
+            statuses.append(status)
         
         return statuses
     
@@ -583,6 +1027,254 @@ class WindowManager:
         self.db.update_account_status(account_id, 'inactive')
         print(f"账号 {account_id} 的所有任务已完成")
     
+    def _generate_and_wait(self, automation, task_id: int, task: Dict, token: CancelToken,
+                           report_progress: Callable) -> Dict:
+        """提交视频生成并阻塞等待结果（未启用流水线时）"""
+        self.completions.register(task_id)
+        try:
+            return automation.generate_video(
+                prompt=task['prompt'],
+                image=task.get('image'),
+                auto_download=True,
+                progress_callback=report_progress,
+                task_id=task_id,  # 传入task_id用于检查进度
+                completion_waiter=self._completion_waiter(task_id),
+                image_cache=self.image_cache,
+                cancel_token=token
+            )
+        finally:
+            self.completions.discard(task_id)
+    
+    def _completion_waiter(self, task_id: int) -> Callable:
+        """
+        等待任务完成信号的函数（传给自动化的 completion_waiter）
+        
+        插件回调可能落在其他后端进程，本进程收不到信号：超过 TASK_COMPLETION_DB_CHECK_INTERVAL 秒
+        没有信号时到数据库查一次任务状态，已结束的任务当作收到信号返回
+        """
+        last_check = time.monotonic()
+        
+        def waiter(timeout: float) -> Optional[Dict]:
+            nonlocal last_check
+            info = self.completions.wait(task_id, timeout)
+            if info is not None or time.monotonic() - last_check < TASK_COMPLETION_DB_CHECK_INTERVAL:
+                return info
+            last_check = time.monotonic()
+            task = self.db.get_task_by_id(task_id)
+            if task and (task['status'] in ('success', 'published', 'failed') or task.get('video_url')):
+                return {'status': task['status'], 'video_url': task.get('video_url'),
+                        'error_message': task.get('error_message')}
+            return None
+        
+        return waiter
+    
+    def _on_pipelined_task_signal(self, task_id: int, info: Dict):
+        """流水线任务收到插件回调的状态变化（在发出信号的接口线程中执行）"""
+        if info.get('status') == 'failed':
+            self._finish_pipelined_task(task_id, 'failed', error_message=info.get('error_message'))
+        elif info.get('video_url') or info.get('generation_id') or info.get('status') in ('success', 'published'):
+            self._finish_pipelined_task(task_id, 'completed', video_url=info.get('video_url'))
+    
+    def _on_pipelined_task_timeout(self, task_id: int):
+        """流水线任务超过 TASK_PIPELINE_TIMEOUT 仍未收到生成结果"""
+        if not self.pipeline.contains(task_id):
+            return
+        task = self.db.get_task_by_id(task_id)
+        if task and task['status'] in ('success', 'published'):
+            # 插件已经更新了任务，但没有发出信号（如由其他后端进程处理）
+            self._finish_pipelined_task(task_id, 'completed', video_url=task.get('video_url'))
+        else:
+            print(f"⚠️ 流水线任务 {task_id} 超过 {TASK_PIPELINE_TIMEOUT} 秒未收到生成结果")
+            self._finish_pipelined_task(task_id, 'timeout', error_message='等待视频生成结果超时')
+    
+    def _finish_pipelined_task(self, task_id: int, outcome: str, video_url: str = None, error_message: str = None):
+        """
+        流水线任务结束：更新任务状态并释放窗口的生成名额
+        
+        Args:
+            outcome: completed / failed / timeout
+        """
+        self.completions.discard(task_id)
+        entry = self.pipeline.remove(task_id, outcome)
+        if entry is None:
+            return
+        if entry['timeout_handle'] is not None:
+            self.scheduler.cancel(entry['timeout_handle'])
+        profile_id = entry['profile_id']
+        if outcome == 'completed':
+            self.cooldown.record_success(profile_id)
+        elif is_rate_limit_error(error_message):
+            self.cooldown.penalize(profile_id, 'task_error')
+        
+        task = self.db.get_task_by_id(task_id)
+        if task and task['status'] == 'running':
+            if outcome == 'completed':
+                print(f"任务 {task_id} 执行成功（流水线）")
+                self.db.update_task_status(
+                    task_id,
+                    'success',
+                    end_time=datetime.now().isoformat(),
+                    video_url=video_url or task.get('video_url')
+                )
+                self.db.update_task_progress(task_id, 100, '视频生成完成', immediate=True)
+            else:
+                print(f"任务 {task_id} 执行失败（流水线）: {error_message}")
+                self.db.update_task_status(
+                    task_id,
+                    'failed',
+                    end_time=datetime.now().isoformat(),
+                    error_message=error_message
+                )
+                self.db.update_task_progress(task_id, 0, f'失败: {error_message}', immediate=True)
+        
+        # 释放名额：窗口没有正在提交的任务时可以领取新任务
+        self._release_window(profile_id, task_id, release_slot=False, end_submission=False)
+        print(f"  ✅ 窗口 {profile_id} 释放一个生成名额（正在生成 {self.pipeline.count(profile_id)}/{self.pipeline.depth} 个）")
+    
+    def _drop_pipelined_tasks(self, profile_id: int, reason: str):
+        """
+        窗口被关闭或回收：移除窗口正在生成的流水线任务
+        
+        浏览器关闭后插件不会再回报这些任务的结果，不移除的话重新打开的窗口会一直占着名额，
+        直到 TASK_PIPELINE_TIMEOUT。提示词已经提交过，退回队列会重复生成，所以标记为失败。
+        """
+        entries = self.pipeline.remove_profile(profile_id, 'failed')
+        for task_id, entry in entries.items():
+            if entry['timeout_handle'] is not None:
+                self.scheduler.cancel(entry['timeout_handle'])
+            self.completions.discard(task_id)
+            task = self.db.get_task_by_id(task_id)
+            if task and task['status'] == 'running':
+                error_message = f'{reason}，未收到生成结果'
+                self.db.update_task_status(task_id, 'failed', end_time=datetime.now().isoformat(),
+                                           error_message=error_message)
+                self.db.update_task_progress(task_id, 0, error_message, immediate=True)
+        if entries:
+            print(f"  窗口 {profile_id} {reason}，{len(entries)} 个正在生成的任务标记为失败: {sorted(entries)}")
+    
+    def _on_task_stuck(self, run: TaskRun, action: str):
+        """
+        看门狗发现任务某个阶段超过截止时间（在看门狗线程中调用）
+        
+        Args:
+            action: cancel 请求自动化线程取消；reclaim 线程在宽限时间内没有退出，回收窗口
+        """
+        elapsed = run.phase_elapsed()
+        try:
+            self.db.record_task_intervention(run.task_id, run.profile_id, run.phase, action,
+                                             round(elapsed, 1), round(run.deadline, 1), run.learned, self.worker_id)
+        except Exception as e:
+            print(f"⚠️ 记录看门狗介入失败: {e}")
+        
+        if action == 'cancel':
+            print(f"⏱️ 任务 {run.task_id} 在窗口 {run.profile_id} 的 {run.phase} 阶段已执行 {elapsed:.0f} 秒"
+                  f"（截止 {run.deadline:.0f} 秒），请求取消")
+            self._signal_cancel(run.task_id, f"{run.phase} 阶段超过 {run.deadline:.0f} 秒")
+            return
+        
+        print(f"⏱️ 任务 {run.task_id} 取消后 {self.watchdog.cancel_grace} 秒仍未退出，回收窗口 {run.profile_id}")
+        print(f"  ⚠️ 卡住的执行线程会一直占用一个执行名额，直到浏览器操作返回")
+        self._settle_stuck_task(run.task_id, run)
+        threading.Thread(target=self._reclaim_window, args=(run.profile_id, run.task_id),
+                         name=f'window-reclaim-{run.profile_id}', daemon=True).start()
+    
+    def _signal_cancel(self, task_id: int, reason: str) -> bool:
+        """设置正在执行的任务的取消令牌，并唤醒等待生成结果的线程；任务不在本进程执行时返回 False"""
+        with self.lock:
+            token = self._cancel_tokens.get(task_id)
+        if token is None:
+            return False
+        if token.cancel(reason):
+            self.completions.signal(task_id, status='cancelled')
+        return True
+    
+    def _finish_cancelled_task(self, task_id: int, token: CancelToken):
+        """
+        被取消的任务执行线程退出
+        
+        终止 / 重试 / 删除时任务状态已由发起操作的一方更新；
+        任务仍是 running（如窗口被关闭）时标记为失败
+        """
+        print(f"任务 {task_id} 已被取消（{token.reason}），执行线程退出")
+        task = self.db.get_task_by_id(task_id)
+        if task and task['status'] == 'running':
+            error_message = f'任务已取消: {token.reason}'
+            self.db.update_task_status(task_id, 'failed', end_time=datetime.now().isoformat(),
+                                       error_message=error_message)
+            self.db.update_task_progress(task_id, 0, error_message, immediate=True)
+    
+    def cancel_task(self, task_id: int, reason: str) -> Optional[str]:
+        """
+        取消本进程中的任务（终止 / 删除 / 重试时调用，任务状态由调用方更新）
+        
+        Returns:
+            running: 执行线程会在下一个检查点退出，退出后释放窗口
+            generating: 流水线中已提交、正在生成的任务，已释放其生成名额
+            None: 任务不在本进程中执行
+        """
+        if self._signal_cancel(task_id, reason):
+            print(f"任务 {task_id} 已请求取消（{reason}），执行线程退出后释放窗口")
+            return 'running'
+        entry = self.pipeline.remove(task_id)
+        if entry is None:
+            return None
+        self.completions.discard(task_id)
+        if entry['timeout_handle'] is not None:
+            self.scheduler.cancel(entry['timeout_handle'])
+        self._release_window(entry['profile_id'], task_id, release_slot=False, end_submission=False)
+        print(f"任务 {task_id} 已取消（{reason}），释放窗口 {entry['profile_id']} 的一个生成名额")
+        return 'generating'
+    
+    def cancel_tasks(self, task_ids: List[int], reason: str) -> int:
+        """批量取消本进程中的任务，返回实际取消的任务数"""
+        return sum(1 for task_id in task_ids if self.cancel_task(task_id, reason) is not None)
+    
+    def _settle_stuck_task(self, task_id: int, run: TaskRun):
+        """
+        处理被看门狗取消的任务
+        
+        提交之前的阶段超时：退回待处理队列；提交及之后的阶段超时：提示词可能已经发出，
+        退回队列会重复生成，标记为失败
+        """
+        self.completions.discard(task_id)
+        if run.phase in PRE_SUBMIT_PHASES:
+            self.db.update_task_status(task_id, 'pending')
+            self.db.update_task_progress(task_id, 0, f'{run.phase} 阶段超时，已退回待处理队列', immediate=True)
+            print(f"  ↩️ 任务 {task_id} 已退回待处理队列")
+            self.notify_tasks_available()
+            return
+        task = self.db.get_task_by_id(task_id)
+        if task and task['status'] == 'running':
+            error_message = f'{run.phase} 阶段超过 {run.deadline:.0f} 秒，任务超时'
+            self.db.update_task_status(task_id, 'failed', end_time=datetime.now().isoformat(),
+                                       error_message=error_message)
+            self.db.update_task_progress(task_id, 0, error_message, immediate=True)
+            print(f"  ❌ 任务 {task_id} 已提交，标记为超时失败（不重新提交）")
+    
+    def _reclaim_window(self, profile_id: int, task_id: int):
+        """回收卡住的窗口：关闭浏览器（超时则通过 API 强制关闭）后重新打开"""
+        with self.lock:
+            state = self.window_status.get(profile_id)
+            if state is None or state.get('current_task_id') != task_id:
+                return  # 窗口已被关闭或已经在执行其他任务
+            automation = self.active_windows.pop(profile_id, None)
+            self.window_status.pop(profile_id, None)
+        self.dispatcher.discard(profile_id)
+        self._drop_pipelined_tasks(profile_id, '窗口已被看门狗回收')
+        
+        result = self._close_window(profile_id, automation, IXBrowserClient())
+        print(f"  窗口 {profile_id} 关闭结果: {result['message']}")
+        result = self.open_windows([profile_id])[0]
+        print(f"  窗口 {profile_id} 重新打开: {result['message']}")
+    
+    def get_watchdog_stats(self) -> Dict:
+        """获取看门狗状态（各阶段截止时间、正在跟踪的任务、介入次数）"""
+        return self.watchdog.get_stats()
+    
+    def get_pipeline_stats(self) -> Dict:
+        """获取流水线统计（每个窗口正在生成的任务数等）"""
+        return self.pipeline.get_stats()
+    
     def execute_task(self, task_id: int, task_data: Dict = None):
         """执行任务"""
         print(f"\n========== 开始执行任务 {task_id} ==========")
@@ -607,11 +1299,25 @@ class WindowManager:
                 'failed', 
                 error_message='任务未分配窗口'
             )
-            self.db.update_task_progress(task_id, 0, '任务未分配窗口')
+            self.db.update_task_progress(task_id, 0, '任务未分配窗口', immediate=True)
             return
         
         print(f"任务分配到窗口: {profile_id}")
         
+        # 取消令牌：由任务队列分派时已创建；直接调用（如执行接口）时在这里创建，结束时移除
+        with self.lock:
+            token = self._cancel_tokens.get(task_id)
+            owns_token = token is None
+            if owns_token:
+                token = self._cancel_tokens[task_id] = CancelToken()
+        
+        def report_progress(progress, message):
+            # 任务被终止后不再写进度（任务可能已退回队列并被其他窗口领取）
+            if not token.cancelled:
+                self.db.update_task_progress(task_id, progress, message)
+        
+        run = None
+        completed = False
         try:
             # 进度 0%: 初始化
             self.db.update_task_progress(task_id, 0, '任务初始化')
@@ -636,12 +1342,24 @@ class WindowManager:
                     end_time=datetime.now().isoformat(),
                     error_message='窗口未打开'
                 )
-                self.db.update_task_progress(task_id, 0, '窗口未打开')
+                self.db.update_task_progress(task_id, 0, '窗口未打开', immediate=True)
                 return
             
             automation = self.active_windows[profile_id]
             print(f"获取到窗口 {profile_id} 的自动化实例")
             
+            # 看门狗按阶段跟踪本次执行，某个阶段卡住时取消任务并回收窗口
+            run = self.watchdog.start(task_id, profile_id)
+            email = self._profile_emails().get(profile_id)
+            
+            def on_phase(phase):
+                self.watchdog.enter_phase(run, phase)
+                if phase == 'wait':
+                    # 提示词已发出才消耗一次额度（下一次配额捕获会校正估计值）
+                    self.quota.consume(email)
+            
+            automation.phase_callback = on_phase
+            
             # 进度 20%: 导航到Sora页面
             self.db.update_task_progress(task_id, 20, '导航到Sora页面')
             
@@ -651,18 +1369,44 @@ class WindowManager:
             # 进度 30%: 输入提示词
             self.db.update_task_progress(task_id, 30, '输入提示词')
             
-            result = automation.generate_video(
-                prompt=task['prompt'],
-                image=task.get('image'),
-                auto_download=True,
-                progress_callback=lambda progress, message: self.db.update_task_progress(task_id, progress, message),
-                task_id=task_id  # 传入task_id用于检查进度
-            )
+            if self.pipeline.enabled:
+                # 流水线模式：提交后不等待，登记完成回调（插件回调按 sora_task_id 找到任务后发出信号）
+                # 提交前就登记，避免生成结果在登记之前到达
+                timeout_handle = self.scheduler.schedule(TASK_PIPELINE_TIMEOUT, self._on_pipelined_task_timeout, task_id)
+                self.pipeline.add(profile_id, task_id, timeout_handle)
+                self.completions.register(task_id, callback=lambda info: self._on_pipelined_task_signal(task_id, info))
+                result = automation.submit_video(
+                    prompt=task['prompt'],
+                    image=task.get('image'),
+                    progress_callback=report_progress,
+                    image_cache=self.image_cache,
+                    cancel_token=token
+                )
+                if result['success'] and run.state != 'reclaimed':
+                    completed = True
+                    self.quota.consume(email)
+                    self.db.update_task_progress(task_id, 40, '已提交，等待视频生成')
+                    print(f"任务 {task_id} 已提交到窗口 {profile_id}，等待插件推送生成结果")
+                    print(f"========== 任务 {task_id} 提交完成 ==========\n")
+                    return 'submitted'
+                self.pipeline.remove(task_id)
+                self.completions.discard(task_id)
+                self.scheduler.cancel(timeout_handle)
+            else:
+                result = self._generate_and_wait(automation, task_id, task, token, report_progress)
             
             print(f"视频生成结果: {result}")
             
+            if run.state == 'reclaimed':
+                # 看门狗已回收窗口并处理了任务，丢弃迟到的结果
+                print(f"任务 {task_id} 的窗口已被看门狗回收，忽略本次执行结果")
+                return 'reclaimed'
+            
             # 更新任务状态
-            if result['success']:
+            if token.cancelled and not run.intervened:
+                self._finish_cancelled_task(task_id, token)
+            elif result['success']:
+                completed = True
                 print(f"任务 {task_id} 执行成功")
                 self.db.update_task_status(
                     task_id,
@@ -671,8 +1415,11 @@ class WindowManager:
                     video_url=result.get('video_url')
                 )
                 # 进度 100%: 完成
-                self.db.update_task_progress(task_id, 100, '视频生成完成')
+                self.db.update_task_progress(task_id, 100, '视频生成完成', immediate=True)
                 # 注意：窗口不在这里释放，等待发布完成后再释放
+            elif run.intervened:
+                # 看门狗取消了卡住的任务：未提交时退回待处理队列，已提交时标记为超时失败
+                self._settle_stuck_task(task_id, run)
             else:
                 print(f"任务 {task_id} 执行失败: {result.get('error')}")
                 self.db.update_task_status(
@@ -681,36 +1428,38 @@ class WindowManager:
                     end_time=datetime.now().isoformat(),
                     error_message=result.get('error')
                 )
-                self.db.update_task_progress(task_id, 0, f'失败: {result.get("error")}')
-                
-                # 🆕 任务失败时释放窗口
-                with self.lock:
-                    if profile_id in self.window_status:
-                        self.window_status[profile_id] = {
-                            'status': 'idle',
-                            'current_task_id': None
-                        }
-                print(f"  ✅ 窗口 {profile_id} 已释放（任务失败）")
+                self.db.update_task_progress(task_id, 0, f'失败: {result.get("error")}', immediate=True)
+                # 窗口由 _execute_task_and_continue 释放（疑似限流时冷却后再释放）
             
         except Exception as e:
             print(f"任务 {task_id} 执行异常: {e}")
             import traceback
             traceback.print_exc()
-            self.db.update_task_status(
-                task_id,
-                'failed',
-                end_time=datetime.now().isoformat(),
-                error_message=str(e)
-            )
-            self.db.update_task_progress(task_id, 0, f'异常: {str(e)}')
+            if run is not None and run.state == 'reclaimed':
+                print(f"任务 {task_id} 的窗口已被看门狗回收，忽略本次执行异常")
+                return 'reclaimed'
+            if run is not None and run.intervened:
+                # 看门狗取消了卡住的任务：未提交时退回待处理队列，已提交时标记为超时失败
+                self._settle_stuck_task(task_id, run)
+            elif token.cancelled:
+                self._finish_cancelled_task(task_id, token)
+            else:
+                self.db.update_task_status(
+                    task_id,
+                    'failed',
+                    end_time=datetime.now().isoformat(),
+                    error_message=str(e)
+                )
+                self.db.update_task_progress(task_id, 0, f'异常: {str(e)}', immediate=True)
             
-            # 🆕 任务异常时释放窗口
-            with self.lock:
-                if profile_id in self.window_status:
-                    self.window_status[profile_id] = {
-                        'status': 'idle',
-                        'current_task_id': None
-                    }
-            print(f"  ✅ 窗口 {profile_id} 已释放（任务异常）")
+            # 窗口由 _execute_task_and_continue 释放
+            self.completions.discard(task_id)
+        finally:
+            if run is not None:
+                self.watchdog.finish(run, completed)
+            if owns_token:
+                with self.lock:
+                    if self._cancel_tokens.get(task_id) is token:
+                        del self._cancel_tokens[task_id]
         
         print(f"========== 任务 {task_id} 执行完成 ==========\n")
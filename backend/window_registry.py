@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+窗口状态登记表
+
+窗口状态接口被前端定时轮询，以前每次请求都要调用 ixBrowser 的窗口列表接口并重新查询全部账号。
+现在由后台线程定时刷新窗口列表（分页获取全部窗口，不再限制为 100 个），
+按窗口ID索引的账号信息在账号变更后立即重新加载，接口直接读取内存中的快照。
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+class WindowStateRegistry:
+    def __init__(self, list_profiles: Callable[[int, int], Optional[List[Dict]]],
+                 load_accounts: Callable[[], List[Dict]], refresh_interval: float = 30, page_size: int = 100):
+        """
+        Args:
+            list_profiles: 分页获取 ixBrowser 窗口列表的函数 list_profiles(page, limit)，失败时返回 None
+            load_accounts: 加载全部账号的函数（Database.get_all_accounts）
+            refresh_interval: 窗口列表的刷新间隔（秒）
+            page_size: 每页获取的窗口数量
+        """
+        self._list_profiles = list_profiles
+        self._load_accounts = load_accounts
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+
+        self._cond = threading.Condition()
+        self._profiles = []  # [{'profile_id', 'name'}]
+        self._accounts_by_profile = {}  # profile_id -> 账号
+        self._profiles_stale = True
+        self._accounts_stale = True
+        self._version = 0  # 窗口列表或账号索引变化时 +1
+        self._refreshed_at = None
+        self._last_error = None
+        self._refresh_count = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """启动后台刷新线程（重复调用无副作用）"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='window-registry', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def invalidate_profiles(self):
+        """窗口列表可能已变化（新建 / 删除窗口），唤醒后台线程立即刷新"""
+        with self._cond:
+            self._profiles_stale = True
+            self._cond.notify()
+
+    def invalidate_accounts(self):
+        """账号已变更（导入 / 删除 / 修改），唤醒后台线程重新加载账号索引"""
+        with self._cond:
+            self._accounts_stale = True
+            self._cond.notify()
+
+    def snapshot(self):
+        """
+        获取当前快照（不访问 ixBrowser 和数据库）
+
+        Returns:
+            (窗口列表, 按窗口ID索引的账号, 版本号)
+        """
+        with self._cond:
+            return list(self._profiles), dict(self._accounts_by_profile), self._version
+
+    def get_account_by_profile(self, profile_id: int) -> Optional[Dict]:
+        with self._cond:
+            return self._accounts_by_profile.get(profile_id)
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            return {
+                'profiles': len(self._profiles),
+                'accounts': len(self._accounts_by_profile),
+                'version': self._version,
+                'refresh_count': self._refresh_count,
+                'refreshed_at': self._refreshed_at,
+                'last_error': self._last_error,
+                'refresh_interval': self.refresh_interval
+            }
+
+    def refresh(self, profiles: bool = True, accounts: bool = True):
+        """同步刷新窗口列表和账号索引（获取失败时保留上一次的数据）"""
+        with self._cond:
+            if profiles:
+                self._profiles_stale = False
+            if accounts:
+                self._accounts_stale = False
+
+        new_profiles = self._fetch_profiles() if profiles else None
+        new_accounts = None
+        if accounts:
+            try:
+                new_accounts = {}
+                for account in self._load_accounts():
+                    if account.get('profile_id'):
+                        new_accounts.setdefault(account['profile_id'], account)
+            except Exception as e:
+                print(f"⚠️ 加载账号索引失败: {e}")
+                self._record_error(f"加载账号失败: {e}")
+                new_accounts = None
+
+        with self._cond:
+            changed = False
+            if new_profiles is not None and new_profiles != self._profiles:
+                self._profiles = new_profiles
+                changed = True
+            if new_accounts is not None and new_accounts != self._accounts_by_profile:
+                self._accounts_by_profile = new_accounts
+                changed = True
+            if changed:
+                self._version += 1
+            self._refresh_count += 1
+            self._refreshed_at = datetime.now().isoformat()
+
+    def _fetch_profiles(self) -> Optional[List[Dict]]:
+        """分页获取全部窗口"""
+        profiles = []
+        page = 1
+        while True:
+            try:
+                items = self._list_profiles(page, self.page_size)
+            except Exception as e:
+                items = None
+                print(f"⚠️ 获取窗口列表失败: {e}")
+            if items is None:
+                self._record_error(f"获取窗口列表第 {page} 页失败")
+                return None
+            for item in items:
+                if item.get('profile_id'):
+                    profiles.append({
+                        'profile_id': item['profile_id'],
+                        'name': item.get('name') or f"窗口 {item['profile_id']}"
+                    })
+            if len(items) < self.page_size:
+                break
+            page += 1
+
+        with self._cond:
+            self._last_error = None
+        return profiles
+
+    def _record_error(self, message: str):
+        with self._cond:
+            self._last_error = message
+
+    def _run(self):
+        print(f"窗口状态登记表已启动（每 {self.refresh_interval} 秒刷新窗口列表）")
+        next_profiles_refresh = 0
+        while True:
+            with self._cond:
+                while self._running:
+                    if self._profiles_stale or self._accounts_stale:
+                        break
+                    timeout = next_profiles_refresh - time.monotonic()
+                    if timeout <= 0:
+                        # 定时刷新时同时重新加载账号，兜底绕过 Database 方法直接修改账号表的情况
+                        self._profiles_stale = True
+                        self._accounts_stale = True
+                        break
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+                refresh_profiles = self._profiles_stale
+                refresh_accounts = self._accounts_stale
+
+            try:
+                self.refresh(profiles=refresh_profiles, accounts=refresh_accounts)
+            except Exception as e:
+                print(f"⚠️ 刷新窗口状态失败: {e}")
+            if refresh_profiles:
+                next_profiles_refresh = time.monotonic() + self.refresh_interval
@@ -53,24 +53,31 @@ export default {
   },
   
   // 任务管理
-  getTasks(accountId = null) {
-    return api.get('/tasks', { params: { account_id: accountId } })
+  getTasks(accountId = null, params = {}) {
+    // params: limit / cursor / status / created_from / created_to / fields（分页和筛选，可选）
+    return api.get('/tasks', { params: { account_id: accountId, ...params } })
   },
   
   importTasks(tasks) {
     return api.post('/tasks/import', tasks)
   },
   
-  importTasksFromFile(file) {
+  importTasksFromFile(file, background = false) {
+    // background: 后台导入，立即返回作业ID，通过 getJob 查询进度
     const formData = new FormData()
     formData.append('file', file)
     return api.post('/tasks/import/file', formData, {
+      params: { background },
       headers: {
         'Content-Type': 'multipart/form-data'
       }
     })
   },
   
+  getJob(jobId) {
+    return api.get(`/jobs/${jobId}`)
+  },
+  
   executeTask(taskId) {
     return api.post(`/tasks/${taskId}/execute`)
   },
@@ -97,6 +104,7 @@ export default {
   
   // 窗口管理
   controlWindows(profileIds, action) {
+    // open 立即返回作业ID（job_id），通过 getJob 查询每个窗口的打开进度
     return api.post('/windows/control', { profile_ids: profileIds, action })
   },
   
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+插件捕获接口压力测试
+
+模拟多个插件并发上报视频进度（POST /api/data/capture, VIDEO_PROGRESS），
+同时混入任务列表查询和图片代理等较慢的请求，统计各接口的延迟分布（p50 / p95 / p99）。
+
+接口处理函数阻塞事件循环时，慢请求会拖高捕获接口的 p99；
+处理函数在线程池中执行后，捕获接口的延迟应基本不受慢请求影响。
+
+用法（需先启动后端）:
+    python test/load_test_capture.py --concurrency 50 --requests 2000
+    python test/load_test_capture.py --slow-url https://httpbin.org/delay/2
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def progress_payload(sora_task_id):
+    return {
+        'type': 'VIDEO_PROGRESS',
+        'data': {
+            'task_id': sora_task_id,
+            'status': 'running',
+            'progress_pct': round(random.random(), 3),
+            'captured_at': int(time.time() * 1000)
+        }
+    }
+
+
+async def capture_worker(client, sora_task_ids, counter, total, latencies, errors):
+    while True:
+        if counter[0] >= total:
+            return
+        counter[0] += 1
+
+        start = time.perf_counter()
+        try:
+            response = await client.post('/api/data/capture', json=progress_payload(random.choice(sora_task_ids)))
+            if response.status_code != 200:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def background_worker(client, path, params, stop_event, latencies, errors):
+    """持续发送较慢的请求（任务列表、图片代理），模拟同时在使用的前端"""
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, params=params)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def print_report(name, latencies, errors, elapsed=None):
+    print(f"\n[{name}]")
+    print(f"  请求数: {len(latencies)}  错误数: {len(errors)}")
+    if elapsed:
+        print(f"  吞吐量: {len(latencies) / elapsed:.1f} 请求/秒")
+    if latencies:
+        print(f"  p50: {percentile(latencies, 50):.1f} ms")
+        print(f"  p95: {percentile(latencies, 95):.1f} ms")
+        print(f"  p99: {percentile(latencies, 99):.1f} ms")
+        print(f"  max: {max(latencies):.1f} ms")
+
+
+async def main(args):
+    # 使用不存在的 Sora 任务ID，只写入 sora_task_progress，不影响真实任务
+    sora_task_ids = [f"loadtest_{uuid.uuid4().hex[:12]}" for _ in range(args.sora_tasks)]
+    limits = httpx.Limits(max_connections=args.concurrency + args.background + 10)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        capture_latencies, capture_errors = [], []
+        list_latencies, list_errors = [], []
+        proxy_latencies, proxy_errors = [], []
+        stop_event = asyncio.Event()
+
+        background = []
+        for _ in range(args.background):
+            background.append(asyncio.create_task(background_worker(
+                client, '/api/tasks', None, stop_event, list_latencies, list_errors)))
+            if args.slow_url:
+                background.append(asyncio.create_task(background_worker(
+                    client, '/api/image-proxy', {'url': args.slow_url}, stop_event, proxy_latencies, proxy_errors)))
+
+        print(f"开始压测: {args.requests} 个捕获请求，并发 {args.concurrency}，后台慢请求 {len(background)} 路")
+        counter = [0]
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            capture_worker(client, sora_task_ids, counter, args.requests, capture_latencies, capture_errors)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+        stop_event.set()
+        await asyncio.gather(*background, return_exceptions=True)
+
+        try:
+            stats = (await client.get('/api/stats/db-executor')).json().get('data')
+        except (httpx.HTTPError, ValueError):
+            stats = None
+
+    print("=" * 60)
+    print_report('POST /api/data/capture', capture_latencies, capture_errors, elapsed)
+    print_report('GET /api/tasks', list_latencies, list_errors)
+    if args.slow_url:
+        print_report('GET /api/image-proxy', proxy_latencies, proxy_errors)
+    if stats:
+        print(f"\n阻塞调用线程池: {stats}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='插件捕获接口压力测试')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--concurrency', type=int, default=50, help='并发上报的插件数量')
+    parser.add_argument('--requests', type=int, default=2000, help='捕获请求总数')
+    parser.add_argument('--sora-tasks', type=int, default=100, help='模拟的 Sora 任务数量')
+    parser.add_argument('--background', type=int, default=2, help='后台慢请求并发数')
+    parser.add_argument('--slow-url', default=None, help='图片代理请求的目标地址（如 https://httpbin.org/delay/2）')
+    asyncio.run(main(parser.parse_args()))
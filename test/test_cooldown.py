@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试 CooldownController 的 AIMD 调整（成功时减少步长、限流时乘性加大、上下限）和限流错误识别
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from cooldown import CooldownController, is_rate_limit_error
+
+
+def test_success_decreases_delay_down_to_min():
+    cooldown = CooldownController(initial_delay=30, min_delay=15, decrease_step=10, jitter=0)
+    cooldown.record_success(1)
+    assert cooldown.current_delay(1) == 20
+    cooldown.record_success(1)
+    cooldown.record_success(1)
+    assert cooldown.current_delay(1) == 15
+    assert cooldown.next_delay(1) == 15
+
+
+def test_penalty_multiplies_delay_up_to_max():
+    cooldown = CooldownController(initial_delay=100, max_delay=150, backoff_factor=2.0, jitter=0)
+    assert cooldown.penalize(1, 'quota')
+    assert cooldown.current_delay(1) == 150
+
+
+def test_penalty_applies_once_per_cooldown_period():
+    cooldown = CooldownController(initial_delay=60, max_delay=900, backoff_factor=2.0, jitter=0)
+    assert cooldown.penalize(1, 'quota')
+    assert not cooldown.penalize(1, 'task_error')
+    assert cooldown.current_delay(1) == 120
+    stats = cooldown.get_stats()['windows'][1]
+    assert stats['penalties'] == 1 and stats['last_signal'] == 'task_error'
+
+
+def test_penalty_factor_override():
+    cooldown = CooldownController(initial_delay=100, backoff_factor=2.0, jitter=0)
+    cooldown.penalize(1, 'violation', factor=1.25)
+    assert cooldown.current_delay(1) == 125
+
+
+def test_windows_are_independent():
+    cooldown = CooldownController(initial_delay=90, jitter=0)
+    cooldown.penalize(1, 'quota')
+    assert cooldown.current_delay(2) == 90
+
+
+def test_jitter_stays_within_bounds():
+    cooldown = CooldownController(initial_delay=100, jitter=0.2)
+    for _ in range(100):
+        assert 80 <= cooldown.next_delay(1) <= 120
+
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error('Rate limit exceeded, try again later')
+    assert is_rate_limit_error('操作过于频繁')
+    assert not is_rate_limit_error('页面加载失败')
+    assert not is_rate_limit_error(None)
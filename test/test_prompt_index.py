@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试 PromptIndex 的 Dice 相似度、阈值、状态过滤和排序
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from prompt_index import PromptIndex, normalize_prompt, prompt_hash
+
+
+def build_index():
+    index = PromptIndex()
+    index.rebuild([
+        {'id': 1, 'prompt': 'a cat running on the beach', 'status': 'pending'},
+        {'id': 2, 'prompt': 'a cat running on the beach at sunset', 'status': 'running'},
+        {'id': 3, 'prompt': 'city skyline at night', 'status': 'pending'},
+    ])
+    return index
+
+
+def test_normalization():
+    assert normalize_prompt('  A  Cat\n running ') == 'a cat running'
+    assert prompt_hash('A cat') == prompt_hash(' a   CAT ')
+
+
+def test_identical_prompt_scores_one():
+    index = build_index()
+    assert index.search('A cat running on the  beach', limit=1) == [(1, 1.0)]
+
+
+def test_min_score_threshold():
+    index = build_index()
+    results = dict(index.search('a cat running on the beach', min_score=0.8, limit=None))
+    assert set(results) == {1, 2}
+    assert 0.8 <= results[2] < 1.0
+    assert index.search('a cat running on the beach', min_score=1.0, limit=None) == [(1, 1.0)]
+    assert index.search('completely different words', min_score=0.5) == []
+
+
+def test_status_filter():
+    index = build_index()
+    assert [task_id for task_id, _ in index.search('a cat running', statuses=['running'])] == [2]
+    index.set_status(2, 'pending')
+    assert index.search('a cat running', statuses=['running']) == []
+
+
+def test_ties_are_ordered_newest_first_and_limit():
+    index = PromptIndex()
+    for task_id in (5, 9, 7):
+        index.add(task_id, 'same prompt', 'pending')
+    assert index.search('same prompt', limit=2) == [(9, 1.0), (7, 1.0)]
+    assert len(index.search('same prompt', limit=None)) == 3
+
+
+def test_remove():
+    index = build_index()
+    index.remove(1)
+    assert 1 not in dict(index.search('a cat running on the beach', limit=None))
+    assert len(index) == 2
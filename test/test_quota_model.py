@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试 QuotaModel 的可用性判断、提交扣减和重置时间后的恢复
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from quota_model import QuotaModel
+
+EMAIL = 'user@example.com'
+
+
+def test_unknown_account_is_available():
+    quota = QuotaModel()
+    assert quota.is_available(EMAIL)
+    assert quota.is_available(None)
+
+
+def test_exhausted_account_recovers_after_reset():
+    quota = QuotaModel()
+    quota.update(EMAIL, remaining=0, resets_in_seconds=60, captured_at=1000)
+    assert quota.unavailable_until(EMAIL, now=1030) == 1060
+    assert quota.unavailable_until(EMAIL, now=1061) is None
+    # 过了重置时间后清除过期的限制，等待下一次捕获确认实际额度
+    assert quota.remaining(EMAIL) is None
+    assert quota.is_available(EMAIL, now=1062)
+
+
+def test_rate_limited_without_reset_time_uses_recheck_interval():
+    quota = QuotaModel(recheck_interval=600)
+    quota.update(EMAIL, remaining=5, rate_limited=True, captured_at=1000)
+    assert quota.unavailable_until(EMAIL, now=1100) == 1600
+    assert quota.is_available(EMAIL, now=1601)
+
+
+def test_consume_exhausts_estimate():
+    quota = QuotaModel()
+    quota.update(EMAIL, remaining=2, captured_at=1000)
+    quota.consume(EMAIL)
+    assert quota.is_available(EMAIL, now=1001)
+    quota.consume(EMAIL)
+    assert quota.remaining(EMAIL) == 0
+    assert not quota.is_available(EMAIL, now=1002)
+    quota.consume(EMAIL)
+    assert quota.remaining(EMAIL) == 0
+
+
+def test_stale_capture_is_ignored():
+    quota = QuotaModel()
+    quota.update(EMAIL, remaining=10, captured_at=2000)
+    quota.update(EMAIL, remaining=0, captured_at=1000)
+    assert quota.remaining(EMAIL) == 10
+
+
+def test_order_by_remaining_puts_unknown_last():
+    quota = QuotaModel()
+    quota.update('a', remaining=1, captured_at=1000)
+    quota.update('b', remaining=5, captured_at=1000)
+    assert quota.order_by_remaining(['c', 'a', 'b'], lambda email: email) == ['b', 'a', 'c']
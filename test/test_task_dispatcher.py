@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试 TaskDispatcher 的事件驱动分派（空闲窗口、新任务事件、任务不足时不重复查询）
+"""
+
+import os
+import queue
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import pytest
+
+from task_dispatcher import TaskDispatcher
+
+
+@pytest.fixture
+def calls():
+    return queue.Queue()
+
+
+def make_dispatcher(calls, leftover):
+    def assign(profile_ids):
+        calls.put(sorted(profile_ids))
+        return leftover(profile_ids)
+    dispatcher = TaskDispatcher(assign, fallback_interval=3600)
+    dispatcher.start()
+    return dispatcher
+
+
+def test_idle_window_is_dispatched(calls):
+    dispatcher = make_dispatcher(calls, lambda profile_ids: [])
+    try:
+        dispatcher.mark_idle(1)
+        assert calls.get(timeout=2) == [1]
+        assert dispatcher.get_ready_profiles() == []
+    finally:
+        dispatcher.stop()
+
+
+def test_leftover_windows_wait_for_new_tasks(calls):
+    dispatcher = make_dispatcher(calls, lambda profile_ids: profile_ids)
+    try:
+        dispatcher.mark_idle(1)
+        assert calls.get(timeout=2) == [1]
+        # 任务不足：在新任务事件之前不再查询
+        with pytest.raises(queue.Empty):
+            calls.get(timeout=0.2)
+        assert dispatcher.get_ready_profiles() == [1]
+        dispatcher.notify_tasks()
+        assert calls.get(timeout=2) == [1]
+    finally:
+        dispatcher.stop()
+
+
+def test_discard_removes_ready_window(calls):
+    dispatcher = TaskDispatcher(lambda profile_ids: calls.put(profile_ids), fallback_interval=3600)
+    dispatcher.mark_idle(1)
+    dispatcher.mark_idle(2)
+    dispatcher.mark_idle(1)
+    dispatcher.discard(1)
+    assert dispatcher.get_ready_profiles() == [2]
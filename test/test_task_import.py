@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试任务文件的增量 JSON 解析（数据按很小的块读取，值跨越块边界）
+"""
+
+import io
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import pytest
+
+from task_import import _JsonStream, iter_json_tasks, iter_jsonl_tasks
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1024])
+def test_json_stream_parses_values_across_chunks(chunk_size):
+    stream = _JsonStream(io.StringIO(' [ 12345 , {"prompt": "a \\"cat\\""}, "中文" ] '), chunk_size=chunk_size)
+    stream.expect('[')
+    # 数字在块边界被截断时不能提前解析成 12
+    assert stream.value() == 12345
+    stream.expect(',')
+    assert stream.value() == {'prompt': 'a "cat"'}
+    stream.expect(',')
+    assert stream.value() == '中文'
+    stream.expect(']')
+    assert stream.peek() == ''
+
+
+def test_json_stream_expect_reports_unexpected_char():
+    stream = _JsonStream(io.StringIO('{}'), chunk_size=1)
+    with pytest.raises(ValueError):
+        stream.expect('[')
+
+
+def test_json_stream_truncated_value_raises():
+    stream = _JsonStream(io.StringIO('{"prompt": "a'), chunk_size=2)
+    with pytest.raises(ValueError):
+        stream.value()
+
+
+def test_iter_json_tasks_object_and_array():
+    data = '{"tasks": [{"prompt": "a"}, {"prompt": "b", "image": null}]}'
+    assert [task['prompt'] for task in iter_json_tasks(io.StringIO(data))] == ['a', 'b']
+    assert [task['prompt'] for task in iter_json_tasks(io.StringIO('[{"prompt": "c"}]'))] == ['c']
+
+
+def test_iter_jsonl_tasks_skips_blank_lines():
+    data = '{"prompt": "a"}\n\n{"prompt": "b"}\n'
+    assert [task['prompt'] for task in iter_jsonl_tasks(io.StringIO(data))] == ['a', 'b']
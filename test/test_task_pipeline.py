@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试 PipelineTracker 的名额计数、统计和按窗口移除
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from task_pipeline import PipelineTracker
+
+
+def test_depth_one_disables_pipeline():
+    assert not PipelineTracker(1).enabled
+    assert not PipelineTracker(0).enabled
+    assert PipelineTracker(3).enabled
+
+
+def test_add_and_remove_with_outcome():
+    pipeline = PipelineTracker(3)
+    pipeline.add(1, 10, timeout_handle=5)
+    pipeline.add(1, 11)
+    assert pipeline.count(1) == 2 and pipeline.tasks(1) == [10, 11]
+    assert pipeline.remove(10, 'completed')['timeout_handle'] == 5
+    assert pipeline.remove(10, 'completed') is None
+    pipeline.remove(11)
+    stats = pipeline.get_stats()
+    assert stats['completed'] == 1 and stats['submitted'] == 2 and stats['in_flight'] == 0
+    assert pipeline.count(1) == 0 and stats['windows'] == {}
+
+
+def test_remove_profile_only_affects_that_window():
+    pipeline = PipelineTracker(3)
+    pipeline.add(1, 10, timeout_handle=5)
+    pipeline.add(1, 11)
+    pipeline.add(2, 12)
+    entries = pipeline.remove_profile(1, 'failed')
+    assert sorted(entries) == [10, 11] and entries[10]['timeout_handle'] == 5
+    assert pipeline.count(1) == 0 and not pipeline.contains(10)
+    assert pipeline.tasks(2) == [12]
+    assert pipeline.get_stats()['failed'] == 2
+    assert pipeline.remove_profile(1) == {}
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试 TaskWatchdog 的截止时间学习（P95 × 余量、下限、硬上限、样本不足时的默认值）
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import pytest
+
+from task_watchdog import PHASES, PRE_SUBMIT_PHASES, TaskWatchdog
+
+
+@pytest.fixture
+def watchdog():
+    dog = TaskWatchdog(
+        lambda run, action: None,
+        default_deadlines={phase: 100 for phase in PHASES},
+        ceilings={phase: 500 for phase in PHASES},
+        min_deadline=30, margin=2.0, min_samples=5, history_size=20, check_interval=3600
+    )
+    yield dog
+    dog.shutdown()
+
+
+def test_default_deadline_until_enough_samples(watchdog):
+    watchdog.seed('wait', [10, 20, 30, 40])
+    assert watchdog.deadline_for('wait') == (100, False)
+
+
+def test_learned_deadline_is_p95_times_margin(watchdog):
+    watchdog.seed('wait', range(1, 21))  # 1..20 秒，P95 = 20
+    assert watchdog.deadline_for('wait') == (40, True)
+
+
+def test_learned_deadline_has_floor_and_ceiling(watchdog):
+    watchdog.seed('input', [1] * 10)
+    assert watchdog.deadline_for('input') == (30, True)
+    watchdog.seed('wait', [1000] * 10)
+    assert watchdog.deadline_for('wait') == (500, True)
+
+
+def test_default_deadline_is_capped_by_ceiling():
+    dog = TaskWatchdog(lambda run, action: None, default_deadlines={'wait': 900},
+                       ceilings={phase: 300 for phase in PHASES}, check_interval=3600)
+    try:
+        assert dog.deadline_for('wait') == (300, False)
+    finally:
+        dog.shutdown()
+
+
+def test_seed_keeps_newest_samples_and_does_not_overflow(watchdog):
+    # 数据库按结束时间倒序返回：最新的样本在前
+    watchdog.seed('wait', list(range(100, 0, -1)))
+    history = list(watchdog._history['wait'])
+    assert len(history) == 20
+    assert history[-1] == 100
+
+
+def test_run_starts_in_open_phase_and_is_untracked_after_finish(watchdog):
+    run = watchdog.start(1, 7)
+    assert run.phase == 'open' and run.deadline == 100 and not run.learned
+    watchdog.enter_phase(run, 'navigate')
+    assert run.phase == 'navigate'
+    assert len(watchdog._history['open']) == 1
+    watchdog.finish(run, completed=True)
+    assert watchdog.get_stats()['running'] == []
+
+
+def test_only_pre_submit_phases_are_requeued():
+    assert PRE_SUBMIT_PHASES == ('open', 'navigate', 'input')
+    assert 'submit' not in PRE_SUBMIT_PHASES and 'wait' not in PRE_SUBMIT_PHASES